@@ -1,19 +1,82 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
 from pydantic import BaseModel
 from dotenv import load_dotenv, find_dotenv
 import os
 import sys
+import json
+import asyncio
+import httpx
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 
 project_root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
 sys.path.append(project_root_path)
+from src.logging.logger import configure_logging, get_logger
 from src.models.chatbot import ChatModel
+from src.models.conversation import ConversationStore
+from src.models.emotion import EmotionFusionEngine, mood_distribution
+from src.middleware.health_check import DependencyProbe, HealthMonitor, install_health_checks
+from src.middleware.maintenance import DEFAULT_EXCLUDED_PATHS, install_load_shedding
+from src.middleware.monitoring import install_monitoring
+from src.middleware.rate_limiter import RateLimit, RateLimitMiddleware, create_bucket_store
+from src.middleware.response_handler import FastJSONResponse
+from src.middleware.stack import install_middleware_stack
+from src.middleware.tracing import TracingMiddleware, configure_tracing, inject_trace_headers
 
 load_dotenv(find_dotenv())
+configure_logging("chatbot")
+logger = get_logger("chatbot")
 
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
+
+# Every route below may call Gemini, so they share one bucket sized to the Gemini quota.
+# Override with "rate,burst" (requests per second, bucket size) in the RATE_LIMIT_* variables.
+gemini_limit = RateLimit.from_env("RATE_LIMIT_GEMINI", 5, 20, name="gemini")
+app.add_middleware(
+    RateLimitMiddleware,
+    limits={
+        route: gemini_limit
+        for route in ("/predictsentiment", "/chat", "/recommend-from-text", "/predictemotion")
+    },
+    per_user=RateLimit.from_env("RATE_LIMIT_PER_USER", 1, 5),
+    store=create_bucket_store(),
+)
 
 chat_model = ChatModel(api_key=os.getenv("GOOGLE_GEMINI_KEY"))
 
+MUSIC_RECOMMENDER_URL = os.getenv("MUSIC_RECOMMENDER_URL", "http://music-recommender:5001")
+
+# One pooled client for chatbot -> recommender calls, so each request skips connection setup
+recommender_client = httpx.AsyncClient(
+    base_url=MUSIC_RECOMMENDER_URL,
+    timeout=httpx.Timeout(30.0, connect=5.0),
+    limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+    event_hooks={"request": [inject_trace_headers]},
+)
+
+EMOTION_VOICE_URL = os.getenv("EMOTION_VOICE_URL", "http://emotion-voice:5002")
+EMOTION_IMAGE_URL = os.getenv("EMOTION_IMAGE_URL", "http://emotion-image:5003")
+
+# Shared pooled client for the voice and image emotion services
+emotion_client = httpx.AsyncClient(
+    timeout=httpx.Timeout(10.0, connect=2.0),
+    limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+    event_hooks={"request": [inject_trace_headers]},
+)
+
+# Per-session chat memory; older turns are folded into a rolling summary in the background
+conversations = ConversationStore(
+    summarizer=chat_model.summarize_conversation,
+    executor=ThreadPoolExecutor(max_workers=2, thread_name_prefix="summary"),
+    max_turns=int(os.getenv("CHAT_MAX_TURNS", 6)),
+    max_prompt_tokens=int(os.getenv("CHAT_MAX_PROMPT_TOKENS", 1024)),
+    max_sessions=int(os.getenv("CHAT_MAX_SESSIONS", 1000)),
+    idle_ttl=float(os.getenv("CHAT_SESSION_TTL_S", 1800)),
+)
+
 # Supported moods mapping
 MOOD_MAPPING = {
     "happy": "positive",
@@ -41,6 +104,27 @@ MOOD_MAPPING = {
 class TextInput(BaseModel):
     text: str
 
+class ChatInput(TextInput):
+    # Optional conversation id; without it /chat stays stateless
+    session_id: Optional[str] = None
+
+class SentimentInput(TextInput):
+    # Optional latency budget: past it, the keyword answer is returned instead of the LLM's
+    latency_budget_ms: Optional[int] = None
+    # Force chunked classification; otherwise it kicks in above LONG_INPUT_CHARS
+    long_input: Optional[bool] = None
+
+class RecommendFromTextInput(SentimentInput):
+    username: str = "default"
+
+# Inputs at least this long are classified sentence by sentence
+LONG_INPUT_CHARS = int(os.getenv("LONG_INPUT_CHARS", 600))
+
+@app.on_event("shutdown")
+async def close_clients():
+    await recommender_client.aclose()
+    await emotion_client.aclose()
+
 @app.get("/")
 def root():
     """Health check endpoint"""
@@ -51,54 +135,214 @@ def health_check():
     """Dedicated health check endpoint"""
     return {"status": "healthy", "service": "chatbot"}
 
+# Gemini is probed in the background for /health/ready. Not critical: sentiment
+# falls back to keywords while it is down.
+health_monitor = HealthMonitor("chatbot", [
+    DependencyProbe("gemini", chat_model.ping, interval=float(os.getenv("HEALTH_GEMINI_INTERVAL_S", 60)), critical=False),
+])
+install_health_checks(app, health_monitor)
+
+def map_to_supported_mood(raw_sentiment: str) -> str:
+    """Map a raw model sentiment onto one of the supported moods"""
+    sentiment = raw_sentiment.lower()  # Ensure lowercase for consistent matching
+
+    # First try direct mapping
+    mapped_sentiment = MOOD_MAPPING.get(sentiment)
+    if mapped_sentiment:
+        logger.debug("Direct mood mapping: %s -> %s", sentiment, mapped_sentiment)
+        return mapped_sentiment
+
+    # Try general sentiment matching only if we have a valid string
+    if any(pos in sentiment for pos in ["happy", "joy", "good", "positive"]):
+        mapped_sentiment = "positive"
+    elif any(neg in sentiment for neg in ["sad", "angry", "bad", "negative"]):
+        mapped_sentiment = "negative"
+    elif any(rel in sentiment for rel in ["calm", "peaceful", "relax"]):
+        mapped_sentiment = "relaxed"
+    elif any(eng in sentiment for eng in ["energy", "active", "pump"]):
+        mapped_sentiment = "energetic"
+    else:
+        mapped_sentiment = "neutral"
+    logger.debug("General mood mapping: %s -> %s", sentiment, mapped_sentiment)
+    return mapped_sentiment
+
 @app.post("/predictsentiment")
-def predict_sentiment(input: TextInput):
+def predict_sentiment(input: SentimentInput):
     """Predict sentiment and map it to supported moods"""
     try:
         # Input validation
         if not input.text or not input.text.strip():
-            print("Empty or whitespace-only input received")
-            return {"sentiment": "neutral"}
+            logger.debug("Empty or whitespace-only input received")
+            return {"sentiment": "neutral", "source": "default"}
+
+        latency_budget = None
+        if input.latency_budget_ms is not None:
+            latency_budget = max(input.latency_budget_ms, 0) / 1000.0
+
+        long_input = input.long_input if input.long_input is not None else len(input.text) >= LONG_INPUT_CHARS
+        if long_input:
+            logger.debug("Long input (%s chars), using chunked classification", len(input.text))
+            return chat_model.classify_sentiment_long(input.text, latency_budget=latency_budget)
 
         # Get raw sentiment from model
-        print(f"Input text: {input.text}")  # Debug log
-        raw_sentiment = chat_model.classify_sentiment(input.text)
-        print(f"Raw sentiment from model: {raw_sentiment}")  # Debug log
+        raw_sentiment, source = chat_model.classify_sentiment_with_source(
+            input.text, latency_budget=latency_budget
+        )
+        logger.debug("Raw sentiment from model: %s (source: %s)", raw_sentiment, source)
         
         # Validate model response
         if raw_sentiment is None:
-            print("Model returned None sentiment, using neutral")
-            return {"sentiment": "neutral"}
+            logger.warning("Model returned no sentiment, using neutral")
+            return {"sentiment": "neutral", "source": "default"}
         
         # Map to supported mood
-        sentiment = raw_sentiment.lower()  # Ensure lowercase for consistent matching
-        print(f"Lowercase sentiment: {sentiment}")  # Debug log
-        
-        # First try direct mapping
-        mapped_sentiment = MOOD_MAPPING.get(sentiment)
-        if mapped_sentiment:
-            print(f"Direct mapping found: {mapped_sentiment}")
-        else:
-            # Try general sentiment matching only if we have a valid string
-            print(f"No direct mapping found, trying general sentiment matching")
-            if any(pos in sentiment for pos in ["happy", "joy", "good", "positive"]):
-                mapped_sentiment = "positive"
-            elif any(neg in sentiment for neg in ["sad", "angry", "bad", "negative"]):
-                mapped_sentiment = "negative"
-            elif any(rel in sentiment for rel in ["calm", "peaceful", "relax"]):
-                mapped_sentiment = "relaxed"
-            elif any(eng in sentiment for eng in ["energy", "active", "pump"]):
-                mapped_sentiment = "energetic"
-            else:
-                mapped_sentiment = "neutral"
-            print(f"General mapping result: {mapped_sentiment}")
-                
-        return {"sentiment": mapped_sentiment}
+        return {"sentiment": map_to_supported_mood(raw_sentiment), "source": source}
     except Exception as e:
-        print(f"Error in sentiment prediction: {str(e)}")
-        return {"sentiment": "neutral"}  # Safe default
+        logger.error("Error in sentiment prediction: %s", e)
+        return {"sentiment": "neutral", "source": "default"}  # Safe default
 
 @app.post("/chat")
-def chat(input: TextInput):
-    reply = chat_model.chat(input.text)
-    return {"reply": reply}
+def chat(input: ChatInput):
+    summary, history = conversations.get_context(input.session_id) if input.session_id else ("", [])
+    reply = chat_model.chat(input.text, summary=summary, history=history)
+    if input.session_id:
+        conversations.append(input.session_id, input.text, reply)
+    return {"reply": reply, "session_id": input.session_id}
+
+@app.post("/chat/stream")
+async def chat_stream(input: ChatInput, request: Request):
+    """Relay generated tokens as server-sent events, stopping when the client goes away"""
+    cancel_event = threading.Event()
+    summary, history = conversations.get_context(input.session_id) if input.session_id else ("", [])
+
+    async def event_stream():
+        tokens = chat_model.stream_chat(input.text, cancel_event=cancel_event, summary=summary, history=history)
+        reply_parts = []
+        try:
+            async for token in iterate_in_threadpool(tokens):
+                if await request.is_disconnected():
+                    logger.debug("Client disconnected, cancelling chat stream")
+                    return
+                reply_parts.append(token)
+                yield f"data: {json.dumps({'token': token})}\n\n"
+            # Only completed replies become part of the conversation
+            if input.session_id:
+                conversations.append(input.session_id, input.text, "".join(reply_parts).strip())
+            yield "event: done\ndata: {}\n\n"
+        except Exception as e:
+            logger.error("Error while streaming chat reply: %s", e)
+            yield f"event: error\ndata: {json.dumps({'detail': 'Failed to generate reply'})}\n\n"
+        finally:
+            # Runs on disconnect/cancellation too; the worker thread sees the flag on its next chunk
+            cancel_event.set()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def fetch_recommendations(mood: str, username: str, authorization: Optional[str] = None) -> httpx.Response:
+    # The user's session: the recommender personalises the playlist and rate-limits per user on it
+    # (without one, every call counts against this service's address)
+    headers = {"Authorization": authorization} if authorization else {}
+    return await recommender_client.post("/recommend", json={"mood": mood, "username": username}, headers=headers)
+
+@app.post("/recommend-from-text")
+async def recommend_from_text(input: RecommendFromTextInput, request: Request):
+    """
+    Classify text and fetch a playlist in one call.
+
+    Candidates for the mood predicted by the keyword pre-screen are fetched while
+    the LLM classifies; that speculative work is kept if the final mood agrees and
+    cancelled otherwise.
+    """
+    predicted_mood = map_to_supported_mood(chat_model.keyword_sentiment(input.text or ""))
+    authorization = request.headers.get("Authorization")
+    speculative = asyncio.create_task(fetch_recommendations(predicted_mood, input.username, authorization))
+    # Discarded speculative work must not surface as an unretrieved task exception
+    speculative.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+    try:
+        result = await run_in_threadpool(predict_sentiment, input)
+    except BaseException:
+        speculative.cancel()
+        raise
+    mood = result["sentiment"]
+
+    speculative_hit = mood == predicted_mood
+    logger.debug("Pre-screen mood: %s, final mood: %s, speculative hit: %s", predicted_mood, mood, speculative_hit)
+    try:
+        if speculative_hit:
+            response = await speculative
+        else:
+            speculative.cancel()
+            response = await fetch_recommendations(mood, input.username, authorization)
+    except httpx.HTTPError as e:
+        logger.error("Error calling music recommender: %s", e)
+        raise HTTPException(status_code=502, detail="Music recommender unavailable")
+
+    if response.status_code != 200:
+        try:
+            detail = response.json().get("detail", "Unknown error occurred")
+        except ValueError:
+            detail = response.text
+        raise HTTPException(status_code=response.status_code, detail=detail)
+
+    return {**result, "speculative_hit": speculative_hit, "tracks": response.json()}
+
+# How much to trust a text answer, by where it came from
+TEXT_SOURCE_CONFIDENCE = {"llm": 0.85, "keyword": 0.6, "lexicon": 0.6, "lexicon+llm": 0.75, "default": 0.2}
+
+TEXT_DEADLINE_S = float(os.getenv("FUSION_TEXT_DEADLINE_S", 2.0))
+VOICE_DEADLINE_S = float(os.getenv("FUSION_VOICE_DEADLINE_S", 3.0))
+IMAGE_DEADLINE_S = float(os.getenv("FUSION_IMAGE_DEADLINE_S", 2.0))
+
+async def classify_text_emotion(text: str) -> dict:
+    # Leave headroom under the fusion deadline so the hedged keyword answer can still win
+    request = SentimentInput(text=text, latency_budget_ms=int(TEXT_DEADLINE_S * 800))
+    result = await run_in_threadpool(predict_sentiment, request)
+    confidence = result.get("confidence") or TEXT_SOURCE_CONFIDENCE.get(result.get("source"), 0.5)
+    return mood_distribution(result["sentiment"], confidence)
+
+async def classify_voice_emotion(audio: bytes) -> dict:
+    response = await emotion_client.post(
+        f"{EMOTION_VOICE_URL}/voice", content=audio, headers={"Content-Type": "audio/wav"}
+    )
+    response.raise_for_status()
+    return response.json()["probabilities"]
+
+async def classify_image_emotion(image: bytes) -> dict:
+    response = await emotion_client.post(f"{EMOTION_IMAGE_URL}/image", files={"file": ("upload", image)})
+    response.raise_for_status()
+    return response.json()["probabilities"]
+
+fusion_engine = EmotionFusionEngine()
+fusion_engine.register("text", classify_text_emotion, weight=1.0, deadline=TEXT_DEADLINE_S)
+fusion_engine.register("voice", classify_voice_emotion, weight=0.8, deadline=VOICE_DEADLINE_S)
+fusion_engine.register("image", classify_image_emotion, weight=0.9, deadline=IMAGE_DEADLINE_S)
+
+# Token streams are long-lived by design, so they stay out of the latency-driven limit
+install_load_shedding(app, excluded_paths=DEFAULT_EXCLUDED_PATHS + ("/chat/stream",))
+install_monitoring(app, caches={"emotion_fusion": fusion_engine.cache})
+
+configure_tracing("chatbot")
+app.add_middleware(TracingMiddleware)
+# Outermost: error handling, security headers, request ids and body checks
+install_middleware_stack(app)
+
+@app.post("/predictemotion")
+async def predict_emotion(
+    text: Optional[str] = Form(None),
+    audio: Optional[UploadFile] = File(None),
+    image: Optional[UploadFile] = File(None),
+):
+    """Fuse text, voice and image emotion into one mood; any subset of modalities may be sent"""
+    inputs = {
+        "text": text.strip() if text else None,
+        "voice": await audio.read() if audio is not None else None,
+        "image": await image.read() if image is not None else None,
+    }
+    if not any(inputs.values()):
+        raise HTTPException(status_code=400, detail="Provide at least one of text, audio or image")
+    return await fusion_engine.predict(inputs)
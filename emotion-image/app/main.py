@@ -0,0 +1,92 @@
+from fastapi import FastAPI, File, HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+from dotenv import load_dotenv, find_dotenv
+from PIL import UnidentifiedImageError
+import os
+import sys
+
+project_root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root_path)
+from src.logging.logger import configure_logging, get_logger
+from src.models.image import (
+    FaceCropper,
+    MicroBatcher,
+    ModelUnavailableError,
+    ThroughputStats,
+    load_image_model,
+    preprocess_upload,
+    summarize_faces,
+)
+from src.models.serving import create_runner
+
+load_dotenv(find_dotenv())
+configure_logging("emotion-image")
+logger = get_logger("emotion_image")
+
+app = FastAPI()
+
+stats = ThroughputStats()
+cropper = FaceCropper(max_faces=int(os.getenv("IMAGE_MAX_FACES", 4)))
+
+# The model is loaded once, at import time; with MODEL_SERVING=shared, batches run in a process pool
+try:
+    runner = create_runner(load_image_model)
+except ModelUnavailableError as e:
+    logger.warning("Facial emotion model unavailable: %s", e)
+    runner = None
+
+batcher = MicroBatcher(
+    runner,
+    stats,
+    max_batch=int(os.getenv("IMAGE_MAX_BATCH", 32)),
+    max_wait=float(os.getenv("IMAGE_BATCH_WAIT_MS", 10)) / 1000.0,
+) if runner is not None else None
+
+
+@app.on_event("startup")
+async def start_batcher():
+    if batcher is not None:
+        batcher.start()
+
+@app.on_event("shutdown")
+async def stop_batcher():
+    if batcher is not None:
+        await batcher.stop()
+
+@app.get("/")
+def root():
+    """Health check endpoint"""
+    return {"status": "healthy", "service": "emotion-image", "model_loaded": runner is not None}
+
+@app.get("/health")
+def health_check():
+    """Dedicated health check endpoint"""
+    return {"status": "healthy", "service": "emotion-image", "model_loaded": runner is not None}
+
+@app.get("/stats")
+def throughput_stats():
+    """Throughput counters, including images per CPU-second"""
+    return stats.snapshot()
+
+@app.post("/image")
+async def predict_image_emotion(file: UploadFile = File(...)):
+    """Detect the mood of the faces in an uploaded image"""
+    if batcher is None:
+        raise HTTPException(status_code=503, detail="Facial emotion model is not configured")
+
+    try:
+        # The spooled upload file is handed to the decoder as-is; no bytes copy of the body
+        faces = await run_in_threadpool(preprocess_upload, file.file, cropper, stats)
+    except (UnidentifiedImageError, OSError) as e:
+        raise HTTPException(status_code=415, detail=f"Could not decode image: {str(e)}")
+    finally:
+        await file.close()
+
+    probabilities = await batcher.submit(faces)
+    mood, confidence, mood_probabilities = summarize_faces(probabilities)
+    return {
+        "mood": mood,
+        "confidence": confidence,
+        "probabilities": mood_probabilities,
+        "faces": len(faces),
+    }
@@ -0,0 +1,54 @@
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+from dotenv import load_dotenv, find_dotenv
+import os
+import sys
+
+project_root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root_path)
+from src.logging.logger import configure_logging
+from src.models.serving import create_runner
+from src.models.text import load_text_model
+from src.utils.common import MOODS
+
+load_dotenv(find_dotenv())
+configure_logging("emotion-text")
+
+app = FastAPI()
+
+# Served in-process by default: a bag-of-words prediction is cheaper than pickling it to a pool process.
+# MODEL_SERVING=shared still moves it to a process pool that shares the weights.
+runner = create_runner(load_text_model)
+
+
+class TextInput(BaseModel):
+    text: str
+
+
+@app.on_event("shutdown")
+async def stop_runner():
+    runner.shutdown()
+
+@app.get("/")
+def root():
+    """Health check endpoint"""
+    return {"status": "healthy", "service": "emotion-text"}
+
+@app.get("/health")
+def health_check():
+    """Dedicated health check endpoint"""
+    return {"status": "healthy", "service": "emotion-text"}
+
+@app.post("/text")
+async def predict_text_emotion(input: TextInput):
+    """Classify the mood of a piece of text"""
+    if not input.text.strip():
+        raise HTTPException(status_code=400, detail="Text must not be empty")
+
+    probabilities, _ = await runner.infer("predict_proba", input.text)
+    index = int(probabilities.argmax())
+    return {
+        "mood": MOODS[index],
+        "confidence": round(float(probabilities[index]), 3),
+        "probabilities": {mood: round(float(p), 3) for mood, p in zip(MOODS, probabilities)},
+    }
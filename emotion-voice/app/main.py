@@ -0,0 +1,119 @@
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.requests import ClientDisconnect
+from dotenv import load_dotenv, find_dotenv
+import os
+import sys
+import json
+
+project_root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root_path)
+from src.logging.logger import configure_logging, get_logger
+from src.models.serving import create_runner
+from src.models.voice import AudioFormatError, PCMStreamDecoder, VoiceEmotionStream, load_voice_model
+
+load_dotenv(find_dotenv())
+configure_logging("emotion-voice")
+logger = get_logger("emotion_voice")
+
+app = FastAPI()
+
+# Seconds of audio per classified frame
+FRAME_SECONDS = float(os.getenv("VOICE_FRAME_SECONDS", 0.5))
+
+# Weights are loaded once; with MODEL_SERVING=shared, inference runs in a process pool that shares them
+runner = create_runner(load_voice_model)
+
+
+@app.on_event("shutdown")
+async def stop_runner():
+    runner.shutdown()
+
+
+async def classify_frames(stream: VoiceEmotionStream, frames) -> list:
+    """Run the model over newly decoded frames and fold the results into the stream's estimate"""
+    if not frames:
+        return []
+    (probabilities, levels), _ = await runner.infer("analyze", frames, stream.sample_rate)
+    return stream.update(probabilities, levels, frames)
+
+
+def create_stream(request: Request) -> VoiceEmotionStream:
+    """Build a decoder from the upload's content type: WAV, or raw PCM (audio/L16; rate=...; channels=...)"""
+    content_type = request.headers.get("content-type", "audio/wav").lower()
+    if content_type.startswith(("audio/l16", "audio/pcm")):
+        params = dict(
+            part.strip().split("=", 1) for part in content_type.split(";")[1:] if "=" in part
+        )
+        decoder = PCMStreamDecoder(
+            frame_seconds=FRAME_SECONDS,
+            raw=True,
+            sample_rate=int(params.get("rate", 16000)),
+            channels=int(params.get("channels", 1)),
+        )
+    else:
+        decoder = PCMStreamDecoder(frame_seconds=FRAME_SECONDS)
+    return VoiceEmotionStream(decoder)
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that leaves receive() to the body iterator.
+
+    Starlette's version listens for disconnects on receive() while streaming,
+    which would race the iterator for the request body it is still reading.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        async for chunk in self.body_iterator:
+            if not isinstance(chunk, (bytes, memoryview)):
+                chunk = chunk.encode(self.charset)
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+@app.get("/")
+def root():
+    """Health check endpoint"""
+    return {"status": "healthy", "service": "emotion-voice"}
+
+@app.get("/health")
+def health_check():
+    """Dedicated health check endpoint"""
+    return {"status": "healthy", "service": "emotion-voice"}
+
+@app.post("/voice")
+async def predict_voice_emotion(request: Request):
+    """Classify an uploaded (optionally chunked) audio body; the clip is decoded as it arrives"""
+    stream = create_stream(request)
+    try:
+        async for chunk in request.stream():
+            await classify_frames(stream, stream.decode(chunk))
+        await classify_frames(stream, stream.flush())
+        result = stream.estimate(final=True)
+    except AudioFormatError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+
+    if result["seconds"] == 0:
+        raise HTTPException(status_code=400, detail="No audio samples received")
+    return result
+
+@app.post("/voice/stream")
+async def stream_voice_emotion(request: Request):
+    """Emit a running mood estimate (NDJSON) for every decoded frame while audio is still uploading"""
+    stream = create_stream(request)
+
+    async def estimates():
+        try:
+            async for chunk in request.stream():
+                for estimate in await classify_frames(stream, stream.decode(chunk)):
+                    yield json.dumps(estimate) + "\n"
+            await classify_frames(stream, stream.flush())
+            yield json.dumps(stream.estimate(final=True)) + "\n"
+        except AudioFormatError as e:
+            yield json.dumps({"error": str(e)}) + "\n"
+        except ClientDisconnect:
+            logger.debug("Client disconnected during voice upload")
+
+    return DuplexStreamingResponse(estimates(), media_type="application/x-ndjson")
@@ -2,40 +2,207 @@ import streamlit as st
 from streamlit_option_menu import option_menu
 import sys
 import os
+import hashlib
 import requests
+import json
+import uuid
 from dotenv import load_dotenv, find_dotenv
 from typing import Dict, List
 
-# Initialize session for making requests
-session = requests.Session()
+# Load environment variables before the clients read their URLs
+load_dotenv(find_dotenv())
 
-# Configure retry strategy
-retries = requests.adapters.Retry(
-    total=5,
-    backoff_factor=0.1,
-    status_forcelist=[500, 502, 503, 504]
-)
-session.mount('http://', requests.adapters.HTTPAdapter(max_retries=retries))
+import utils
+from utils import ServiceError
+
+# Add the project root directory to the Python path
+project_root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root_path)
+
+from src.logging.logger import get_logger
+from src.middleware.tracing import new_traceparent
+
+logger = get_logger("frontend")
+
+# One trace per page run (i.e. per user interaction); the chatbot and recommender continue it
+request_headers = {"traceparent": new_traceparent(float(os.getenv("TRACE_SAMPLE_RATE", 0.1)))}
+utils.set_request_headers(request_headers)
+
+def stream_chat_tokens(response):
+    """Yield tokens from a server-sent event stream produced by /chat/stream"""
+    event = "message"
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            event = "message"
+            continue
+        if line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            if event == "done":
+                return
+            payload = json.loads(line[len("data:"):].strip())
+            if event == "error":
+                raise RuntimeError(payload.get("detail", "Streaming failed"))
+            yield payload.get("token", "")
 
-# Load environment variables
-load_dotenv(find_dotenv())
+def init_spotify():
+    """Initialize Spotify service connection"""
+    return check_spotify_connection()
 
-# Service URLs
-CHATBOT_URL = os.getenv('CHATBOT_URL', 'http://localhost:5000')
-MUSIC_RECOMMENDER_URL = os.getenv('MUSIC_RECOMMENDER_URL', 'http://localhost:8000')
+def check_spotify_connection():
+    """Check if Spotify service is available and working"""
+    try:
+        return utils.spotify_available()
+    except Exception as e:
+        logger.warning("Error checking Spotify connection: %s", e)
+        st.error(f"Spotify service error: {str(e)}")
+        return False
 
-# Initialize database connection status
-DB_AVAILABLE = True
+def process_spotify_error(response):
+    """Handle Spotify service errors"""
+    try:
+        error_data = response.json().get("detail", "Unknown error")
+        st.error(f"Spotify service error: {error_data}")
+    except Exception as e:
+        st.error(f"Error processing response: {str(e)}")
 
-# Try to import database functions
-try:
-    # Add the project root directory to the Python path
-    project_root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
-    sys.path.append(project_root_path)
-    from src.database import get_database_connection, check_user_cred
-except Exception as e:
-    print(f"Database connection failed: {e}")
-    DB_AVAILABLE = False
+def get_recommendations(username: str, mood: str):
+    """Get music recommendations with simplified error handling"""
+    try:
+        return utils.recommend(username, mood)
+    except ServiceError as e:
+        st.error(f"Could not get music recommendations: {e.detail}")
+        return None
+    except Exception as e:
+        st.error(f"Connection error: Please make sure all services are running")
+        logger.warning("Recommendation request failed: %s", e)
+        return None
+
+def show_home_page():
+    st.title("SonicSoul - Music for Every Mood 🎵")
+    
+    # Check if user is logged in
+    if "username" not in st.session_state:
+        st.warning("Please log in to access music recommendations")
+        return
+    
+    # Check Spotify connection
+    if not check_spotify_connection():
+        st.error("Unable to connect to Spotify service. Please try again later.")
+        return
+    
+    # Display main content
+    show_mood_selection()
+    
+def show_mood_selection():
+    """Display mood selection and handle recommendations"""
+    st.subheader("How are you feeling today?")
+    
+    # Text input for mood description
+    user_text_input = st.text_input("Tell me how you're feeling:", key="mood_input")
+    
+    # Show available moods as reference
+    try:
+        st.info(f"I can understand these moods: {', '.join(utils.available_moods())}")
+    except Exception:
+        pass
+
+    if user_text_input:
+        try:
+            # First, predict sentiment using chatbot service
+            try:
+                sentiment = utils.predict_sentiment(user_text_input)
+            except ServiceError:
+                st.error("Failed to analyze your mood. Please try again.")
+                return
+            st.success(f"I sense that you're feeling: {sentiment}")
+
+            # Get recommendations based on detected mood
+            try:
+                display_recommendations(utils.recommend(st.session_state.username, sentiment.lower()), sentiment.lower())
+            except ServiceError as e:
+                st.error("Failed to get recommendations. Please try again.")
+                if e.status_code == 404:
+                    st.info("Hint: Try expressing your mood differently - I understand positive, negative, neutral, energetic, and relaxed feelings best.")
+
+        except Exception as e:
+            st.error(f"Error getting recommendations: {str(e)}")
+            logger.warning("Recommendation error: %s", e)
+
+def recall(name: str, key: str):
+    """The result stored by remember() under `name`, if it was fetched for this same input"""
+    stored = st.session_state.get(name)
+    return stored[1] if stored is not None and stored[0] == key else None
+
+def remember(name: str, key: str, value):
+    if value is not None:
+        st.session_state[name] = (key, value)
+    return value
+
+def remembered(name: str, key: str, fetch):
+    """
+    fetch() once per input. Streamlit reruns the whole script on every click, so a
+    Like button would otherwise refetch, and replace, the playlist being rated.
+    Failures (None or an exception) aren't kept, so the next run retries.
+    """
+    value = recall(name, key)
+    return value if value is not None else remember(name, key, fetch())
+
+def file_digest(uploaded) -> str:
+    return hashlib.blake2b(uploaded.getvalue(), digest_size=16).hexdigest()
+
+def send_track_feedback(track, mood: str, signal: str):
+    """Button callback: tell the recommender what the user thought of a track"""
+    token = st.session_state.get("session_token")
+    if not token:
+        return  # demo mode has no session
+    try:
+        utils.send_feedback(token, track, mood, signal)
+        st.toast("Thanks! Your next playlists will take this into account.")
+    except ServiceError as e:
+        logger.warning("Feedback for track %s rejected: %s", track.get("id"), e)
+        if e.status_code == 401:
+            st.toast("Your session has expired. Please log in again to rate tracks.", icon="⚠️")
+        else:
+            st.toast(f"Could not save your feedback: {e.detail}", icon="⚠️")
+    except Exception as e:
+        logger.warning("Could not send feedback for track %s: %s", track.get("id"), e)
+        st.toast("Could not save your feedback. Please try again.", icon="⚠️")
+
+def feedback_buttons(track, mood: str, key: str):
+    """Like / skip buttons under a track; feed the recommender's per-user affinities"""
+    if not track.get("id") or not st.session_state.get("session_token"):
+        return
+    like, skip = st.columns(2)
+    like.button("👍 Like", key=f"like-{key}-{track['id']}", on_click=send_track_feedback, args=(track, mood, "like"))
+    skip.button("⏭ Skip", key=f"skip-{key}-{track['id']}", on_click=send_track_feedback, args=(track, mood, "skip"))
+
+def display_recommendations(recommendations, mood: str = "neutral"):
+    """Display the recommended tracks in a nice format"""
+    if not recommendations:
+        st.warning("No recommendations available at the moment.")
+        return
+        
+    st.subheader("Your Personalized Recommendations")
+    
+    for track in recommendations:
+        col1, col2 = st.columns([1, 3])
+        
+        with col1:
+            if track.get("album_image"):
+                st.image(track["album_image"], width=100)
+        
+        with col2:
+            st.write(f"**{track['name']}**")
+            st.write(f"Artist: {track['artists'] if isinstance(track.get('artists'), list) else track.get('artist', 'Unknown')}")
+            st.write(f"Album: {track.get('album', 'Unknown')}")
+            if track.get("preview_url"):
+                st.audio(track["preview_url"])
+            if track.get("external_url"):
+                st.markdown(f"[Open in Spotify]({track['external_url']})")
+            feedback_buttons(track, mood, "recommendations")
+            
+        st.markdown("---")
 
 # Set up Streamlit page
 st.set_page_config(page_title="SonicSoul Home", page_icon="🎵", layout="wide")
@@ -46,14 +213,15 @@ if 'logged_in' not in st.session_state:
 if 'selected' not in st.session_state:
     st.session_state.selected = "Home"
 if 'demo_mode' not in st.session_state:
-    st.session_state.demo_mode = not DB_AVAILABLE
+    st.session_state.demo_mode = False
 
 # --- LOGIN PAGE LOGIC ---
+# Credentials are checked by the recommender's /auth/login; the frontend never talks to MySQL
 if not st.session_state.logged_in:
     st.title("Login to SonicSoul")
 
-    if not DB_AVAILABLE:
-        st.warning("⚠️ Database connection unavailable. Running in demo mode.")
+    if st.session_state.demo_mode:
+        st.warning("⚠️ Login service unavailable. Running in demo mode.")
         if st.button("Continue in Demo Mode"):
             st.session_state.logged_in = True
             st.session_state.username = "demo_user"
@@ -67,41 +235,35 @@ if not st.session_state.logged_in:
 
         if st.button("Login"):
             try:
-                # Connect to the database
-                conn = get_database_connection()
-                cursor = conn.cursor()
-
-                # Check if user credentials are correct
-                if check_user_cred(username, password):
-                    st.session_state.logged_in = True
-                    st.session_state.username = username
-                    st.session_state.selected = "Home"
-                    st.success("Login successful! Initializing Spotify...")
-
-                    # Initialize Spotify connection
-                    if check_spotify_connection():
-                        st.success("Connected to Spotify!")
-                    else:
-                        st.warning("Using limited Spotify functionality")
-                    
-                    cursor.close()
-                    conn.close()
-                    st.rerun()
-                else:
+                # One round trip: pooled credential check, signed session token back
+                session_info = utils.login(username, password)
+                st.session_state.logged_in = True
+                st.session_state.username = username
+                st.session_state.session_token = session_info["token"]
+                st.session_state.selected = "Home"
+                # Spotify readiness is checked in the background and shown once known
+                st.session_state.spotify_check = utils.submit(utils.spotify_available)
+                st.rerun()
+            except ServiceError as e:
+                if e.status_code == 401:
                     st.error("Invalid username or password.")
-                    cursor.close()
-                    conn.close()
-            except Exception as e:
-                st.error("Database connection error. Try demo mode instead.")
-                st.session_state.demo_mode = True
-                if st.button("Switch to Demo Mode"):
-                    st.session_state.logged_in = True
-                    st.session_state.username = "demo_user"
-                    st.session_state.selected = "Home"
+                elif e.status_code == 429:
+                    st.error("Too many login attempts. Please wait a moment and try again.")
+                else:
+                    st.session_state.demo_mode = True
                     st.rerun()
+            except requests.exceptions.RequestException:
+                st.session_state.demo_mode = True
+                st.rerun()
 
     st.stop()  # Prevent the rest of the page from rendering if not logged in
 
+# The session token identifies the user to the backends: personalisation, and rate limits
+# per user rather than for the whole frontend
+if st.session_state.get("session_token"):
+    request_headers["Authorization"] = f"Bearer {st.session_state.session_token}"
+utils.set_request_headers(request_headers)
+
 # --- SIDEBAR MENU ---
 with st.sidebar:
     selected = option_menu(
@@ -136,6 +298,13 @@ with st.sidebar:
     )
     st.session_state.selected = selected
 
+    spotify_check = st.session_state.get("spotify_check")
+    if spotify_check is not None and spotify_check.done():
+        if spotify_check.exception() is None and spotify_check.result():
+            st.caption("🟢 Connected to Spotify")
+        else:
+            st.caption("🟠 Using limited Spotify functionality")
+
 # --- MAIN PAGE CONTENT ---
 st.title("🎵 SonicSoul")
 st.subheader("Your AI-powered music companion")
@@ -180,100 +349,109 @@ elif st.session_state.selected == "AI Text Playlist Recommender":
         """
     )
 
-    # Get available moods for reference
-    try:
-        moods_response = session.get(f"{MUSIC_RECOMMENDER_URL}/available-moods")
-        if moods_response.status_code == 200:
-            available_moods = moods_response.json()["moods"]
-            st.info(f"Supported moods: {', '.join(available_moods)}")
-    except Exception as e:
-        st.warning(f"Could not fetch available moods: {str(e)}")
-
+    # Get available moods for reference (shown above the input, filled in once fetched)
+    moods_slot = st.empty()
     user_text_input = st.text_input("Tell me how you're feeling:")
+
+    # The mood list (cached) and the recommendation are independent: fetch them together.
+    # Worker threads can't read st.session_state, so the username is captured here
+    username = st.session_state.username
+    calls = [utils.available_moods]
+    # Kept across reruns (e.g. a Like click) so the playlist being rated stays put
+    stored_result = recall("text_playlist", user_text_input) if user_text_input else None
+    if user_text_input and stored_result is None:
+        calls.append(lambda: utils.recommend_from_text(username, user_text_input))
+    results = utils.gather(*calls)
+    available_moods = results[0]
+    if isinstance(available_moods, Exception):
+        moods_slot.warning(f"Could not fetch available moods: {str(available_moods)}")
+    else:
+        moods_slot.info(f"Supported moods: {', '.join(available_moods)}")
+
     if user_text_input:
         try:
-            # First, predict sentiment using chatbot service
-            sentiment_response = session.post(
-                f"{CHATBOT_URL}/predictsentiment", 
-                json={"text": user_text_input}
-            )
-            
-            if sentiment_response.status_code == 200:
-                sentiment = sentiment_response.json()['sentiment']
-                st.success(f"I sense that you're feeling: {sentiment}")
-                
-                # Then, get music recommendations using the detected mood
-                try:
-                    print(f"Requesting recommendations for mood: {sentiment}")
-                    recommendations_response = session.post(
-                        f"{MUSIC_RECOMMENDER_URL}/recommend",
-                        json={"mood": sentiment.lower(), "username": st.session_state.username}
-                    )
-                    
-                    if recommendations_response.status_code == 200:
-                        tracks = recommendations_response.json()
-                        st.subheader("🎵 Your Personalized Playlist")
-                        for track in tracks:
-                            col1, col2 = st.columns([4, 1])
-                            with col1:
-                                st.markdown(f"**{track['name']}** by {', '.join(track['artists'])}")
-                                if track['preview_url']:
-                                    st.audio(track['preview_url'])
-                            with col2:
-                                st.markdown(f"[Open in Spotify]({track['external_url']})")
-                            st.divider()
-                    elif recommendations_response.status_code == 401:
-                        st.error("Spotify service unavailable. Please try again later.")
-                    else:
-                        error_msg = recommendations_response.json().get('detail', 'Unknown error occurred')
-                        st.error(f"Could not get music recommendations: {error_msg}")
-                        print(f"Error response from music recommender: {recommendations_response.text}")
-                        # Show supported moods if available
-                        try:
-                            moods_response = session.get(f"{MUSIC_RECOMMENDER_URL}/available-moods")
-                            if moods_response.status_code == 200:
-                                available_moods = moods_response.json()["moods"]
-                                st.info(f"Hint: Try expressing how you feel using one of these moods: {', '.join(available_moods)}")
-                        except Exception:
-                            pass
-                except requests.exceptions.Timeout:
-                    st.error("Request timed out. Please try again.")
-                except requests.exceptions.RequestException as e:
-                    st.error(f"Network error occurred: {str(e)}")
-                except Exception as e:
-                    st.error(f"An unexpected error occurred: {str(e)}")
-                    print(f"Unexpected error in recommendation flow: {str(e)}")
+            # Mood detection and recommendations in one hop; the chatbot prefetches while it classifies
+            result = stored_result if stored_result is not None else results[1]
+            if isinstance(result, Exception):
+                raise result
+            remember("text_playlist", user_text_input, result)
+            sentiment = result['sentiment']
+            st.success(f"I sense that you're feeling: {sentiment}")
+
+            tracks = result['tracks']
+            st.subheader("🎵 Your Personalized Playlist")
+            for track in tracks:
+                col1, col2 = st.columns([4, 1])
+                with col1:
+                    st.markdown(f"**{track['name']}** by {', '.join(track['artists'])}")
+                    if track['preview_url']:
+                        st.audio(track['preview_url'])
+                with col2:
+                    st.markdown(f"[Open in Spotify]({track['external_url']})")
+                    feedback_buttons(track, sentiment, "text")
+                st.divider()
+        except ServiceError as e:
+            if e.status_code == 401:
+                st.error("Spotify service unavailable. Please try again later.")
             else:
-                st.error("Failed to analyze your mood. Please try again.")
+                st.error(f"Could not get music recommendations: {e.detail}")
+                logger.warning("Error response from recommend-from-text: %s", e)
+                # Show supported moods if available
+                if not isinstance(available_moods, Exception):
+                    st.info(f"Hint: Try expressing how you feel using one of these moods: {', '.join(available_moods)}")
+        except requests.exceptions.Timeout:
+            st.error("Request timed out. Please try again.")
+        except requests.exceptions.RequestException as e:
+            st.error(f"Network error occurred: {str(e)}")
         except Exception as e:
-            st.error(f"API call failed: {e}")
+            st.error(f"An unexpected error occurred: {str(e)}")
+            logger.exception("Unexpected error in recommendation flow: %s", e)
             
         st.markdown("---")
         st.info("💡 Not seeing what you like? Try expressing your mood differently or check out the Voice and Image recommenders!")
             
 elif st.session_state.selected == "AI Voice Playlist Recommender":
-    st.header("Chat with SonicSoul Assistant")
-    chat_input = st.text_input("You:", key="chat_input")
-    if chat_input:
+    st.header("AI Voice Playlist Recommender")
+    st.write("Upload a short voice recording (WAV) and I'll recommend music for the mood I hear.")
+    audio_file = st.file_uploader("Voice recording", type=["wav"], key="voice_upload")
+    if audio_file is not None:
         try:
-            response = requests.post("http://chatbot:5000/voice", json={"text": chat_input})
-            if response.status_code == 200:
-                st.markdown(f"**Assistant:** {response.json()['reply']}")
-            else:
-                st.error("Failed to get a response from the assistant.")
+            # Analysed once per recording; reruns (e.g. a Like click) reuse the result
+            digest = file_digest(audio_file)
+
+            def analyse_voice():
+                audio_file.seek(0)
+                # The file is streamed to the voice service, which classifies it while it uploads
+                return utils.voice_mood(iter(lambda: audio_file.read(64 * 1024), b""))
+
+            sentiment = remembered("voice_mood", digest, analyse_voice)
+            st.success(f"I hear that you're feeling: {sentiment}")
+            username = st.session_state.username
+            tracks = remembered("voice_playlist", digest, lambda: get_recommendations(username, sentiment))
+            if tracks:
+                display_recommendations(tracks, sentiment)
+        except ServiceError as e:
+            st.error(f"Failed to analyze your voice: {e.detail}")
         except Exception as e:
             st.error(f"API call failed: {e}")
 
 elif st.session_state.selected == "AI Image Playlist Recommender":
-    st.header("Chat with SonicSoul Assistant")
-    chat_input = st.text_input("You:", key="chat_input")
-    if chat_input:
+    st.header("AI Image Playlist Recommender")
+    st.write("Upload a photo of yourself and I'll recommend music for the mood on your face.")
+    image_file = st.file_uploader("Photo", type=["jpg", "jpeg", "png"], key="image_upload")
+    if image_file is not None:
         try:
-            response = requests.post("http://chatbot:5000/image", json={"text": chat_input})
-            if response.status_code == 200:
-                st.markdown(f"**Assistant:** {response.json()['reply']}")
-            else:
-                st.error("Failed to get a response from the assistant.")
+            # Analysed once per photo; reruns (e.g. a Like click) reuse the result
+            digest = file_digest(image_file)
+            sentiment = remembered("image_mood", digest,
+                                   lambda: utils.image_mood(image_file.name, image_file.getvalue(), image_file.type))
+            st.success(f"You look like you're feeling: {sentiment}")
+            username = st.session_state.username
+            tracks = remembered("image_playlist", digest, lambda: get_recommendations(username, sentiment))
+            if tracks:
+                display_recommendations(tracks, sentiment)
+        except ServiceError as e:
+            st.error(f"Failed to analyze your photo: {e.detail}")
         except Exception as e:
             st.error(f"API call failed: {e}")
             
@@ -282,11 +460,15 @@ elif st.session_state.selected == "Chat with Assistant":
     chat_input = st.text_input("You:", key="chat_input")
     if chat_input:
         try:
-            response = requests.post("http://chatbot:5000/chat", json={"text": chat_input})
-            if response.status_code == 200:
-                st.markdown(f"**Assistant:** {response.json()['reply']}")
-            else:
-                st.error("Failed to get a response from the assistant.")
+            # Stream tokens as they are generated instead of waiting for the full reply
+            # One conversation per browser session so the assistant keeps context across messages
+            if 'chat_session_id' not in st.session_state:
+                st.session_state.chat_session_id = uuid.uuid4().hex
+            with utils.chat_stream(chat_input, st.session_state.chat_session_id) as response:
+                st.markdown("**Assistant:**")
+                st.write_stream(stream_chat_tokens(response))
+        except ServiceError:
+            st.error("Failed to get a response from the assistant.")
         except Exception as e:
             st.error(f"API call failed: {e}")
             
@@ -295,141 +477,3 @@ elif st.session_state.selected == "About":
 
 st.markdown("---")
 st.info("Select a feature from the sidebar to get started!")
-
-def init_spotify():
-    """Initialize Spotify service connection"""
-    return check_spotify_connection()
-
-def check_spotify_connection():
-    """Check if Spotify service is available and working"""
-    try:
-        response = session.get(f"{MUSIC_RECOMMENDER_URL}/spotify/check")
-        if response.status_code == 200:
-            return True
-        else:
-            error_msg = response.json().get('detail', 'Unknown error')
-            print(f"Spotify connection check failed: {error_msg}")  # Debug log
-            return False
-    except Exception as e:
-        print(f"Error checking Spotify connection: {str(e)}")  # Debug log
-        st.error(f"Spotify service error: {str(e)}")
-        return False
-
-def process_spotify_error(response):
-    """Handle Spotify service errors"""
-    try:
-        error_data = response.json().get("detail", "Unknown error")
-        st.error(f"Spotify service error: {error_data}")
-    except Exception as e:
-        st.error(f"Error processing response: {str(e)}")
-
-def get_recommendations(username: str, mood: str):
-    """Get music recommendations with simplified error handling"""
-    try:
-        response = session.post(
-            f"{MUSIC_RECOMMENDER_URL}/recommend",
-            json={"username": username, "mood": mood},
-            timeout=10
-        )
-        
-        if response.status_code == 200:
-            return response.json()
-        else:
-            error_msg = response.json().get('detail', 'Unknown error occurred')
-            st.error(f"Could not get music recommendations: {error_msg}")
-            return None
-            
-    except Exception as e:
-        st.error(f"Connection error: Please make sure all services are running")
-        print(f"Error details: {str(e)}")
-        return None
-
-def show_home_page():
-    st.title("SonicSoul - Music for Every Mood 🎵")
-    
-    # Check if user is logged in
-    if "username" not in st.session_state:
-        st.warning("Please log in to access music recommendations")
-        return
-    
-    # Check Spotify connection
-    if not check_spotify_connection():
-        st.error("Unable to connect to Spotify service. Please try again later.")
-        return
-    
-    # Display main content
-    show_mood_selection()
-    
-def show_mood_selection():
-    """Display mood selection and handle recommendations"""
-    st.subheader("How are you feeling today?")
-    
-    # Text input for mood description
-    user_text_input = st.text_input("Tell me how you're feeling:", key="mood_input")
-    
-    # Show available moods as reference
-    try:
-        moods_response = session.get(f"{MUSIC_RECOMMENDER_URL}/available-moods")
-        if moods_response.status_code == 200:
-            available_moods = moods_response.json()["moods"]
-            st.info(f"I can understand these moods: {', '.join(available_moods)}")
-    except Exception:
-        pass
-
-    if user_text_input:
-        try:
-            # First, predict sentiment using chatbot service
-            sentiment_response = session.post(
-                f"{CHATBOT_URL}/predictsentiment",
-                json={"text": user_text_input}
-            )
-
-            if sentiment_response.status_code == 200:
-                sentiment = sentiment_response.json()['sentiment']
-                st.success(f"I sense that you're feeling: {sentiment}")
-
-                # Get recommendations based on detected mood
-                response = session.post(
-                    f"{MUSIC_RECOMMENDER_URL}/recommend",
-                    json={"mood": sentiment.lower(), "username": st.session_state.username}
-                )
-
-                if response.status_code == 200:
-                    recommendations = response.json()
-                    display_recommendations(recommendations)
-                else:
-                    st.error("Failed to get recommendations. Please try again.")
-                    if response.status_code == 404:
-                        st.info("Hint: Try expressing your mood differently - I understand positive, negative, neutral, energetic, and relaxed feelings best.")
-            else:
-                st.error("Failed to analyze your mood. Please try again.")
-
-        except Exception as e:
-            st.error(f"Error getting recommendations: {str(e)}")
-            print(f"Recommendation error details: {str(e)}")  # Debug log
-
-def display_recommendations(recommendations):
-    """Display the recommended tracks in a nice format"""
-    if not recommendations:
-        st.warning("No recommendations available at the moment.")
-        return
-        
-    st.subheader("Your Personalized Recommendations")
-    
-    for track in recommendations:
-        col1, col2 = st.columns([1, 3])
-        
-        with col1:
-            if track.get("album_image"):
-                st.image(track["album_image"], width=100)
-        
-        with col2:
-            st.write(f"**{track['name']}**")
-            st.write(f"Artist: {track['artists'] if isinstance(track.get('artists'), list) else track.get('artist', 'Unknown')}")
-            st.write(f"Album: {track.get('album', 'Unknown')}")
-            if track.get("preview_url"):
-                st.audio(track["preview_url"])
-            if track.get("external_url"):
-                st.markdown(f"[Open in Spotify]({track['external_url']})")
-            
-        st.markdown("---")
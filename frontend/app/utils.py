@@ -0,0 +1,204 @@
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextvars import ContextVar, copy_context
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypedDict
+
+import requests
+from requests.adapters import HTTPAdapter, Retry
+
+# Time allowed to open a connection; read timeouts are per service below
+CONNECT_TIMEOUT_S = float(os.getenv("SERVICE_CONNECT_TIMEOUT_S", 3.05))
+
+# Headers of the current page run (trace context, username), added to every call
+_request_headers: ContextVar[Dict[str, str]] = ContextVar("request_headers", default={})
+
+
+class Track(TypedDict, total=False):
+    id: str
+    name: str
+    artists: List[str]
+    album: str
+    album_image: Optional[str]
+    preview_url: Optional[str]
+    external_url: str
+    genres: List[str]
+
+
+class TextRecommendation(TypedDict):
+    sentiment: str
+    tracks: List[Track]
+
+
+class SessionInfo(TypedDict):
+    token: str
+    username: str
+    user_id: Optional[int]
+    expires_at: int
+
+
+class ServiceError(Exception):
+    """A backend answered with an error status"""
+
+    def __init__(self, service: str, status_code: int, detail: str):
+        super().__init__(f"{service} returned {status_code}: {detail}")
+        self.service = service
+        self.status_code = status_code
+        self.detail = detail
+
+
+class TTLCache:
+    """Thread-safe cache of backend answers that rarely change; Streamlit serves every user from one process"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: Dict[Any, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, key, load: Callable[[], Any]):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        # Loaded outside the lock so a slow backend doesn't block readers of other keys;
+        # errors propagate and are not cached
+        value = load()
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+        return value
+
+
+class ServiceClient:
+    """
+    One backend service: a pooled session (kept alive across Streamlit reruns,
+    since this module is imported once per process), explicit connect/read
+    timeouts, and retries on gateway errors for idempotent requests only.
+    """
+
+    def __init__(self, name: str, base_url: str, read_timeout: float, pool_size: int = 10):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (CONNECT_TIMEOUT_S, read_timeout)
+        self.session = requests.Session()
+        # urllib3 never retries POST by default, so a retry can't repeat a side effect;
+        # 503s from load shedding are not retried, the backend asked us to back off
+        retries = Retry(total=3, backoff_factor=0.1, status_forcelist=(502, 504), raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retries)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def request(self, method: str, path: str, stream: bool = False, **kwargs) -> requests.Response:
+        headers = dict(_request_headers.get())
+        headers.update(kwargs.pop("headers", None) or {})
+        response = self.session.request(method, f"{self.base_url}{path}", headers=headers,
+                                        timeout=kwargs.pop("timeout", self.timeout), stream=stream, **kwargs)
+        if response.status_code >= 400:
+            try:
+                detail = response.json().get("detail", "Unknown error")
+            except ValueError:
+                detail = response.text[:200] or "Unknown error"
+            response.close()
+            raise ServiceError(self.name, response.status_code, str(detail))
+        return response
+
+    def get_json(self, path: str, **kwargs):
+        return self.request("GET", path, **kwargs).json()
+
+    def post_json(self, path: str, **kwargs):
+        return self.request("POST", path, **kwargs).json()
+
+
+chatbot = ServiceClient("chatbot", os.getenv("CHATBOT_URL", "http://localhost:5000"),
+                        read_timeout=float(os.getenv("CHATBOT_READ_TIMEOUT_S", 30)))
+recommender = ServiceClient("music-recommender", os.getenv("MUSIC_RECOMMENDER_URL", "http://localhost:5001"),
+                            read_timeout=float(os.getenv("RECOMMENDER_READ_TIMEOUT_S", 10)))
+emotion_voice = ServiceClient("emotion-voice", os.getenv("EMOTION_VOICE_URL", "http://localhost:5002"),
+                              read_timeout=float(os.getenv("EMOTION_READ_TIMEOUT_S", 30)))
+emotion_image = ServiceClient("emotion-image", os.getenv("EMOTION_IMAGE_URL", "http://localhost:5003"),
+                              read_timeout=float(os.getenv("EMOTION_READ_TIMEOUT_S", 30)))
+
+# Static answers: the mood list only changes on deploy, Spotify status is already cached server-side
+_moods_cache = TTLCache(ttl=float(os.getenv("MOODS_CACHE_TTL_S", 300)))
+_spotify_status_cache = TTLCache(ttl=float(os.getenv("SPOTIFY_STATUS_CACHE_TTL_S", 30)))
+
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="frontend-calls")
+
+
+def set_request_headers(headers: Dict[str, str]):
+    """Headers for every backend call made by this page run"""
+    _request_headers.set(dict(headers))
+
+
+def submit(call: Callable[[], Any]) -> Future:
+    """Start a backend call without waiting for it, e.g. to keep in st.session_state"""
+    return _executor.submit(copy_context().run, call)
+
+
+def gather(*calls: Callable[[], Any]) -> List[Any]:
+    """
+    Run independent backend calls at the same time. Like
+    asyncio.gather(return_exceptions=True): a failed call's exception is
+    returned in its place, so one failure doesn't hide the other results.
+    """
+    futures = [submit(call) for call in calls]
+    return [future.exception() or future.result() for future in futures]
+
+
+def login(username: str, password: str) -> SessionInfo:
+    """Check credentials with the recommender; raises ServiceError(401) if they are wrong"""
+    return recommender.post_json("/auth/login", json={"username": username, "password": password})
+
+
+def available_moods() -> List[str]:
+    return _moods_cache.get_or_load("moods", lambda: recommender.get_json("/available-moods")["moods"])
+
+
+def spotify_available() -> bool:
+    def check():
+        try:
+            recommender.request("GET", "/spotify/check").close()
+            return True
+        except ServiceError:
+            return False
+    return _spotify_status_cache.get_or_load("spotify", check)
+
+
+def recommend(username: str, mood: str) -> List[Track]:
+    return recommender.post_json("/recommend", json={"username": username, "mood": mood})
+
+
+def recommend_from_text(username: str, text: str) -> TextRecommendation:
+    return chatbot.post_json("/recommend-from-text", json={"text": text, "username": username})
+
+
+def predict_sentiment(text: str) -> str:
+    return chatbot.post_json("/predictsentiment", json={"text": text})["sentiment"]
+
+
+def voice_mood(chunks: Iterator[bytes]) -> str:
+    return emotion_voice.post_json("/voice", data=chunks, headers={"Content-Type": "audio/wav"})["mood"]
+
+
+def image_mood(name: str, content, content_type: str) -> str:
+    return emotion_image.post_json("/image", files={"file": (name, content, content_type)})["mood"]
+
+
+def send_feedback(session_token: str, track: Track, mood: str, signal: str) -> dict:
+    """Like/play/skip of a track; the token is passed in because Streamlit callbacks run before the page sets its headers"""
+    body = {
+        "track": {"id": track["id"], "name": track["name"], "artists": track.get("artists") or [],
+                  "genres": track.get("genres") or []},
+        "mood": mood,
+        "signal": signal,
+    }
+    return recommender.post_json("/feedback", json=body, headers={"Authorization": f"Bearer {session_token}"})
+
+
+def chat_stream(text: str, session_id: str) -> requests.Response:
+    """The open /chat/stream response; the read timeout applies between tokens, not to the whole reply"""
+    return chatbot.request("POST", "/chat/stream", json={"text": text, "session_id": session_id}, stream=True)
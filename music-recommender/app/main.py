@@ -1,51 +1,215 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Request
 import os
 import sys
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic import BaseModel
 import spotipy
 import json
 import random
 
+project_root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root_path)
+from src.database import ping_database
+from src.logging.logger import configure_logging, get_logger
+from src.middleware.ab_testing import TREATMENT, Experiment
+from src.middleware.health_check import STATUS_DEGRADED, STATUS_DOWN, STATUS_OK, DependencyProbe, HealthMonitor, install_health_checks
+from src.middleware.maintenance import install_load_shedding
+from src.middleware.metrics import REGISTRY
+from src.middleware.monitoring import install_monitoring
+from src.middleware.rate_limiter import RateLimit, RateLimitMiddleware, create_bucket_store
+from src.middleware.response_handler import FastJSONResponse
+from src.middleware.stack import install_middleware_stack
+from src.middleware.tracing import TracingMiddleware, configure_tracing
+from src.models.music import FEATURES, CatalogRefresher, CatalogStore, collect_catalog_tracks, mood_target
+from src.models.user import SIGNALS, AffinityModel, MusicDataFeed, record_feedback
+from src.routes.user import require_session, router as user_router, verify_session_token
+from src.utils.spotify_scheduler import PRIORITY_BACKGROUND, ScheduledSpotify, SpotifyBusyError, SpotifyScheduler, spotify_session
+
 # Import get_token from your spotify_auth.py
 try:
     from .spotify_auth import get_token
 except ImportError:
     from spotify_auth import get_token
 
+configure_logging("music-recommender")
+logger = get_logger("music_recommender")
+
 # Initialize FastAPI app
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
+
+# Keep bursts of traffic inside the Spotify quota; a /recommend costs roughly ten Spotify calls.
+# Override with "rate,burst" (requests per second, bucket size) in the RATE_LIMIT_* variables.
+app.add_middleware(
+    RateLimitMiddleware,
+    limits={
+        "/recommend": RateLimit.from_env("RATE_LIMIT_RECOMMEND", 2, 10),
+        "/search": RateLimit.from_env("RATE_LIMIT_SEARCH", 5, 20, name="spotify-lookup"),
+        "/artist": RateLimit.from_env("RATE_LIMIT_SEARCH", 5, 20, name="spotify-lookup"),
+        # Logins all arrive from the frontend's address before anyone has a session, so a
+        # per-caller bucket would be one bucket for everyone; /auth/login limits per account instead
+        "/auth/login": RateLimit.from_env("RATE_LIMIT_LOGIN", 20, 50, per_caller=False),
+    },
+    per_user=RateLimit.from_env("RATE_LIMIT_PER_USER", 0.5, 5),
+    store=create_bucket_store(),
+)
+# Shed load above an in-flight limit that adapts to latency, so a slow Spotify
+# can't pile up requests; also provides the /admin/maintenance drain switch
+install_load_shedding(app)
+# Personalised ranking is an experiment: PERSONALIZATION_ROLLOUT percent of users get it
+PERSONALIZATION_FEATURE = "personalization"
+features = install_monitoring(app, default_features={
+    PERSONALIZATION_FEATURE: {"enabled": True, "rollout": float(os.getenv("PERSONALIZATION_ROLLOUT", 100))},
+})
+personalization = Experiment(features, PERSONALIZATION_FEATURE)
+
+configure_tracing("music-recommender")
+app.add_middleware(TracingMiddleware)
+# Outermost: error handling, security headers, request ids and body checks
+install_middleware_stack(app)
+
+# Every Spotify call goes through one scheduler: a global token bucket, priority
+# queueing (user requests first) and a shared pause when Spotify answers 429
+spotify_scheduler = SpotifyScheduler.from_env()
+spotify_http = spotify_session()
+
+# Seconds a client should wait before retrying when Spotify is over quota
+SPOTIFY_BUSY_RETRY_AFTER = "5"
+
+@app.on_event("shutdown")
+def stop_spotify_scheduler():
+    spotify_scheduler.shutdown()
+
+# Login for the frontend: pooled credential check, signed session token
+app.include_router(user_router)
 
 @app.get("/")
 async def root():
     """Root endpoint for health checks"""
     return {"status": "ok", "service": "music-recommender"}
 
+def probe_spotify():
+    sp = get_spotify()
+    if not sp:
+        raise RuntimeError("Could not initialize Spotify client")
+    # Background priority: health checks never take quota ahead of user requests
+    sp.with_priority(PRIORITY_BACKGROUND).recommendation_genre_seeds()
+
+# Dependencies are probed in the background; /health/ready and /spotify/check read the cached state
+health_monitor = HealthMonitor("music-recommender", [
+    DependencyProbe("spotify", probe_spotify, interval=float(os.getenv("HEALTH_SPOTIFY_INTERVAL_S", 60)), timeout=10),
+    DependencyProbe("mysql", ping_database, interval=float(os.getenv("HEALTH_MYSQL_INTERVAL_S", 30)), critical=False),
+])
+install_health_checks(app, health_monitor)
+
+# Offline catalog of tracks per mood, memory-mapped from disk; /recommend falls back to it
+# when Spotify is down or over quota. Rebuilt every CATALOG_REFRESH_S seconds (0 disables).
+CATALOG_SERVED = REGISTRY.counter(
+    "catalog_recommendations_total", "Recommendations served from the offline catalog", ("reason",)
+)
+catalogs = CatalogStore.from_env()
+
+def find_catalog_tracks(mood: str) -> List[dict]:
+    """Top tracks of artists matching the mood, fetched at background priority"""
+    sp = get_spotify()
+    if not sp:
+        raise RuntimeError("Could not initialize Spotify client")
+    sp = sp.with_priority(PRIORITY_BACKGROUND)
+    tracks = []
+    for artist in get_artists_by_genre(sp, MOOD_TO_ARTIST_GENRES[mood]):
+        try:
+            tracks.extend(with_genres(sp.artist_top_tracks(artist["id"], country="US").get("tracks", []),
+                                      artist.get("genres", [])))
+        except SpotifyBusyError as e:
+            logger.warning("Spotify busy, catalog refresh for %s stops at %s tracks: %s", mood, len(tracks), e)
+            break
+        except Exception as e:
+            logger.warning("Catalog refresh: no top tracks for %s: %s", artist.get("name"), e)
+    return tracks
+
+def collect_catalog() -> List[dict]:
+    sp = get_spotify()
+    if not sp:
+        raise RuntimeError("Could not initialize Spotify client")
+    return collect_catalog_tracks(find_catalog_tracks, sp.with_priority(PRIORITY_BACKGROUND).audio_features)
+
+catalog_refresher = CatalogRefresher(catalogs, collect_catalog, interval=float(os.getenv("CATALOG_REFRESH_S", 6 * 3600)))
+
+@app.on_event("startup")
+def start_catalog_refresh():
+    catalog_refresher.start()
+
+@app.on_event("shutdown")
+def stop_catalog_refresh():
+    catalog_refresher.stop()
+
+# Per-user artist/genre affinities, kept in step with music_data writes
+affinity = AffinityModel()
+affinity_feed = MusicDataFeed(affinity)
+
+@app.on_event("startup")
+def start_affinity_feed():
+    affinity_feed.start(float(os.getenv("USER_AFFINITY_SYNC_S", 10)))
+
+@app.on_event("shutdown")
+def stop_affinity_feed():
+    affinity_feed.stop()
+
+def session_user_id(http_request: Request) -> Optional[int]:
+    """The user id from an optional `Authorization: Bearer` session token"""
+    scheme, _, token = http_request.headers.get("Authorization", "").partition(" ")
+    claims = verify_session_token(token) if scheme.lower() == "bearer" and token else None
+    return claims.get("uid") if claims else None
+
+def personalize(user_id: Optional[int], tracks: List[dict]) -> List[dict]:
+    """Re-rank for users in the personalization arm; constant work per track, whatever the history"""
+    if user_id is None or personalization.variant(str(user_id)) != TREATMENT:
+        return tracks
+    with personalization.measure(TREATMENT):
+        return affinity.rerank(user_id, tracks)
+
+def catalog_response(mood: str, reason: str, distribution: Optional[Dict[str, float]] = None,
+                     user_id: Optional[int] = None):
+    """
+    Recommendations from the offline catalog, or None if it has nothing for the mood.
+    Tracks are picked by audio-feature distance to the (possibly blended) mood when
+    features are indexed, else sampled from the tracks filed under the mood.
+    """
+    catalog = catalogs.get()
+    if catalog is None:
+        return None
+    if catalog.index is not None and len(catalog.index):
+        tracks = catalog.index.recommend(mood_target(distribution or mood))
+    else:
+        tracks = catalog.sample(mood)
+    if not tracks:
+        return None
+    CATALOG_SERVED.inc(reason)
+    logger.info("Serving %s catalog tracks for %s (%s)", len(tracks), mood, reason)
+    return FastJSONResponse(personalize(user_id, tracks), headers={"X-Recommendation-Source": "catalog"})
+
+def with_genres(tracks: List[dict], genres: List[str]) -> List[dict]:
+    """Tag Spotify tracks with genres (tracks carry none of their own), for affinity scoring and feedback"""
+    return [{**track, "genres": list(genres)} for track in tracks if track]
+
 def get_spotify():
     """Initialize Spotify client with client credentials"""
     try:
-        print("Attempting to get Spotify access token...")
         access_token = get_token()
 
         if not access_token:
-            print("Failed to get access token from spotify_auth.get_token()")
+            logger.error("Failed to get access token from spotify_auth.get_token()")
             raise Exception("Failed to get access token using get_token()")
 
-        print(f"Successfully retrieved token (first 10 chars): {access_token[:10]}...")
-
-        # Initialize Spotify client with the token
-        sp = spotipy.Spotify(auth=access_token)
+        # Initialize Spotify client with the token. Never log the token or the session headers.
+        sp = spotipy.Spotify(auth=access_token, requests_session=spotify_http)
         sp._auth = access_token  # Set the token directly on the client
         sp._session.headers.update({"Authorization": f"Bearer {access_token}"})  # Update headers
 
-        # Log headers for debugging
-        print(f"Spotify client headers: {sp._session.headers}")
-
-        print("Spotify client created successfully with direct token")
-        return sp
+        logger.debug("Spotify client created successfully with direct token")
+        return ScheduledSpotify(sp, spotify_scheduler)
 
     except Exception as e:
-        print(f"Error creating Spotify client: {e}")
+        logger.error("Error creating Spotify client: %s", e)
         return None
     
     
@@ -90,21 +254,21 @@ MOOD_TO_ARTIST_GENRES = {
 def get_recommendations(sp: spotipy.Spotify, mood_params: dict) -> dict:
     """Get recommendations with error handling and fallback"""
     try:
-        print(f"\n=== Getting Recommendations for Mood Parameters: {mood_params} ===")
+        logger.info("Getting Recommendations for Mood Parameters: %s", mood_params)
         
         # Verify Spotify client
         if not sp or not hasattr(sp, '_auth'):
-            print("Error: Invalid Spotify client or missing auth token")
+            logger.error("Error: Invalid Spotify client or missing auth token")
             return None
 
         # Fetch available genres
         available_genres = sp.recommendation_genre_seeds()['genres']
-        print(f"Available genre seeds: {available_genres[:5]}...")
+        logger.debug("Available genre seeds: %s...", available_genres[:5])
 
         # Validate and filter seed genres
         seed_genres = [g for g in mood_params.get("seed_genres", ["pop"]) if g in available_genres]
         if not seed_genres:
-            print("No valid genres found, falling back to 'pop'")
+            logger.warning("No valid genres found, falling back to 'pop'")
             seed_genres = ["pop"]
 
         # Build recommendation parameters
@@ -119,24 +283,47 @@ def get_recommendations(sp: spotipy.Spotify, mood_params: dict) -> dict:
             if param in mood_params:
                 params[param] = mood_params[param]
 
-        print(f"Making recommendations request with params: {params}")
+        logger.debug("Making recommendations request with params: %s", params)
         recommendations = sp.recommendations(**params)
         
         if recommendations and recommendations.get('tracks'):
-            print(f"Successfully got {len(recommendations['tracks'])} recommendations")
+            logger.info("Successfully got %s recommendations", len(recommendations['tracks']))
             return recommendations
         else:
-            print("No tracks found in recommendations response")
+            logger.warning("No tracks found in recommendations response")
             return None
 
+    except SpotifyBusyError:
+        raise
     except Exception as e:
-        print(f"Error in get_recommendations: {str(e)}")
+        logger.error("Error in get_recommendations: %s", e)
         return None
 
 class MoodRequest(BaseModel):
     """Request model for mood-based recommendations"""
     mood: str  # Supported moods: positive, negative, neutral, energetic, relaxed
     username: str = "default"  # Optional username, defaults to "default"
+    # Optional blend from multi-modal detection, e.g. {"relaxed": 0.6, "negative": 0.4}
+    mood_distribution: Optional[Dict[str, float]] = None
+
+class FeedbackTrack(BaseModel):
+    id: str
+    name: str
+    artists: List[str]
+    genres: List[str] = []
+
+class FeedbackRequest(BaseModel):
+    """A like, play or skip of a recommended track"""
+    track: FeedbackTrack
+    mood: str
+    signal: str
+
+class NearestRequest(BaseModel):
+    """A point in audio-feature space: a mood, a mood blend, or explicit feature values"""
+    mood: Optional[str] = None
+    mood_distribution: Optional[Dict[str, float]] = None
+    target: Optional[Dict[str, float]] = None  # valence, energy, tempo, danceability; missing ones from `mood`
+    k: int = 15
 
 class TrackResponse(BaseModel):
     """Response model for track recommendations"""
@@ -145,21 +332,32 @@ class TrackResponse(BaseModel):
     artists: List[str]
     preview_url: Optional[str]
     external_url: str
+    genres: List[str] = []
 
 # Replace the existing recommend_tracks function
 
 @app.post("/recommend", response_model=List[TrackResponse])
-async def recommend_tracks(request: MoodRequest):
+def recommend_tracks(request: MoodRequest, http_request: Request):
     """Get diverse track recommendations based on mood"""
     try:
-        print(f"\n=== Getting recommendations for mood: {request.mood} ===")
+        logger.info("Getting recommendations for mood: %s", request.mood)
         
         mood = request.mood.lower()
+        user_id = session_user_id(http_request)
         if mood not in MOOD_TO_ARTIST_GENRES:  # Use existing MOOD_TO_ARTIST_GENRES for validation
             raise HTTPException(status_code=400, detail=f"Unsupported mood: {mood}")
         
+        # Spotify known to be down: answer from the catalog instead of waiting on it
+        if health_monitor.status("spotify")["status"] == STATUS_DOWN:
+            degraded = catalog_response(mood, "spotify_down", request.mood_distribution, user_id)
+            if degraded is not None:
+                return degraded
+
         sp = get_spotify()
         if not sp:
+            degraded = catalog_response(mood, "no_client", request.mood_distribution, user_id)
+            if degraded is not None:
+                return degraded
             raise HTTPException(
                 status_code=503,
                 detail="Could not initialize Spotify client"
@@ -169,27 +367,32 @@ async def recommend_tracks(request: MoodRequest):
         tracks = get_mood_based_recommendations(sp, mood)
         
         if not tracks:
+            degraded = catalog_response(mood, "no_tracks", request.mood_distribution, user_id)
+            if degraded is not None:
+                return degraded
             raise HTTPException(
                 status_code=404,
                 detail="No recommendations found for the given mood"
             )
 
-        # Process tracks
+        # Process tracks. Plain dicts in the TrackResponse shape: the data comes straight
+        # from Spotify, so it goes out without a second pass through response_model.
         processed_tracks = []
         for track in tracks:  # Changed from diverse_tracks to tracks
             if not track: 
                 continue
             try:
-                track_data = TrackResponse(
-                    id=track["id"],
-                    name=track["name"],
-                    artists=[artist["name"] for artist in track["artists"]],
-                    preview_url=track.get("preview_url"),
-                    external_url=track["external_urls"]["spotify"]
-                )
+                track_data = {
+                    "id": track["id"],
+                    "name": track["name"],
+                    "artists": [artist["name"] for artist in track["artists"]],
+                    "preview_url": track.get("preview_url"),
+                    "external_url": track["external_urls"]["spotify"],
+                    "genres": track.get("genres") or [],
+                }
                 processed_tracks.append(track_data)
             except (KeyError, TypeError) as e:
-                print(f"Error processing track data: {e}")
+                logger.warning("Error processing track data: %s", e)
                 continue
 
         if not processed_tracks:
@@ -198,24 +401,78 @@ async def recommend_tracks(request: MoodRequest):
                 detail="No suitable tracks found after processing"
             )
 
-        return processed_tracks
+        return FastJSONResponse(personalize(user_id, processed_tracks))
 
     except HTTPException:
         raise
+    except SpotifyBusyError as e:
+        logger.warning("Spotify over quota: %s", e)
+        degraded = catalog_response(mood, "spotify_busy", request.mood_distribution, user_id)
+        if degraded is not None:
+            return degraded
+        raise HTTPException(
+            status_code=503,
+            detail="Spotify is busy, please retry shortly",
+            headers={"Retry-After": SPOTIFY_BUSY_RETRY_AFTER}
+        )
     except Exception as e:
-        print(f"Unexpected error: {str(e)}")
+        logger.exception("Unexpected error: %s", e)
         raise HTTPException(
             status_code=500,
             detail="An unexpected server error occurred"
         )
 
+@app.post("/feedback")
+def track_feedback(request: FeedbackRequest, session: dict = Depends(require_session)):
+    """Record a like/play/skip: one music_data row, folded into the user's affinities right away"""
+    mood = request.mood.lower()
+    if request.signal not in SIGNALS:
+        raise HTTPException(status_code=400, detail=f"Unsupported signal: {request.signal}")
+    if mood not in MOOD_TO_ARTIST_GENRES:
+        raise HTTPException(status_code=400, detail=f"Unsupported mood: {mood}")
+    user_id = session.get("uid")
+    if user_id is None:
+        raise HTTPException(status_code=403, detail="Session has no user id")
+    try:
+        record_feedback(user_id, request.track.model_dump(), mood, request.signal)
+    except Exception as e:
+        logger.error("Could not record feedback: %s", e)
+        raise HTTPException(status_code=503, detail="Could not record feedback")
+    # The row is stored from here on: a failed sync must not invite a retry that would
+    # write it twice, and the background poll applies it anyway
+    try:
+        # Applies this row (and any other new ones) past the feed's high-water mark
+        affinity_feed.sync()
+    except Exception as e:
+        logger.warning("Feedback recorded, affinity sync deferred to the background poll: %s", e)
+    personalization.record(personalization.assignment(str(user_id)), request.signal)
+    return {"status": "recorded", "signals": affinity.mood_signals(user_id).get(mood, {})}
+
+@app.post("/catalog/nearest")
+def nearest_tracks(request: NearestRequest):
+    """k nearest catalog tracks to a mood, a blended mood or a feature vector; served locally, no Spotify call"""
+    if request.mood is not None and request.mood.lower() not in MOOD_TO_ARTIST_GENRES:
+        raise HTTPException(status_code=400, detail=f"Unsupported mood: {request.mood}")
+    if request.mood_distribution and not set(request.mood_distribution) <= set(MOOD_TO_ARTIST_GENRES):
+        raise HTTPException(status_code=400, detail="Unsupported mood in mood_distribution")
+    catalog = catalogs.get()
+    if catalog is None or catalog.index is None or not len(catalog.index):
+        raise HTTPException(status_code=503, detail="Track catalog is not available yet")
+
+    target = mood_target(request.mood_distribution or (request.mood or "neutral").lower())
+    for position, name in enumerate(FEATURES):
+        if request.target and name in request.target:
+            target[position] = request.target[name]
+    tracks = catalog.index.nearest(target, k=max(1, min(request.k, 100)))
+    return {"target": dict(zip(FEATURES, target.tolist())), "tracks": tracks}
+
 @app.get("/available-moods")
 async def get_available_moods():
     """Get list of supported moods"""
     return {"moods": list(MOOD_TO_MUSIC_PARAMS.keys())}
 
 @app.post("/spotify/auth") # This endpoint might be vestigial if only using client_credentials
-async def spotify_auth_check(request: MoodRequest): # Renamed from spotify_auth to avoid conflict
+def spotify_auth_check(request: MoodRequest): # Renamed from spotify_auth to avoid conflict
     """Check if Spotify client (using client credentials) works"""
     sp = get_spotify()
     if not sp:
@@ -233,14 +490,14 @@ async def spotify_auth_check(request: MoodRequest): # Renamed from spotify_auth
             "genres_count": len(available_genres.get('genres', [])) if available_genres else 0
         }
     except Exception as e:
-        print(f"Error testing Spotify client: {e}")
+        logger.error("Error testing Spotify client: %s", e)
         return {
             "auth_required": False,
             "message": f"Spotify client error: {str(e)}"
         }
         
 @app.get("/search")
-async def search_artist(query: str):
+def search_artist(query: str):
     """Search for an artist on Spotify"""
     try:
         sp = get_spotify()
@@ -251,7 +508,7 @@ async def search_artist(query: str):
             )
 
         # Perform the search
-        print(f"Searching for artist: {query}")
+        logger.info("Searching for artist: %s", query)
         results = sp.search(q=query, type="artist", limit=1)
         if not results or not results.get("artists", {}).get("items"):
             raise HTTPException(
@@ -270,14 +527,21 @@ async def search_artist(query: str):
             "external_url": artist["external_urls"]["spotify"]
         }
 
+    except SpotifyBusyError as e:
+        logger.warning("Spotify over quota during search: %s", e)
+        raise HTTPException(
+            status_code=503,
+            detail="Spotify is busy, please retry shortly",
+            headers={"Retry-After": SPOTIFY_BUSY_RETRY_AFTER}
+        )
     except spotipy.SpotifyException as se:
-        print(f"Spotify API error during search: {se}")
+        logger.error("Spotify API error during search: %s", se)
         raise HTTPException(
             status_code=se.http_status if hasattr(se, 'http_status') else 500,
             detail=f"Spotify API error: {se.msg if hasattr(se, 'msg') else str(se)}"
         )
     except Exception as e:
-        print(f"Unexpected error during search: {e}")
+        logger.exception("Unexpected error during search: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to search for artist: {str(e)}"
@@ -285,22 +549,22 @@ async def search_artist(query: str):
         
         
 @app.get("/artist/{artist_id}/top-tracks")
-async def get_top_tracks(artist_id: str):
+def get_top_tracks(artist_id: str):
     """Fetch an artist's top tracks from Spotify"""
     try:
-        print(f"Initializing Spotify client...")
+        logger.debug("Initializing Spotify client...")
         sp = get_spotify()
         if not sp:
-            print("Spotify client initialization failed.")
+            logger.error("Spotify client initialization failed.")
             raise HTTPException(
                 status_code=503,
                 detail="Could not initialize Spotify client. Spotify service might be down or credentials incorrect."
             )
 
-        print(f"Fetching top tracks for artist ID: {artist_id}")
+        logger.info("Fetching top tracks for artist ID: %s", artist_id)
         results = sp.artist_top_tracks(artist_id)
         if not results or not results.get("tracks"):
-            print(f"No top tracks found for artist ID: {artist_id}")
+            logger.warning("No top tracks found for artist ID: %s", artist_id)
             raise HTTPException(
                 status_code=404,
                 detail=f"No top tracks found for artist ID: {artist_id}"
@@ -310,14 +574,21 @@ async def get_top_tracks(artist_id: str):
         track_names = [track["name"] for track in results["tracks"]]
         return {"songs": track_names}
 
+    except SpotifyBusyError as e:
+        logger.warning("Spotify over quota during top tracks fetch: %s", e)
+        raise HTTPException(
+            status_code=503,
+            detail="Spotify is busy, please retry shortly",
+            headers={"Retry-After": SPOTIFY_BUSY_RETRY_AFTER}
+        )
     except spotipy.SpotifyException as se:
-        print(f"Spotify API error during top tracks fetch: {se}")
+        logger.error("Spotify API error during top tracks fetch: %s", se)
         raise HTTPException(
             status_code=se.http_status if hasattr(se, 'http_status') else 500,
             detail=f"Spotify API error: {se.msg if hasattr(se, 'msg') else str(se)}"
         )
     except Exception as e:
-        print(f"Unexpected error during top tracks fetch: {e}")
+        logger.exception("Unexpected error during top tracks fetch: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to fetch top tracks: {str(e)}"
@@ -329,19 +600,22 @@ def get_diverse_recommendations(sp: spotipy.Spotify, mood_params: dict) -> List[
     try:
         recommendations = get_recommendations(sp, mood_params)
         if not recommendations or not recommendations.get('tracks'):
-            print("No recommendations found")
+            logger.warning("No recommendations found")
             return []
 
         # Randomly select tracks for diversity
-        tracks = recommendations['tracks']
+        # Spotify picked these from the seed genres, which stand in for the artists' own
+        tracks = with_genres(recommendations['tracks'], mood_params.get("seed_genres", []))
         num_tracks = min(15, len(tracks))  # Get up to 15 tracks
         selected_tracks = random.sample(tracks, num_tracks)
         
-        print(f"Selected {len(selected_tracks)} diverse tracks")
+        logger.debug("Selected %s diverse tracks", len(selected_tracks))
         return selected_tracks
 
+    except SpotifyBusyError:
+        raise
     except Exception as e:
-        print(f"Error in get_diverse_recommendations: {str(e)}")
+        logger.error("Error in get_diverse_recommendations: %s", e)
         return []
 
 def get_mood_based_recommendations(sp: spotipy.Spotify, mood: str) -> List[dict]:
@@ -349,15 +623,15 @@ def get_mood_based_recommendations(sp: spotipy.Spotify, mood: str) -> List[dict]
     try:
         # Get genres for the mood
         genres = MOOD_TO_ARTIST_GENRES.get(mood.lower(), ["pop"])
-        print(f"Using genres for {mood}: {genres}")
+        logger.debug("Using genres for %s: %s", mood, genres)
         
         # Find artists matching these genres
         artists = get_artists_by_genre(sp, genres)
         if not artists:
-            print("No artists found, falling back to default recommendation")
+            logger.warning("No artists found, falling back to default recommendation")
             return get_diverse_recommendations(sp, MOOD_TO_MUSIC_PARAMS[mood])
             
-        print(f"Found {len(artists)} artists matching mood genres")
+        logger.debug("Found %s artists matching mood genres", len(artists))
         
         # Get a diverse selection of artists
         selected_artists = random.sample(artists, min(len(artists), 3))
@@ -366,31 +640,37 @@ def get_mood_based_recommendations(sp: spotipy.Spotify, mood: str) -> List[dict]
         all_tracks = []
         for artist in selected_artists:
             try:
-                print(f"Getting top tracks for: {artist['name']}")
+                logger.debug("Getting top tracks for: %s", artist['name'])
                 top_tracks = sp.artist_top_tracks(artist['id'], country='US')
                 if top_tracks and top_tracks.get('tracks'):
                     # Get a random selection of this artist's top tracks
                     tracks = top_tracks['tracks']
                     num_tracks = min(5, len(tracks))
                     selected_tracks = random.sample(tracks, num_tracks)
-                    all_tracks.extend(selected_tracks)
-                    print(f"Added {num_tracks} tracks from {artist['name']}")
+                    all_tracks.extend(with_genres(selected_tracks, artist.get("genres", [])))
+                    logger.debug("Added %s tracks from %s", num_tracks, artist['name'])
+            except SpotifyBusyError as e:
+                # Out of quota: go with the tracks collected so far
+                logger.warning("Spotify busy, stopping after %s tracks: %s", len(all_tracks), e)
+                break
             except Exception as e:
-                print(f"Error getting tracks for {artist['name']}: {str(e)}")
+                logger.warning("Error getting tracks for %s: %s", artist['name'], e)
                 continue
                 
         if not all_tracks:
-            print("No tracks found, falling back to default recommendation")
+            logger.warning("No tracks found, falling back to default recommendation")
             return get_diverse_recommendations(sp, MOOD_TO_MUSIC_PARAMS[mood])
             
         # Shuffle and limit the number of tracks
         random.shuffle(all_tracks)
         selected_tracks = all_tracks[:15]
-        print(f"Returning {len(selected_tracks)} tracks")
+        logger.info("Returning %s tracks", len(selected_tracks))
         return selected_tracks
         
+    except SpotifyBusyError:
+        raise
     except Exception as e:
-        print(f"Error in get_mood_based_recommendations: {str(e)}")
+        logger.error("Error in get_mood_based_recommendations: %s", e)
         return []
 
 def get_artists_by_genre(sp: spotipy.Spotify, genres: List[str], limit: int = 10) -> List[dict]:
@@ -410,40 +690,30 @@ def get_artists_by_genre(sp: spotipy.Spotify, genres: List[str], limit: int = 10
                         if genre in artist_genres and artist["id"] not in seen_artists:
                             artists.append(artist)
                             seen_artists.add(artist["id"])
+            except SpotifyBusyError as e:
+                # Out of quota: don't keep queueing searches, use the artists found so far
+                logger.warning("Spotify busy, stopping genre search at %s: %s", genre, e)
+                break
             except Exception as e:
-                print(f"Error searching genre {genre}: {str(e)}")
+                logger.warning("Error searching genre %s: %s", genre, e)
                 continue
 
         return artists
+    except SpotifyBusyError:
+        raise
     except Exception as e:
-        print(f"Error in get_artists_by_genre: {str(e)}")
+        logger.error("Error in get_artists_by_genre: %s", e)
         return []
 
 @app.get("/spotify/check")
-async def check_spotify():
-    """Check if Spotify service is available and working"""
-    try:
-        sp = get_spotify()
-        if not sp:
-            raise HTTPException(
-                status_code=503,
-                detail="Could not initialize Spotify client"
-            )
-
-        # Test the client with a simple API call
-        try:
-            _ = sp.recommendation_genre_seeds()
-            return {"status": "ok", "message": "Spotify service is available"}
-        except Exception as e:
-            print(f"Error testing Spotify client: {e}")
-            raise HTTPException(
-                status_code=503,
-                detail=f"Spotify API error: {str(e)}"
-            )
-
-    except Exception as e:
-        print(f"Error checking Spotify service: {e}")
-        raise HTTPException(
-            status_code=503,
-            detail=f"Spotify service error: {str(e)}"
-        )
\ No newline at end of file
+def check_spotify():
+    """Spotify availability, as last seen by the background health probe (no API call)"""
+    state = health_monitor.status("spotify")
+    if state["status"] in (STATUS_OK, STATUS_DEGRADED):
+        return {"status": "ok", "message": "Spotify service is available", "probe": state}
+    if state["status"] == "unknown":
+        raise HTTPException(status_code=503, detail="Spotify service has not been checked yet")
+    raise HTTPException(
+        status_code=503,
+        detail=f"Spotify service error: {state.get('error', 'unavailable')}"
+    )
\ No newline at end of file
@@ -1,6 +1,7 @@
 -- Drop tables if they exist
 DROP TABLE IF EXISTS users;
 DROP TABLE IF EXISTS music_data;
+DROP TABLE IF EXISTS feature_flags;
 
 -- Create Users table
 CREATE TABLE IF NOT EXISTS users (
@@ -20,10 +21,20 @@ CREATE TABLE IF NOT EXISTS music_data (
   artist_name VARCHAR(255) NOT NULL,
   mood VARCHAR(50) NOT NULL,
   user_id INT,
+  genres VARCHAR(255),                          -- comma-separated, when known
+  feedback VARCHAR(16) NOT NULL DEFAULT 'like', -- like, play or skip
   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
   FOREIGN KEY (user_id) REFERENCES users(id)
 );
 
+-- Create feature_flags table (read by FEATURE_FLAGS_TABLE=feature_flags)
+CREATE TABLE IF NOT EXISTS feature_flags (
+  name VARCHAR(100) PRIMARY KEY,
+  enabled BOOLEAN NOT NULL DEFAULT FALSE,
+  rollout_percent DECIMAL(5,2) NOT NULL DEFAULT 100.00,
+  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
 -- Insert test user
 INSERT INTO users (username, password) VALUES ('testuser', 'testpassword')
 ON DUPLICATE KEY UPDATE username=username;
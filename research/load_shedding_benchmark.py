@@ -0,0 +1,84 @@
+"""
+Goodput under overload with and without the adaptive concurrency limiter.
+
+The endpoint stands in for a slow upstream: it can serve 8 requests at a time
+at 50 ms each (160 req/s). Clients send more than that and give up after
+500 ms. Without the limiter everything queues and most requests time out;
+with it, excess requests are shed at once and the rest complete.
+
+    python research/load_shedding_benchmark.py [requests per second] [seconds]
+"""
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+
+from fastapi import FastAPI
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.middleware.maintenance import install_load_shedding
+
+CLIENT_TIMEOUT_S = 0.5
+
+
+def build_app(limited: bool):
+    app = FastAPI()
+    upstream = asyncio.Semaphore(8)
+
+    @app.get("/work")
+    async def work():
+        async with upstream:
+            await asyncio.sleep(0.05)
+        return {"ok": True}
+
+    shedder = install_load_shedding(app) if limited else None
+    return app, shedder
+
+
+async def call(app) -> object:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/work", "raw_path": b"/work", "root_path": "", "query_string": b"",
+        "headers": [], "client": ("127.0.0.1", 1234), "server": ("bench", 80),
+    }
+    status = None
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    try:
+        await asyncio.wait_for(app(scope, receive, send), CLIENT_TIMEOUT_S)
+    except asyncio.TimeoutError:
+        return "timeout"
+    return status
+
+
+async def run(app, rate: float, seconds: float):
+    started = time.perf_counter()
+    tasks = []
+    for _ in range(int(rate * seconds)):
+        tasks.append(asyncio.create_task(call(app)))
+        await asyncio.sleep(1 / rate)
+    outcomes = Counter(await asyncio.gather(*tasks))
+    return outcomes, time.perf_counter() - started
+
+
+def main():
+    rate = float(sys.argv[1]) if len(sys.argv) > 1 else 400
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 3
+    for name, limited in (("unlimited", False), ("adaptive limit", True)):
+        app, shedder = build_app(limited)
+        outcomes, elapsed = asyncio.run(run(app, rate, seconds))
+        print(f"{name:>15}: {outcomes[200] / elapsed:6.1f} ok/s  {dict(outcomes)}")
+        if shedder is not None:
+            print(f"{'':>15}  final limit {shedder.limit.limit:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Compare the pure-ASGI middleware stack with the same four layers written on
+BaseHTTPMiddleware. Requests are driven straight through the ASGI interface,
+so the numbers are middleware + routing overhead without any network.
+
+    python research/middleware_benchmark.py [requests]
+"""
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.middleware.stack import install_middleware_stack
+
+
+class LegacyErrorHandler(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        try:
+            return await call_next(request)
+        except Exception:
+            return JSONResponse(status_code=500, content={"detail": "Internal Server Error"})
+
+
+class LegacySecurityHeaders(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        response = await call_next(request)
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        response.headers["X-Frame-Options"] = "DENY"
+        response.headers["Referrer-Policy"] = "no-referrer"
+        response.headers["Cross-Origin-Resource-Policy"] = "same-site"
+        return response
+
+
+class LegacyResponseHeaders(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        started = time.perf_counter()
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = request.headers.get("x-request-id") or uuid.uuid4().hex
+        response.headers["Server-Timing"] = f"app;dur={(time.perf_counter() - started) * 1000:.1f}"
+        return response
+
+
+class LegacyValidation(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        if int(request.headers.get("content-length", 0)) > 10 * 1024 * 1024:
+            return JSONResponse(status_code=413, content={"detail": "Request body too large"})
+        return await call_next(request)
+
+
+def build_app(pure: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"status": "ok"}
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for index in range(20):
+                yield f"data: {index}\n\n".encode()
+                await asyncio.sleep(0.005)
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    if pure:
+        install_middleware_stack(app)
+    else:
+        for middleware in (LegacyValidation, LegacyResponseHeaders, LegacySecurityHeaders, LegacyErrorHandler):
+            app.add_middleware(middleware)
+    return app
+
+
+async def call(app, path: str):
+    """One request through the ASGI interface; returns (seconds to first body byte, total seconds)"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1234), "server": ("bench", 80),
+    }
+    started = time.perf_counter()
+    first_byte = None
+    request_sent = False
+    disconnect = asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal first_byte
+        if message["type"] == "http.response.body" and message.get("body") and first_byte is None:
+            first_byte = time.perf_counter() - started
+        if message["type"] == "http.response.body" and not message.get("more_body", False):
+            disconnect.set()
+
+    await app(scope, receive, send)
+    return first_byte, time.perf_counter() - started
+
+
+async def run(app, requests: int):
+    await call(app, "/ping")  # warm up routing and caches
+    started = time.perf_counter()
+    for _ in range(requests):
+        await call(app, "/ping")
+    per_request_us = (time.perf_counter() - started) / requests * 1e6
+    streams = [await call(app, "/stream") for _ in range(10)]
+    first_byte_ms = sum(first for first, _ in streams) / len(streams) * 1000
+    return per_request_us, first_byte_ms
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    results = {}
+    for name, pure in (("BaseHTTPMiddleware", False), ("pure ASGI", True)):
+        results[name] = asyncio.run(run(build_app(pure), requests))
+        per_request_us, first_byte_ms = results[name]
+        print(f"{name:>20}: {per_request_us:8.1f} us/request, stream first byte {first_byte_ms:.2f} ms")
+    legacy, pure = results["BaseHTTPMiddleware"][0], results["pure ASGI"][0]
+    print(f"{'':>20}  {legacy / pure:.2f}x faster per request")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,20 @@
 import os
+import queue
 import sys
+import threading
 import time
+from contextlib import contextmanager
+from typing import Optional
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from src.config import DATABASE_CONFIG
+from src.logging.logger import get_logger
+from src.middleware.metrics import track_dependency
+from src.middleware.tracing import span
 import pymysql
 from pydantic import BaseModel
 
+logger = get_logger(__name__)
+
 class UserLogin(BaseModel):
     username: str
     password: str
@@ -16,48 +25,151 @@ def get_database_connection():
     retry_count = 0
     while retry_count < max_retries:
         try:
-            connection = pymysql.connect(
-                host=DATABASE_CONFIG['host'],
-                user=DATABASE_CONFIG['user'],
-                password=DATABASE_CONFIG['password'],
-                database=DATABASE_CONFIG['database'],
-                port=DATABASE_CONFIG['port'],
-                connect_timeout=5
-            )
+            with span("mysql.connect"), track_dependency("mysql", "connect"):
+                connection = pymysql.connect(
+                    host=DATABASE_CONFIG['host'],
+                    user=DATABASE_CONFIG['user'],
+                    password=DATABASE_CONFIG['password'],
+                    database=DATABASE_CONFIG['database'],
+                    port=DATABASE_CONFIG['port'],
+                    connect_timeout=5
+                )
             # Test the connection
             with connection.cursor() as cursor:
                 cursor.execute("SELECT 1")
-            print(f"Database connection successful to {DATABASE_CONFIG['host']}!")
+            logger.debug("Database connection successful to %s", DATABASE_CONFIG['host'])
             return connection
         except pymysql.Error as e:
             retry_count += 1
-            print(f"Database connection attempt {retry_count} failed: {str(e)}")
+            logger.warning("Database connection attempt %s failed: %s", retry_count, e)
             if retry_count == max_retries:
                 raise Exception(f"Failed to connect to database after {max_retries} attempts: {str(e)}")
             time.sleep(5)  # Wait 5 seconds before retrying
 
-def check_user_cred(username: str, password: str) -> bool:
-    """Check user credentials"""
-    try:
-        connection = get_database_connection()
-        with connection.cursor() as cursor:
-            # For demo purposes, allow a test user
-            if username == "testuser" and password == "testpassword":
-                return True
-                
-            # Check real user credentials
+def ping_database(timeout: int = 2):
+    """One connect + SELECT 1 without retries, for health probes; raises on failure"""
+    with span("mysql.ping"), track_dependency("mysql", "ping"):
+        connection = pymysql.connect(
+            host=DATABASE_CONFIG['host'],
+            user=DATABASE_CONFIG['user'],
+            password=DATABASE_CONFIG['password'],
+            database=DATABASE_CONFIG['database'],
+            port=DATABASE_CONFIG['port'],
+            connect_timeout=timeout,
+            read_timeout=timeout,
+        )
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+        finally:
+            connection.close()
+
+class ConnectionPool:
+    """
+    A bounded pool of open MySQL connections, so a request costs a query
+    instead of a TCP + auth handshake.
+
+    Idle connections are kept LIFO (the warmest is reused first) and pinged
+    before reuse once they have sat idle for `check_idle_after` seconds, since
+    MySQL drops connections after wait_timeout. A connection that raised is
+    closed instead of being returned.
+    """
+
+    def __init__(self, size: int = 5, acquire_timeout: float = 5.0, check_idle_after: float = 30.0, connect_timeout: int = 5):
+        self.size = size
+        self.acquire_timeout = acquire_timeout
+        self.check_idle_after = check_idle_after
+        self.connect_timeout = connect_timeout
+        self._idle = queue.LifoQueue()
+        # Caps open connections (idle + lent out)
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self):
+        with span("mysql.connect"), track_dependency("mysql", "connect"):
+            return pymysql.connect(
+                host=DATABASE_CONFIG['host'],
+                user=DATABASE_CONFIG['user'],
+                password=DATABASE_CONFIG['password'],
+                database=DATABASE_CONFIG['database'],
+                port=DATABASE_CONFIG['port'],
+                connect_timeout=self.connect_timeout,
+                autocommit=True,
+            )
+
+    def _checkout(self):
+        while True:
+            try:
+                connection, idle_since = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if time.monotonic() - idle_since < self.check_idle_after:
+                return connection
+            try:
+                connection.ping(reconnect=False)
+                return connection
+            except pymysql.Error:
+                connection.close()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of the block"""
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise TimeoutError(f"No database connection free after {self.acquire_timeout:.1f}s")
+        connection = None
+        try:
+            connection = self._checkout()
+            yield connection
+        except BaseException:
+            if connection is not None:
+                connection.close()
+                connection = None
+            raise
+        finally:
+            if connection is not None:
+                self._idle.put((connection, time.monotonic()))
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            connection.close()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    """The process-wide pool, created on first use (DB_POOL_SIZE connections)"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(size=int(os.getenv("DB_POOL_SIZE", 5)))
+    return _pool
+
+def authenticate_user(username: str, password: str) -> Optional[int]:
+    """The user's id if the credentials match, else None; database errors propagate"""
+    with get_pool().connection() as connection, connection.cursor() as cursor:
+        with span("mysql.check_user_cred"), track_dependency("mysql", "check_user_cred"):
             cursor.execute(
-                "SELECT COUNT(*) FROM users WHERE username = %s AND password = %s",
+                "SELECT id FROM users WHERE username = %s AND password = %s LIMIT 1",
                 (username, password)
             )
-            result = cursor.fetchone()[0]
-            return result > 0
+            row = cursor.fetchone()
+    return row[0] if row else None
+
+def check_user_cred(username: str, password: str) -> bool:
+    """Check user credentials"""
+    # For demo purposes, allow a test user
+    if username == "testuser" and password == "testpassword":
+        return True
+    try:
+        return authenticate_user(username, password) is not None
     except Exception as e:
-        print(f"Error checking credentials: {e}")
+        logger.error("Error checking credentials: %s", e)
         return False
-    finally:
-        if 'connection' in locals():
-            connection.close()
 
 def create_tables_if_not_exist():
     """Create necessary database tables"""
@@ -78,9 +190,9 @@ def create_tables_if_not_exist():
                 INSERT IGNORE INTO users (username, password) VALUES (%s, %s)
             """, ("testuser", "testpassword"))
             connection.commit()
-            print("Tables checked/created successfully.")
+            logger.info("Tables checked/created successfully")
     except Exception as e:
-        print(f"Error creating tables: {e}")
+        logger.error("Error creating tables: %s", e)
         raise
     finally:
         if 'connection' in locals():
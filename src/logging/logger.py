@@ -0,0 +1,162 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from src.middleware.tracing import _current_span
+
+ROOT_LOGGER = "sonicsoul"
+
+# Attributes every LogRecord has; anything else was passed through `extra=` and is logged as a field
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "sample", "trace_id", "span_id"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, trace ids and any `extra` fields"""
+
+    def __init__(self, service: str):
+        super().__init__()
+        self.service = service
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "service": self.service,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "trace_id", None):
+            entry["trace_id"] = record.trace_id
+            entry["span_id"] = record.span_id
+        if getattr(record, "sample", 1) > 1:
+            # Each emitted line stands for `sample` occurrences
+            entry["sample"] = record.sample
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        elif record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Lets through 1 in N DEBUG records per call site (N = debug_sample, or a
+    per-call `extra={"sample": N}`); other levels always pass.
+
+    Counting is per file:line, so a chatty loop is thinned without muting the
+    rare debug lines next to it.
+    """
+
+    def __init__(self, debug_sample: int = 1):
+        super().__init__()
+        self.debug_sample = max(1, debug_sample)
+        self._counts: Dict[tuple, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        every = getattr(record, "sample", None) or self.debug_sample
+        if every <= 1:
+            return True
+        site = (record.pathname, record.lineno)
+        # Unlocked on purpose: a lost increment under a race only shifts which line gets sampled
+        count = self._counts.get(site, 0)
+        self._counts[site] = count + 1
+        record.sample = every
+        return count % every == 0
+
+
+class _ContextFilter(logging.Filter):
+    """Stamps the trace ids on the record while still in the calling thread, where the span is current"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        span = _current_span.get()
+        if span is not None:
+            record.trace_id = span.trace_id
+            record.span_id = span.span_id
+        return True
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the writer falls behind"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve args and tracebacks now (they may not survive the hop), but leave JSON to the writer
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_traceback_formatter = logging.Formatter()
+_formatter: Optional[JsonFormatter] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+_configure_lock = threading.Lock()
+
+
+def configure_logging(service: Optional[str] = None, stream=None) -> logging.Logger:
+    """
+    Set up the "sonicsoul" logger tree once per process.
+
+    Callers only format the message and put the record on a bounded queue; a
+    background QueueListener thread serialises JSON and writes to stdout, so
+    request handlers never wait on I/O. Reads LOG_LEVEL (default INFO),
+    LOG_DEBUG_SAMPLE (keep 1 in N debug lines, default 1) and LOG_QUEUE_SIZE.
+    """
+    global _formatter, _listener
+    root = logging.getLogger(ROOT_LOGGER)
+    with _configure_lock:
+        if _listener is not None:
+            # Modules may log (and so configure) before the app names its service
+            if service:
+                _formatter.service = service
+            return root
+
+        _formatter = JsonFormatter(service or os.getenv("SERVICE_NAME", ROOT_LOGGER))
+        writer = logging.StreamHandler(stream or sys.stdout)
+        writer.setFormatter(_formatter)
+
+        log_queue: queue.Queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", 10000)))
+        handler = _DroppingQueueHandler(log_queue)
+        handler.addFilter(SamplingFilter(int(os.getenv("LOG_DEBUG_SAMPLE", 1))))
+        handler.addFilter(_ContextFilter())
+
+        root.handlers = [handler]
+        root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+        root.propagate = False
+
+        _listener = logging.handlers.QueueListener(log_queue, writer)
+        _listener.start()
+        atexit.register(_listener.stop)
+    return root
+
+
+def get_logger(name: str) -> logging.Logger:
+    """`logger = get_logger(__name__)` -- a child of the configured "sonicsoul" logger"""
+    configure_logging()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
@@ -0,0 +1,55 @@
+from typing import Optional
+
+from src.middleware.feature_branching import FeatureBranching
+from src.middleware.feature_toggle import FEATURE_EXPOSURES
+from src.middleware.metrics import REGISTRY
+
+CONTROL = "control"
+TREATMENT = "treatment"
+
+EXPERIMENT_OUTCOMES = REGISTRY.counter(
+    "experiment_outcomes_total", "Outcomes (clicks, likes, errors...) recorded per experiment arm",
+    ("feature", "variant", "outcome")
+)
+EXPERIMENT_LATENCY = REGISTRY.histogram(
+    "experiment_duration_seconds", "Time spent in the code under experiment, per arm", ("feature", "variant")
+)
+
+
+class Experiment:
+    """
+    A/B test on top of a feature flag: users inside the flag's rollout
+    percentage get the treatment, everyone else the control. Assignment is the
+    flag's hash bucket, so a user stays in the same arm across requests and
+    replicas. Exposures share feature_exposures_total with FeatureToggle.
+    """
+
+    def __init__(self, flags: FeatureBranching, name: str):
+        self.flags = flags
+        self.name = name
+
+    def assignment(self, user_key: Optional[str]) -> str:
+        """The user's arm, without counting an exposure (e.g. when recording an outcome)"""
+        return TREATMENT if self.flags.is_enabled(self.name, user_key) else CONTROL
+
+    def variant(self, user_key: Optional[str]) -> str:
+        """Assign the user and count the exposure"""
+        variant = self.assignment(user_key)
+        FEATURE_EXPOSURES.inc(self.name, variant)
+        return variant
+
+    def record(self, variant: str, outcome: str, amount: float = 1.0):
+        EXPERIMENT_OUTCOMES.inc(self.name, variant, outcome, amount=amount)
+
+    def measure(self, variant: str):
+        """Context manager timing a block into experiment_duration_seconds"""
+        return EXPERIMENT_LATENCY.time(self.name, variant)
+
+# Usage:
+# from src.middleware.ab_testing import Experiment, TREATMENT
+#
+# ranking = Experiment(features, "new_ranking")   # FEATURE_FLAGS_FILE: {"new_ranking": {"rollout": 10}}
+# variant = ranking.variant(username)
+# with ranking.measure(variant):
+#     tracks = rank_v2(tracks) if variant == TREATMENT else tracks
+# ranking.record(variant, "played")
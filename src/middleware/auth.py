@@ -12,9 +12,12 @@ if project_root_path not in sys.path:
     sys.path.append(project_root_path)
 
 from src.database import get_database_connection
+from src.logging.logger import get_logger
 
 load_dotenv(find_dotenv())
 
+logger = get_logger(__name__)
+
 def get_client_credentials_spotify():
     """
     Get a Spotify client using client credentials flow.
@@ -25,7 +28,7 @@ def get_client_credentials_spotify():
         client_secret = os.getenv('SPOTIPY_CLIENT_SECRET')
 
         if not all([client_id, client_secret]):
-            print("Missing Spotify credentials in environment")
+            logger.error("Missing Spotify credentials in environment")
             return None
 
         client_credentials_manager = SpotifyClientCredentials(
@@ -36,7 +39,7 @@ def get_client_credentials_spotify():
         return spotipy.Spotify(client_credentials_manager=client_credentials_manager)
         
     except Exception as e:
-        print(f"Error creating client credentials client: {e}")
+        logger.error("Error creating client credentials client: %s", e)
         return None
 
 def _fetch_new_spotify_token_and_save(username: str, auth_manager: SpotifyOAuth) -> spotipy.Spotify | None:
@@ -48,12 +51,12 @@ def _fetch_new_spotify_token_and_save(username: str, auth_manager: SpotifyOAuth)
         # First try client credentials as fallback
         sp = get_client_credentials_spotify()
         if sp:
-            print("Using client credentials flow as fallback")
+            logger.info("Using client credentials flow as fallback")
             return sp
             
         # If that fails, proceed with full auth flow
         auth_url = auth_manager.get_authorize_url()
-        print(f"Spotify Authorization URL: {auth_url}")
+        logger.info("Spotify Authorization URL: %s", auth_url)
         
         raise SpotifyAuthError(
             message="Please authorize with Spotify",
@@ -63,7 +66,7 @@ def _fetch_new_spotify_token_and_save(username: str, auth_manager: SpotifyOAuth)
     except SpotifyAuthError:
         raise
     except Exception as e:
-        print(f"Error in auth flow: {e}")
+        logger.error("Error in auth flow: %s", e)
         return None
 
 def _refresh_token(username: str, auth_manager: SpotifyOAuth, token_info: dict) -> tuple[bool, spotipy.Spotify | None]:
@@ -77,7 +80,7 @@ def _refresh_token(username: str, auth_manager: SpotifyOAuth, token_info: dict)
             
         # Token expired, try to refresh
         new_token = auth_manager.refresh_access_token(token_info['refresh_token'])
-        print("Successfully refreshed token")
+        logger.info("Successfully refreshed token")
         
         # Save new token
         conn = get_database_connection()
@@ -88,7 +91,7 @@ def _refresh_token(username: str, auth_manager: SpotifyOAuth, token_info: dict)
                 (json.dumps(new_token), username)
             )
             conn.commit()
-            print("Saved refreshed token to database")
+            logger.debug("Saved refreshed token to database")
         finally:
             cursor.close()
             conn.close()
@@ -96,7 +99,7 @@ def _refresh_token(username: str, auth_manager: SpotifyOAuth, token_info: dict)
         return True, spotipy.Spotify(auth=new_token['access_token'])
         
     except Exception as e:
-        print(f"Token refresh failed: {e}")
+        logger.error("Token refresh failed: %s", e)
         return False, None
 
 def get_spotify_client(username: str) -> spotipy.Spotify | None:
@@ -111,19 +114,19 @@ def get_spotify_client(username: str) -> spotipy.Spotify | None:
         redirect_uri = os.getenv('SPOTIPY_REDIRECT_URI', 'http://localhost:8502/callback')
 
         if not all([client_id, client_secret]):
-            print("Missing Spotify credentials in environment")
+            logger.error("Missing Spotify credentials in environment")
             raise ValueError("Spotify API credentials not configured")
             
-        print(f"Initializing Spotify auth for user: {username}")
+        logger.debug("Initializing Spotify auth for user: %s", username)
 
         # First try client credentials as quick fallback
         sp = get_client_credentials_spotify()
         if sp:
-            print("Using client credentials flow")
+            logger.debug("Using client credentials flow")
             return sp
 
         # If we need user auth, proceed with full flow
-        print(f"Using redirect URI: {redirect_uri}")
+        logger.debug("Using redirect URI: %s", redirect_uri)
         auth_manager = SpotifyOAuth(
             client_id=client_id,
             client_secret=client_secret,
@@ -141,10 +144,10 @@ def get_spotify_client(username: str) -> spotipy.Spotify | None:
             cursor.execute("SELECT spotify_access_token FROM users WHERE username = %s", (username,))
             result = cursor.fetchone()
             if result and result[0]:
-                print(f"Found token in database for: {username}")
+                logger.debug("Found token in database for: %s", username)
                 token_info = json.loads(result[0])
         except Exception as db_error:
-            print(f"Database error: {str(db_error)}")
+            logger.error("Database error: %s", db_error)
             token_info = None
         finally:
             if 'cursor' in locals():
@@ -158,20 +161,20 @@ def get_spotify_client(username: str) -> spotipy.Spotify | None:
             if success:
                 try:
                     sp.current_user()
-                    print("Successfully verified token")
+                    logger.debug("Successfully verified token")
                     return sp
                 except Exception as e:
-                    print(f"Token verification failed: {e}")
+                    logger.warning("Token verification failed: %s", e)
             
         # If we get here, we need new authorization
-        print(f"Initiating new auth flow for: {username}")
+        logger.info("Initiating new auth flow for: %s", username)
         return _fetch_new_spotify_token_and_save(username, auth_manager)
 
     except SpotifyAuthError:
         # Re-raise for frontend to handle
         raise
     except Exception as e:
-        print(f"Unexpected error in get_spotify_client: {str(e)}")
+        logger.exception("Unexpected error in get_spotify_client: %s", e)
         # Try client credentials one last time
         return get_client_credentials_spotify()
 
@@ -181,14 +184,14 @@ def spotify_login(username: str) -> spotipy.Spotify | None:
     Handles getting/refreshing tokens and new auth if needed.
     """
     try:
-        print(f"Starting Spotify login for: {username}")
+        logger.info("Starting Spotify login for: %s", username)
         return get_spotify_client(username)
             
     except SpotifyAuthError as auth_error:
         # Re-raise for frontend to handle redirect
         raise
     except Exception as e:
-        print(f"Error in spotify_login: {str(e)}")
+        logger.error("Error in spotify_login: %s", e)
         return None
 
 def get_user_playlists(sp):
@@ -205,7 +208,7 @@ def get_user_playlists(sp):
 def save_tracks_to_json(tracks, filename='saved_tracks.json'):
     with open(filename, 'w') as f:
         json.dump(tracks, f, indent=4)
-    print(f"Saved {len(tracks)} tracks to {filename}")
+    logger.info("Saved %s tracks to %s", len(tracks), filename)
     
 def main():
     # Example usage, assuming a username is available.
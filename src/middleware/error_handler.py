@@ -1,31 +1,54 @@
-from fastapi import Request, HTTPException
-from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-import logging
+from starlette.exceptions import HTTPException
 
-logger = logging.getLogger("uvicorn.error")
+from src.logging.logger import get_logger
+from src.middleware.response_handler import send_json
+
+logger = get_logger(__name__)
+
+
+class ErrorHandlerMiddleware:
+    """
+    Pure ASGI middleware turning uncaught exceptions into JSON error responses.
+
+    Messages pass straight through, so streaming bodies stay streaming. If the
+    failure happens after the response has started its status can no longer
+    change; the error is logged and re-raised so the server drops the connection.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = False
+
+        async def send_wrapper(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
 
-class ErrorHandlerMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
         try:
-            response = await call_next(request)
-            return response
-        except HTTPException as exc:
-            logger.error(f"HTTPException: {exc.detail}")
-            return JSONResponse(
-                status_code=exc.status_code,
-                content={"detail": exc.detail},
-            )
+            await self.app(scope, receive, send_wrapper)
         except Exception as exc:
-            logger.exception("Unhandled exception occurred")
-            return JSONResponse(
-                status_code=500,
-                content={"detail": "Internal Server Error"},
-            )
+            if started:
+                logger.exception("Exception after the response started")
+                raise
+            if isinstance(exc, HTTPException):
+                logger.error("HTTPException: %s", exc.detail)
+                await send_json(send, exc.status_code, {"detail": exc.detail}, exc.headers)
+            else:
+                logger.exception("Unhandled exception occurred")
+                await send_json(send, 500, {"detail": "Internal Server Error"})
 
 # Usage in FastAPI app:
 # from fastapi import FastAPI
-# from .middleware.error_handler import ErrorHandlerMiddleware
+# from src.middleware.error_handler import ErrorHandlerMiddleware
 #
 # app = FastAPI()
-# app.add_middleware(ErrorHandlerMiddleware)
\ No newline at end of file
+# app.add_middleware(ErrorHandlerMiddleware)
+#
+# or mount the whole stack with src.middleware.stack.install_middleware_stack(app)
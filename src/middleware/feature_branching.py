@@ -1,39 +1,223 @@
 # /D:/vscode/SonicSoul/SonicSoul/src/middleware/feature_branching.py
+import hashlib
+import json
+import os
+import threading
+from types import MappingProxyType
+from typing import Callable, Dict, Mapping, NamedTuple, Optional
+
+from src.logging.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class FlagRule(NamedTuple):
+    """One flag: on/off, plus the share of users (0-100) it is rolled out to"""
+    enabled: bool
+    rollout: float = 100.0
+    salt: str = ""
+
+
+def parse_rule(value) -> FlagRule:
+    """
+    Accepts the plain boolean of the old API or a dict:
+    {"enabled": true, "rollout": 10, "salt": "v2"}
+    """
+    if isinstance(value, FlagRule):
+        return value
+    if isinstance(value, dict):
+        return FlagRule(
+            enabled=bool(value.get("enabled", True)),
+            rollout=min(100.0, max(0.0, float(value.get("rollout", 100)))),
+            salt=str(value.get("salt", "")),
+        )
+    return FlagRule(enabled=bool(value))
+
+
+def bucket(feature_name: str, user_key: str, salt: str = "") -> float:
+    """
+    Stable position of a user in [0, 100) for a feature.
+
+    Uses a keyed hash rather than hash(), so every worker and replica puts a
+    user in the same bucket; raising the rollout only ever adds users.
+    """
+    digest = hashlib.blake2b(f"{salt}:{feature_name}:{user_key}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / 2 ** 64 * 100
+
+
+class FileFlagSource:
+    """Flags from a JSON object on disk ({"name": true | {...}}); re-read only when the file changes"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._mtime = None
+
+    def load(self) -> Optional[dict]:
+        """New definitions, or None when the file is unchanged"""
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime == self._mtime:
+            return None
+        # Remember the version even if it fails to parse, so a bad edit is reported once
+        self._mtime = mtime
+        with open(self.path, encoding="utf-8") as f:
+            return json.load(f)
+
+
+class DatabaseFlagSource:
+    """Flags from a MySQL table with name, enabled and rollout_percent columns"""
+
+    def __init__(self, table: str = "feature_flags", connect: Optional[Callable] = None):
+        self.table = table
+        self.connect = connect
+
+    def load(self) -> dict:
+        if self.connect is None:
+            from src.database import get_database_connection
+            self.connect = get_database_connection
+        connection = self.connect()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT name, enabled, rollout_percent FROM {self.table}")
+                rows = cursor.fetchall()
+        finally:
+            connection.close()
+        return {name: {"enabled": bool(enabled), "rollout": float(rollout)} for name, enabled, rollout in rows}
+
 
 class FeatureBranching:
     """
     Middleware to enable or disable features dynamically.
+
+    Flags live in an immutable snapshot that is replaced as a whole on every
+    change, so is_enabled() reads it without taking a lock; only writers
+    (enable/disable/toggle/reload) serialise. Flags can be rolled out to a
+    percentage of users, and reloaded from a file or DB table so every worker
+    sees the same values without a restart.
     """
 
-    def __init__(self, features=None):
+    def __init__(self, features=None, source=None):
         """
         Initialize with a dictionary of feature flags.
-        :param features: dict, e.g. {'feature_x': True, 'feature_y': False}
+        :param features: dict of defaults, e.g. {'feature_x': True, 'feature_y': {'enabled': True, 'rollout': 10}}
+        :param source: optional FileFlagSource/DatabaseFlagSource whose flags override the defaults
         """
-        self.features = features or {}
+        self._defaults = {name: parse_rule(value) for name, value in (features or {}).items()}
+        self._loaded: Dict[str, FlagRule] = {}
+        self._overrides: Dict[str, FlagRule] = {}
+        self._snapshot: Mapping[str, FlagRule] = MappingProxyType(dict(self._defaults))
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self.source = source
+
+    @classmethod
+    def from_env(cls, features=None) -> "FeatureBranching":
+        """
+        Defaults plus FEATURE_FLAGS_FILE or FEATURE_FLAGS_TABLE, polled every
+        FEATURE_FLAGS_RELOAD_S seconds (default 15).
+        """
+        source = None
+        if os.getenv("FEATURE_FLAGS_FILE"):
+            source = FileFlagSource(os.getenv("FEATURE_FLAGS_FILE"))
+        elif os.getenv("FEATURE_FLAGS_TABLE"):
+            source = DatabaseFlagSource(os.getenv("FEATURE_FLAGS_TABLE"))
+        flags = cls(features, source=source)
+        if source is not None:
+            flags.reload()
+            flags.start_reloading(float(os.getenv("FEATURE_FLAGS_RELOAD_S", 15)))
+        return flags
+
+    @property
+    def features(self) -> Dict[str, FlagRule]:
+        """Current flags (a copy)"""
+        return dict(self._snapshot)
+
+    def rule(self, feature_name) -> Optional[FlagRule]:
+        return self._snapshot.get(feature_name)
 
-    def is_enabled(self, feature_name):
+    def is_enabled(self, feature_name, user_key=None):
         """
         Check if a feature is enabled.
         :param feature_name: str
+        :param user_key: str, e.g. a username; needed for partial rollouts
         :return: bool
         """
-        return self.features.get(feature_name, False)
+        rule = self._snapshot.get(feature_name)
+        if rule is None or not rule.enabled:
+            return False
+        if rule.rollout >= 100:
+            return True
+        if user_key is None or rule.rollout <= 0:
+            return False
+        return bucket(feature_name, str(user_key), rule.salt) < rule.rollout
 
     def enable(self, feature_name):
         """
         Enable a feature.
         """
-        self.features[feature_name] = True
+        self._set(feature_name, lambda rule: FlagRule(True, 100.0, rule.salt if rule else ""))
 
     def disable(self, feature_name):
         """
         Disable a feature.
         """
-        self.features[feature_name] = False
+        self._set(feature_name, lambda rule: FlagRule(False, rule.rollout if rule else 100.0, rule.salt if rule else ""))
 
     def toggle(self, feature_name):
         """
         Toggle a feature's enabled state.
         """
-        self.features[feature_name] = not self.features.get(feature_name, False)
\ No newline at end of file
+        self._set(feature_name, lambda rule: FlagRule(not (rule and rule.enabled), rule.rollout if rule else 100.0,
+                                                      rule.salt if rule else ""))
+
+    def set_rollout(self, feature_name, percentage):
+        """
+        Roll a feature out to a share of users.
+        :param percentage: float between 0 and 100
+        """
+        percentage = min(100.0, max(0.0, float(percentage)))
+        self._set(feature_name, lambda rule: FlagRule(True, percentage, rule.salt if rule else ""))
+
+    def _set(self, feature_name, update: Callable[[Optional[FlagRule]], FlagRule]):
+        # Local changes win over the source until the process restarts
+        with self._write_lock:
+            self._overrides[feature_name] = update(self._snapshot.get(feature_name))
+            self._publish(self._loaded)
+
+    def _publish(self, loaded: Dict[str, FlagRule]):
+        self._loaded = loaded
+        merged = dict(self._defaults)
+        merged.update(loaded)
+        merged.update(self._overrides)
+        # One reference assignment: readers see either the old or the new snapshot, never a mix
+        self._snapshot = MappingProxyType(merged)
+
+    def reload(self) -> bool:
+        """Pull flags from the source; returns True if they changed"""
+        if self.source is None:
+            return False
+        try:
+            definitions = self.source.load()
+        except Exception as e:
+            # Keep serving the last good snapshot
+            logger.warning("Could not reload feature flags: %s", e)
+            return False
+        if definitions is None:
+            return False
+        loaded = {name: parse_rule(value) for name, value in definitions.items()}
+        with self._write_lock:
+            if loaded == self._loaded:
+                return False
+            self._publish(loaded)
+        logger.info("Feature flags reloaded: %s", {name: rule._asdict() for name, rule in loaded.items()})
+        return True
+
+    def start_reloading(self, interval: float = 15.0):
+        """Poll the source from a daemon thread"""
+        def poll():
+            while not self._stop.wait(interval):
+                self.reload()
+
+        threading.Thread(target=poll, name="feature-flags", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,39 @@
+from typing import Optional
+
+from src.middleware.feature_branching import FeatureBranching
+from src.middleware.metrics import REGISTRY
+
+FEATURE_EXPOSURES = REGISTRY.counter(
+    "feature_exposures_total", "Flag evaluations for a user, by the side they landed on", ("feature", "variant")
+)
+
+VARIANT_ON = "on"
+VARIANT_OFF = "off"
+
+
+class FeatureToggle:
+    """
+    One flag as seen by request code. Every evaluation is counted, so the
+    share of traffic that actually saw a feature can be checked against its
+    rollout percentage on /metrics.
+    """
+
+    def __init__(self, flags: FeatureBranching, name: str):
+        self.flags = flags
+        self.name = name
+
+    def enabled_for(self, user_key: Optional[str] = None) -> bool:
+        enabled = self.flags.is_enabled(self.name, user_key)
+        FEATURE_EXPOSURES.inc(self.name, VARIANT_ON if enabled else VARIANT_OFF)
+        return enabled
+
+    def choose(self, user_key: Optional[str], on, off):
+        """`on` if the feature is enabled for the user, else `off`"""
+        return on if self.enabled_for(user_key) else off
+
+# Usage:
+# from src.middleware.feature_toggle import FeatureToggle
+#
+# new_ranking = FeatureToggle(features, "new_ranking")   # features from install_monitoring()
+# if new_ranking.enabled_for(username):
+#     ...
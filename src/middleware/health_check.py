@@ -0,0 +1,197 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, List, Optional
+
+from fastapi import FastAPI
+from fastapi.responses import Response
+
+from src.logging.logger import get_logger
+from src.middleware.response_handler import dumps
+
+logger = get_logger(__name__)
+
+STATUS_UNKNOWN = "unknown"    # not probed yet
+STATUS_OK = "ok"
+STATUS_DEGRADED = "degraded"  # slow, or failing but below the failure threshold
+STATUS_DOWN = "down"
+
+
+class DependencyProbe:
+    """
+    A periodic check of one dependency. `check` raises on failure; its return
+    value is ignored.
+
+    A critical dependency that is down makes the service not ready; a
+    non-critical one only shows up as degraded in the report.
+    """
+
+    def __init__(self, name: str, check: Callable[[], object], interval: float = 30.0, timeout: float = 5.0,
+                 critical: bool = True, slow_after: Optional[float] = None, failure_threshold: int = 2):
+        self.name = name
+        self.check = check
+        self.interval = interval
+        self.timeout = timeout
+        self.critical = critical
+        self.slow_after = slow_after if slow_after is not None else timeout / 2
+        self.failure_threshold = failure_threshold
+        self.state = {"status": STATUS_UNKNOWN, "critical": critical}
+        self.next_run = 0.0
+        self.failures = 0
+        self.running = False
+        self.pending = None  # the last check, if it outlived its timeout
+
+
+class HealthMonitor:
+    """
+    Probes dependencies from a background thread and keeps the results.
+
+    Each probe runs on its own interval with a timeout, so a hanging dependency
+    never holds up the others. After every probe the readiness report is
+    serialised once; the health endpoints just return those bytes, so a health
+    check never touches a dependency itself.
+    """
+
+    def __init__(self, service: str, probes: List[DependencyProbe]):
+        self.service = service
+        self.probes = {probe.name: probe for probe in probes}
+        self._executor = ThreadPoolExecutor(max_workers=max(1, len(probes)), thread_name_prefix="health")
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._ready = False
+        self._report = b""
+        self._publish()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="health-monitor", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    @property
+    def alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def status(self, name: str) -> dict:
+        return dict(self.probes[name].state)
+
+    def readiness(self):
+        """(ready, JSON report bytes) as of the last probe"""
+        return self._ready, self._report
+
+    def _loop(self):
+        while not self._stop.is_set():
+            now = time.monotonic()
+            for probe in self.probes.values():
+                if probe.next_run <= now and not probe.running:
+                    probe.running = True
+                    probe.next_run = now + probe.interval
+                    self._executor.submit(self._run, probe)
+            due = min(probe.next_run for probe in self.probes.values()) if self.probes else now + 60
+            self._stop.wait(max(0.1, due - time.monotonic()))
+
+    def _run(self, probe: DependencyProbe):
+        started = time.monotonic()
+        error = None
+        if probe.pending is not None and not probe.pending.done():
+            # Don't stack up threads behind a dependency that still hasn't answered
+            error = "previous check still running"
+        else:
+            # The check gets its own thread so a hang is cut off at the timeout
+            worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"probe-{probe.name}")
+            probe.pending = worker.submit(probe.check)
+            worker.shutdown(wait=False)
+            try:
+                probe.pending.result(timeout=probe.timeout)
+            except FutureTimeoutError:
+                error = f"timed out after {probe.timeout:.1f}s"
+            except Exception as e:
+                error = str(e) or type(e).__name__
+        latency = time.monotonic() - started
+
+        if error is None:
+            probe.failures = 0
+            status = STATUS_DEGRADED if latency > probe.slow_after else STATUS_OK
+        else:
+            probe.failures += 1
+            status = STATUS_DOWN if probe.failures >= probe.failure_threshold else STATUS_DEGRADED
+
+        # Log transitions only; a dependency that stays down would otherwise log every interval
+        previous = probe.state["status"]
+        if status != previous:
+            if error is not None:
+                logger.warning("Dependency %s is %s: %s", probe.name, status, error)
+            elif previous != STATUS_UNKNOWN:
+                logger.info("Dependency %s is %s (was %s)", probe.name, status, previous)
+
+        state = {
+            "status": status,
+            "critical": probe.critical,
+            "latency_ms": round(latency * 1000, 1),
+            "checked_at": round(time.time(), 3),
+        }
+        if error is not None:
+            state["error"] = error[:200]
+            state["consecutive_failures"] = probe.failures
+        probe.state = state
+        probe.running = False
+        self._publish()
+
+    def _publish(self):
+        with self._lock:
+            dependencies = {name: dict(probe.state) for name, probe in self.probes.items()}
+            statuses = [state["status"] for state in dependencies.values()]
+            critical = [state["status"] for state in dependencies.values() if state["critical"]]
+            # Not ready until every critical dependency has answered at least once
+            ready = all(status in (STATUS_OK, STATUS_DEGRADED) for status in critical)
+            if not ready:
+                overall = "unavailable"
+            elif all(status == STATUS_OK for status in statuses):
+                overall = STATUS_OK
+            else:
+                overall = STATUS_DEGRADED
+            self._report = dumps({"status": overall, "service": self.service, "dependencies": dependencies})
+            self._ready = ready
+
+
+def install_health_checks(app: FastAPI, monitor: HealthMonitor):
+    """
+    Mount /health/live and /health/ready and run the monitor with the app.
+
+    Liveness only says the process serves requests and the monitor is running;
+    readiness is the cached dependency report (503 while a critical one is down).
+    """
+    live_ok = dumps({"status": "ok", "service": monitor.service})
+    live_failed = dumps({"status": "monitor stopped", "service": monitor.service})
+
+    @app.on_event("startup")
+    def start_health_monitor():
+        monitor.start()
+
+    @app.on_event("shutdown")
+    def stop_health_monitor():
+        monitor.stop()
+
+    @app.get("/health/live", include_in_schema=False)
+    async def liveness():
+        if monitor.alive:
+            return Response(live_ok, media_type="application/json")
+        return Response(live_failed, status_code=503, media_type="application/json")
+
+    @app.get("/health/ready", include_in_schema=False)
+    async def readiness():
+        ready, report = monitor.readiness()
+        return Response(report, status_code=200 if ready else 503, media_type="application/json")
+
+# Usage in FastAPI app:
+# from src.middleware.health_check import DependencyProbe, HealthMonitor, install_health_checks
+#
+# health = HealthMonitor("music-recommender", [
+#     DependencyProbe("spotify", lambda: client.recommendation_genre_seeds(), interval=60),
+#     DependencyProbe("mysql", ping_database, interval=30, critical=False),
+# ])
+# install_health_checks(app, health)
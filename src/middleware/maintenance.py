@@ -0,0 +1,209 @@
+import hmac
+import math
+import os
+import time
+from typing import Optional, Sequence
+
+from fastapi import FastAPI, HTTPException, Request
+from pydantic import BaseModel
+
+from src.logging.logger import get_logger
+from src.middleware.metrics import REGISTRY
+from src.middleware.response_handler import send_json
+
+logger = get_logger(__name__)
+
+SHED_REQUESTS = REGISTRY.counter(
+    "load_shed_requests_total", "Requests rejected by the concurrency limiter or maintenance mode", ("reason",)
+)
+
+# Never limited: probes, scrapes and the admin surface must work during overload
+DEFAULT_EXCLUDED_PATHS = ("/health", "/metrics", "/debug", "/admin")
+
+
+class GradientLimit:
+    """
+    Adaptive in-flight limit in the style of Netflix's gradient2 limiter.
+
+    It keeps a fast and a slow moving average of request latency. While they
+    agree the limit grows by about sqrt(limit) per sample (queue headroom);
+    when recent latency rises above the long-term baseline the limit is scaled
+    down by long/short, so queueing is cut before it turns into timeouts.
+    Failed requests (5xx) back off multiplicatively, AIMD style.
+    """
+
+    def __init__(self, initial: int = 20, min_limit: int = 2, max_limit: int = 200, short_window: int = 10,
+                 long_window: int = 500, tolerance: float = 1.5, smoothing: float = 0.2, backoff: float = 0.9):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.backoff = backoff
+        self._short_alpha = 2.0 / (short_window + 1)
+        self._long_alpha = 2.0 / (long_window + 1)
+        self.short_rtt = 0.0
+        self.long_rtt = 0.0
+
+    @classmethod
+    def from_env(cls) -> "GradientLimit":
+        return cls(
+            initial=int(os.getenv("CONCURRENCY_LIMIT_INITIAL", 20)),
+            min_limit=int(os.getenv("CONCURRENCY_LIMIT_MIN", 2)),
+            max_limit=int(os.getenv("CONCURRENCY_LIMIT_MAX", 200)),
+        )
+
+    def update(self, rtt: float, in_flight: int, failed: bool):
+        if self.long_rtt == 0.0:
+            self.short_rtt = self.long_rtt = rtt
+        else:
+            self.short_rtt += self._short_alpha * (rtt - self.short_rtt)
+            self.long_rtt += self._long_alpha * (rtt - self.long_rtt)
+            # Let the baseline recover quickly once a slow period is over
+            if self.long_rtt > 2 * self.short_rtt:
+                self.long_rtt *= 0.95
+
+        if failed:
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+            return
+        # Only grow when the current limit is actually being used
+        if in_flight < self.limit / 2:
+            return
+
+        gradient = max(0.5, min(1.0, self.tolerance * self.long_rtt / self.short_rtt)) if self.short_rtt else 1.0
+        target = self.limit * gradient + math.sqrt(self.limit)
+        self.limit = (1 - self.smoothing) * self.limit + self.smoothing * target
+        self.limit = min(self.max_limit, max(self.min_limit, self.limit))
+
+
+class LoadShedder:
+    """Shared state for the limiter middleware and the admin endpoints"""
+
+    def __init__(self, limit: Optional[GradientLimit] = None, draining: bool = False, maintenance_retry_after: int = 30):
+        self.limit = limit or GradientLimit.from_env()
+        self.draining = draining
+        self.maintenance_retry_after = maintenance_retry_after
+        self.in_flight = 0
+        REGISTRY.gauge("concurrency_limit", "Current adaptive in-flight request limit", lambda: {(): self.limit.limit})
+        REGISTRY.gauge("requests_in_flight", "Requests currently being handled", lambda: {(): self.in_flight})
+
+    def retry_after(self) -> int:
+        """Seconds for a shed client to back off: about one recent request latency"""
+        return max(1, math.ceil(self.limit.short_rtt))
+
+    def status(self) -> dict:
+        return {
+            "draining": self.draining,
+            "in_flight": self.in_flight,
+            "limit": round(self.limit.limit, 1),
+            "latency_short_ms": round(self.limit.short_rtt * 1000, 1),
+            "latency_long_ms": round(self.limit.long_rtt * 1000, 1),
+        }
+
+
+class AdaptiveConcurrencyMiddleware:
+    """
+    Pure ASGI middleware capping in-flight requests at the adaptive limit.
+
+    Requests over the limit get an immediate 503 with Retry-After instead of
+    queueing behind a slow upstream, so the ones admitted still finish in time.
+    In maintenance (drain) mode every new request is refused and readiness
+    reports 503, while requests already in flight complete.
+
+    The counters are only touched from the event loop, so no locking is needed.
+    """
+
+    def __init__(self, app, shedder: LoadShedder, excluded_paths: Sequence[str] = DEFAULT_EXCLUDED_PATHS):
+        self.app = app
+        self.shedder = shedder
+        self.excluded_paths = tuple(excluded_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        shedder = self.shedder
+        path = scope["path"]
+
+        if path.startswith(self.excluded_paths):
+            if shedder.draining and path == "/health/ready":
+                await send_json(send, 503, {"status": "draining", **shedder.status()})
+                return
+            await self.app(scope, receive, send)
+            return
+
+        if shedder.draining:
+            SHED_REQUESTS.inc("maintenance")
+            await send_json(send, 503, {"detail": "Service is in maintenance, please retry later"},
+                            {"Retry-After": shedder.maintenance_retry_after})
+            return
+        if shedder.in_flight >= shedder.limit.limit:
+            SHED_REQUESTS.inc("overload")
+            await send_json(send, 503, {"detail": "Service is overloaded, please retry shortly"},
+                            {"Retry-After": shedder.retry_after()})
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        shedder.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight = shedder.in_flight
+            shedder.in_flight -= 1
+            shedder.limit.update(time.perf_counter() - started, in_flight, failed=status >= 500)
+
+
+class MaintenanceRequest(BaseModel):
+    enabled: bool
+
+
+def install_load_shedding(app: FastAPI, shedder: Optional[LoadShedder] = None,
+                          excluded_paths: Sequence[str] = DEFAULT_EXCLUDED_PATHS) -> LoadShedder:
+    """
+    Add the adaptive concurrency limiter and the admin maintenance switch.
+
+    MAINTENANCE_MODE=true starts the service draining. POST /admin/maintenance
+    with {"enabled": true|false} and X-Admin-Token (ADMIN_TOKEN) toggles it;
+    GET shows the limiter state, e.g. to wait for in_flight to reach 0.
+    """
+    if shedder is None:
+        shedder = LoadShedder(
+            draining=os.getenv("MAINTENANCE_MODE", "false").lower() == "true",
+            maintenance_retry_after=int(os.getenv("MAINTENANCE_RETRY_AFTER", 30)),
+        )
+    app.add_middleware(AdaptiveConcurrencyMiddleware, shedder=shedder, excluded_paths=excluded_paths)
+    admin_token = os.getenv("ADMIN_TOKEN")
+
+    def require_admin(request: Request):
+        token = request.headers.get("X-Admin-Token")
+        if not admin_token or token is None or not hmac.compare_digest(token.encode(), admin_token.encode()):
+            raise HTTPException(status_code=404, detail="Not Found")
+
+    @app.get("/admin/maintenance", include_in_schema=False)
+    async def maintenance_status(request: Request):
+        require_admin(request)
+        return shedder.status()
+
+    @app.post("/admin/maintenance", include_in_schema=False)
+    async def set_maintenance(body: MaintenanceRequest, request: Request):
+        require_admin(request)
+        shedder.draining = body.enabled
+        logger.warning("Maintenance mode %s", "enabled, draining traffic" if body.enabled else "disabled")
+        return shedder.status()
+
+    return shedder
+
+# Usage in FastAPI app:
+# from src.middleware.maintenance import install_load_shedding
+#
+# install_load_shedding(app)   # before install_monitoring(), so shed requests are counted
+#
+# curl -X POST -H "X-Admin-Token: $ADMIN_TOKEN" -d '{"enabled": true}' localhost:5001/admin/maintenance
@@ -0,0 +1,286 @@
+import bisect
+import resource
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds: 1ms .. 30s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class _Shard:
+    """One thread's private counters; only that thread ever writes to it"""
+
+    __slots__ = ("counters", "histograms")
+
+    def __init__(self):
+        self.counters: Dict[Tuple[str, tuple], float] = {}
+        self.histograms: Dict[Tuple[str, tuple], List[float]] = {}
+
+
+class MetricsRegistry:
+    """
+    Process-wide metrics store.
+
+    Each thread updates its own shard, so recording takes no lock; scrapes sum
+    the shards. Values read mid-update may lag by one observation, which is fine
+    for monitoring. Gauges are callbacks evaluated at scrape time.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: List[_Shard] = []
+        self._shards_lock = threading.Lock()
+        self._metrics: Dict[str, "_Metric"] = {}
+        self._gauges: List[Tuple[str, str, Callable[[], Dict[tuple, float]], Sequence[str]]] = []
+
+    def shard(self) -> _Shard:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> "Counter":
+        return self._register(Counter(self, name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> "Histogram":
+        return self._register(Histogram(self, name, help, labels, buckets))
+
+    def gauge(self, name: str, help: str, collect: Callable[[], Dict[tuple, float]], labels: Sequence[str] = ()):
+        """Register a gauge whose {label values: value} are computed by `collect` at scrape time"""
+        self._gauges.append((name, help, collect, tuple(labels)))
+
+    def _register(self, metric):
+        # Re-registering returns the existing metric, so modules can declare what they use
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def _snapshot(self):
+        counters: Dict[Tuple[str, tuple], float] = {}
+        histograms: Dict[Tuple[str, tuple], List[float]] = {}
+        with self._shards_lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for key, value in list(shard.counters.items()):
+                counters[key] = counters.get(key, 0.0) + value
+            for key, values in list(shard.histograms.items()):
+                merged = histograms.get(key)
+                if merged is None:
+                    histograms[key] = list(values)
+                else:
+                    for index, value in enumerate(values):
+                        merged[index] += value
+        return counters, histograms
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        counters, histograms = self._snapshot()
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            if metric.type == "counter":
+                for (name, values), value in counters.items():
+                    if name == metric.name:
+                        lines.append(f"{name}{_labels(metric.labels, values)} {_number(value)}")
+            else:
+                for (name, values), counts in histograms.items():
+                    if name == metric.name:
+                        metric.render_series(lines, values, counts)
+        for name, help, collect, labels in self._gauges:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} gauge")
+            try:
+                samples = collect()
+            except Exception:
+                continue
+            for values, value in samples.items():
+                lines.append(f"{name}{_labels(labels, values)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, registry: MetricsRegistry, name: str, help: str, labels: Sequence[str]):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, *values, amount: float = 1.0):
+        counters = self.registry.shard().counters
+        key = (self.name, values)
+        counters[key] = counters.get(key, 0.0) + amount
+
+
+class _Timer:
+    __slots__ = ("histogram", "values", "errors", "started")
+
+    def __init__(self, histogram: "Histogram", values: tuple, errors: Optional[Counter]):
+        self.histogram = histogram
+        self.values = values
+        self.errors = errors
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.started, *self.values)
+        if exc_type is not None and self.errors is not None:
+            self.errors.inc(*self.values)
+        return False
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram; each series is one flat list: per-bucket counts, +Inf count, sum"""
+
+    type = "histogram"
+
+    def __init__(self, registry, name, help, labels, buckets: Sequence[float]):
+        super().__init__(registry, name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *values):
+        histograms = self.registry.shard().histograms
+        key = (self.name, values)
+        series = histograms.get(key)
+        if series is None:
+            series = histograms[key] = [0.0] * (len(self.buckets) + 2)
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def time(self, *values, errors: Optional[Counter] = None) -> _Timer:
+        """Context manager observing the duration of its block; failures also count in `errors`"""
+        return _Timer(self, values, errors)
+
+    def render_series(self, lines: List[str], values: tuple, series: List[float]):
+        cumulative = 0.0
+        for bound, count in zip(self.buckets, series):
+            cumulative += count
+            bucket_labels = _labels(self.labels, values, 'le="%s"' % bound)
+            lines.append(f"{self.name}_bucket{bucket_labels} {_number(cumulative)}")
+        cumulative += series[len(self.buckets)]
+        bucket_labels = _labels(self.labels, values, 'le="+Inf"')
+        lines.append(f"{self.name}_bucket{bucket_labels} {_number(cumulative)}")
+        lines.append(f"{self.name}_sum{_labels(self.labels, values)} {_number(series[-1])}")
+        lines.append(f"{self.name}_count{_labels(self.labels, values)} {_number(cumulative)}")
+
+
+# Shared registry for the whole process
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests_total", "HTTP requests handled", ("method", "route", "status")
+)
+HTTP_LATENCY = REGISTRY.histogram(
+    "http_request_duration_seconds", "Time to handle an HTTP request", ("method", "route")
+)
+DEPENDENCY_LATENCY = REGISTRY.histogram(
+    "dependency_call_duration_seconds", "Time spent in calls to Spotify, Gemini and MySQL", ("dependency", "operation")
+)
+DEPENDENCY_ERRORS = REGISTRY.counter(
+    "dependency_call_errors_total", "Failed calls to Spotify, Gemini and MySQL", ("dependency", "operation")
+)
+
+
+def track_dependency(dependency: str, operation: str) -> _Timer:
+    """Time an outbound call: `with track_dependency("gemini", "chat"): ...`"""
+    return DEPENDENCY_LATENCY.time(dependency, operation, errors=DEPENDENCY_ERRORS)
+
+
+# name -> object with `hits` and `misses` attributes
+_CACHES: Dict[str, object] = {}
+
+
+def register_cache(name: str, cache):
+    """Expose hits, misses and hit ratio of a cache object with `hits`/`misses` attributes"""
+    _CACHES[name] = cache
+
+
+def _cache_ratios() -> Dict[tuple, float]:
+    ratios = {}
+    for name, cache in list(_CACHES.items()):
+        lookups = cache.hits + cache.misses
+        ratios[(name,)] = cache.hits / lookups if lookups else 0.0
+    return ratios
+
+
+REGISTRY.gauge("cache_hits", "Cache hits", lambda: {(name,): cache.hits for name, cache in list(_CACHES.items())}, ("cache",))
+REGISTRY.gauge("cache_misses", "Cache misses", lambda: {(name,): cache.misses for name, cache in list(_CACHES.items())}, ("cache",))
+REGISTRY.gauge("cache_hit_ratio", "Share of cache lookups that hit", _cache_ratios, ("cache",))
+
+
+def _cpu_seconds() -> Dict[tuple, float]:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return {(): usage.ru_utime + usage.ru_stime}
+
+
+def _max_rss() -> Dict[tuple, float]:
+    return {(): resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+
+
+REGISTRY.gauge("process_cpu_seconds", "User and system CPU time of this process", _cpu_seconds)
+REGISTRY.gauge("process_max_resident_memory_bytes", "Peak resident memory of this process", _max_rss)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware counting requests and timing them per route template.
+
+    Routes are labelled with their template (/artist/{artist_id}/top-tracks),
+    read from the scope after routing, so label cardinality stays bounded.
+    """
+
+    def __init__(self, app, registry: MetricsRegistry = REGISTRY):
+        self.app = app
+        self.requests = registry.counter(HTTP_REQUESTS.name, HTTP_REQUESTS.help, HTTP_REQUESTS.labels)
+        self.latency = registry.histogram(HTTP_LATENCY.name, HTTP_LATENCY.help, HTTP_LATENCY.labels)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            self.latency.observe(time.perf_counter() - started, method, path)
+            self.requests.inc(method, path, str(status))
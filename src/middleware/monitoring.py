@@ -0,0 +1,324 @@
+import hmac
+import os
+import sys
+import threading
+import tracemalloc
+import uuid
+from collections import Counter, OrderedDict
+from typing import Dict, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+
+from src.middleware.feature_branching import FeatureBranching
+from src.middleware.metrics import REGISTRY, MetricsMiddleware, register_cache
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# FeatureBranching flag guarding everything under /debug
+PROFILING_FEATURE = "profiling"
+MAX_PROFILE_SECONDS = 60.0
+
+
+class SamplingProfiler:
+    """
+    Statistical CPU profiler: a background thread snapshots every thread's stack
+    via sys._current_frames() each `interval` seconds.
+
+    Nothing is hooked into the interpreter, so overhead is limited to the
+    sampling thread while it runs. Results are "collapsed" stacks
+    (root;caller;callee -> samples), the input format of flamegraph.pl and
+    speedscope.
+    """
+
+    def __init__(self, interval: float = 0.005, max_depth: int = 64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self._stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self._stacks
+
+    def run(self, seconds: float) -> Counter:
+        """Profile the whole process for `seconds`, blocking the caller"""
+        self.start()
+        self._stop.wait(seconds)
+        return self.stop()
+
+    def _sample_loop(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                calls = []
+                while frame is not None and len(calls) < self.max_depth:
+                    code = frame.f_code
+                    calls.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                calls.append(names.get(ident, f"thread-{ident}"))
+                self._stacks[";".join(reversed(calls))] += 1
+            self.samples += 1
+
+    @staticmethod
+    def collapsed(stacks: Counter) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+class MemoryProfiler:
+    """tracemalloc snapshots; each diff compares against the previous snapshot"""
+
+    def __init__(self, frames: int = 1):
+        self.frames = frames
+        self._last: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> dict:
+        # Tracing slows allocations down noticeably, so it only runs between start and stop
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        return {"tracing": True}
+
+    def stop(self) -> dict:
+        with self._lock:
+            tracemalloc.stop()
+            self._last = None
+        return {"tracing": False}
+
+    def _take(self) -> tracemalloc.Snapshot:
+        if not tracemalloc.is_tracing():
+            raise HTTPException(status_code=409, detail="tracemalloc is not running, POST /debug/memory/start first")
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+
+    def snapshot(self, limit: int = 25) -> dict:
+        """Largest allocation sites right now; also becomes the baseline for diff()"""
+        with self._lock:
+            snapshot = self._take()
+            self._last = snapshot
+        stats = snapshot.statistics("lineno")
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "traced_kb": round(current / 1024, 1),
+            "peak_kb": round(peak / 1024, 1),
+            "top": [
+                {"location": str(stat.traceback), "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+                for stat in stats[:limit]
+            ],
+        }
+
+    def diff(self, limit: int = 25) -> dict:
+        """Allocation sites that grew (or shrank) most since the previous snapshot"""
+        with self._lock:
+            snapshot = self._take()
+            previous, self._last = self._last, snapshot
+        if previous is None:
+            return {"baseline": True, "top": []}
+        stats = snapshot.compare_to(previous, "lineno")
+        return {
+            "baseline": False,
+            "top": [
+                {
+                    "location": str(stat.traceback),
+                    "size_diff_kb": round(stat.size_diff / 1024, 1),
+                    "count_diff": stat.count_diff,
+                    "size_kb": round(stat.size / 1024, 1),
+                }
+                for stat in stats[:limit]
+            ],
+        }
+
+
+class Profiling:
+    """
+    Admin-only profiling state shared by the /debug endpoints and the middleware.
+
+    Requests must carry X-Admin-Token matching ADMIN_TOKEN and the "profiling"
+    feature must be on; otherwise the endpoints answer 404 as if they did not
+    exist. Only one CPU profile runs at a time.
+    """
+
+    def __init__(self, features: FeatureBranching, token: Optional[str], max_profiles: int = 20):
+        self.features = features
+        self.token = token
+        self.memory = MemoryProfiler(frames=int(os.getenv("TRACEMALLOC_FRAMES", 1)))
+        self.max_profiles = max_profiles
+        self._profiles: "OrderedDict[str, Counter]" = OrderedDict()
+        self.cpu_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.token) and self.features.is_enabled(PROFILING_FEATURE)
+
+    def authorized(self, token: Optional[str]) -> bool:
+        return self.enabled and token is not None and hmac.compare_digest(token.encode(), self.token.encode())
+
+    def save_profile(self, stacks: Counter, profile_id: Optional[str] = None) -> str:
+        profile_id = profile_id or uuid.uuid4().hex
+        self._profiles[profile_id] = stacks
+        while len(self._profiles) > self.max_profiles:
+            self._profiles.popitem(last=False)
+        return profile_id
+
+    def profile(self, profile_id: str) -> Optional[Counter]:
+        return self._profiles.get(profile_id)
+
+
+class RequestProfilingMiddleware:
+    """
+    Profiles single requests that carry `X-Debug-Profile: <admin token>`.
+
+    The sampler sees every thread while the request runs, so concurrent traffic
+    shows up too. The response gets an X-Profile-Id header; fetch the stacks from
+    /debug/profile/requests/{id}. With the feature off this is one flag lookup.
+    """
+
+    def __init__(self, app, profiling: Profiling, interval: float = 0.001):
+        self.app = app
+        self.profiling = profiling
+        self.interval = interval
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.profiling.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        token = None
+        for name, value in scope.get("headers", []):
+            if name == b"x-debug-profile":
+                token = value.decode("latin-1")
+                break
+        if not self.profiling.authorized(token) or not self.profiling.cpu_lock.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode("latin-1"))]
+            await send(message)
+
+        profiler = SamplingProfiler(self.interval)
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            stacks = profiler.stop()
+            self.profiling.cpu_lock.release()
+            self.profiling.save_profile(stacks, profile_id)
+
+
+def _install_profiling(app: FastAPI, features: FeatureBranching) -> Profiling:
+    profiling = Profiling(features, os.getenv("ADMIN_TOKEN"))
+    app.add_middleware(RequestProfilingMiddleware, profiling=profiling)
+
+    def require_admin(request: Request):
+        if not profiling.authorized(request.headers.get("X-Admin-Token")):
+            raise HTTPException(status_code=404, detail="Not Found")
+
+    # Plain `def` endpoints: they block while sampling, so they run in the threadpool
+    @app.get("/debug/profile/cpu", include_in_schema=False)
+    def cpu_profile(request: Request, seconds: float = 10.0, interval: float = 0.005):
+        """Sample all threads for `seconds` and return collapsed stacks for a flamegraph"""
+        require_admin(request)
+        if not profiling.cpu_lock.acquire(blocking=False):
+            raise HTTPException(status_code=409, detail="A profile is already running")
+        try:
+            profiler = SamplingProfiler(interval=min(max(interval, 0.001), 1.0))
+            stacks = profiler.run(min(max(seconds, 0.1), MAX_PROFILE_SECONDS))
+        finally:
+            profiling.cpu_lock.release()
+        return PlainTextResponse(
+            SamplingProfiler.collapsed(stacks),
+            headers={"X-Profile-Samples": str(profiler.samples), "X-Profile-Id": profiling.save_profile(stacks)},
+        )
+
+    @app.get("/debug/profile/requests/{profile_id}", include_in_schema=False)
+    def request_profile(profile_id: str, request: Request):
+        require_admin(request)
+        stacks = profiling.profile(profile_id)
+        if stacks is None:
+            raise HTTPException(status_code=404, detail="Profile not found")
+        return PlainTextResponse(SamplingProfiler.collapsed(stacks))
+
+    @app.post("/debug/memory/start", include_in_schema=False)
+    def memory_start(request: Request):
+        require_admin(request)
+        return profiling.memory.start()
+
+    @app.post("/debug/memory/stop", include_in_schema=False)
+    def memory_stop(request: Request):
+        require_admin(request)
+        return profiling.memory.stop()
+
+    @app.get("/debug/memory/snapshot", include_in_schema=False)
+    def memory_snapshot(request: Request, limit: int = 25):
+        require_admin(request)
+        return profiling.memory.snapshot(limit)
+
+    @app.get("/debug/memory/diff", include_in_schema=False)
+    def memory_diff(request: Request, limit: int = 25):
+        require_admin(request)
+        return profiling.memory.diff(limit)
+
+    return profiling
+
+
+def install_monitoring(app: FastAPI, caches: Optional[Dict[str, object]] = None,
+                       features: Optional[FeatureBranching] = None,
+                       default_features: Optional[Dict[str, object]] = None) -> FeatureBranching:
+    """
+    Add request metrics and a Prometheus /metrics endpoint to an app.
+
+    `caches` maps a name to any object with `hits` and `misses` counters, whose
+    hit ratio is then exported too.
+
+    Also mounts the admin-only /debug profiling endpoints, live only while the
+    "profiling" feature is enabled (PROFILING_ENABLED=true at startup) and
+    ADMIN_TOKEN is set. Returns the feature flags so they can be toggled at runtime
+    (or reloaded from FEATURE_FLAGS_FILE / FEATURE_FLAGS_TABLE); `default_features`
+    adds the app's own flags to them.
+    """
+    for name, cache in (caches or {}).items():
+        register_cache(name, cache)
+
+    if features is None:
+        features = FeatureBranching.from_env({
+            PROFILING_FEATURE: os.getenv("PROFILING_ENABLED", "false").lower() == "true",
+            **(default_features or {}),
+        })
+    _install_profiling(app, features)
+
+    app.add_middleware(MetricsMiddleware, registry=REGISTRY)
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return PlainTextResponse(REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+    return features
+
+# Usage in FastAPI app:
+# from src.middleware.monitoring import install_monitoring
+#
+# app = FastAPI()
+# install_monitoring(app, caches={"fusion": fusion_engine.cache})
+#
+# Profiling (PROFILING_ENABLED=true, ADMIN_TOKEN=...):
+# curl -H "X-Admin-Token: $ADMIN_TOKEN" "localhost:5001/debug/profile/cpu?seconds=15" | flamegraph.pl > cpu.svg
+# curl -i -H "X-Debug-Profile: $ADMIN_TOKEN" localhost:5001/recommend ...   # then GET /debug/profile/requests/<X-Profile-Id>
+# curl -X POST -H "X-Admin-Token: $ADMIN_TOKEN" localhost:5001/debug/memory/start
+# curl -H "X-Admin-Token: $ADMIN_TOKEN" localhost:5001/debug/memory/diff
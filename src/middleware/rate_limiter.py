@@ -0,0 +1,258 @@
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Only needed for the shared (multi-worker) backend
+    aioredis = None
+
+from src.logging.logger import get_logger
+from src.utils.session import bearer_token, verify_session_token
+
+logger = get_logger(__name__)
+
+
+class RateLimit:
+    """
+    Token bucket parameters: `rate` tokens per second, up to `burst` tokens banked.
+
+    Routes given limits with the same `name` draw from one shared bucket (e.g. all
+    routes that call Gemini); unnamed limits get a bucket per route. Routes with
+    per_caller=False skip the middleware's per-caller bucket.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None, name: Optional[str] = None,
+                 per_caller: bool = True):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(rate, 1.0))
+        self.name = name
+        self.per_caller = per_caller
+
+    @classmethod
+    def from_env(cls, variable: str, rate: float, burst: Optional[float] = None, name: Optional[str] = None,
+                 per_caller: bool = True) -> "RateLimit":
+        """Read "rate,burst" (or just "rate") from the environment, falling back to the given defaults"""
+        value = os.getenv(variable)
+        if value:
+            parts = [float(part) for part in value.split(",")]
+            rate, burst = parts[0], parts[1] if len(parts) > 1 else None
+        return cls(rate, burst, name=name, per_caller=per_caller)
+
+
+def _refill(tokens: float, last: float, now: float, limit: RateLimit) -> float:
+    return min(limit.burst, tokens + max(0.0, now - last) * limit.rate)
+
+
+class TokenBucket:
+    """A single thread-safe token bucket, for pacing outbound calls"""
+
+    def __init__(self, limit: RateLimit):
+        self.limit = limit
+        self.tokens = limit.burst
+        self.last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, cost: float = 1.0) -> Tuple[bool, float]:
+        """Take `cost` tokens if available; returns (taken, seconds until they would be)"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = _refill(self.tokens, self.last, now, self.limit)
+            self.last = now
+            if self.tokens >= cost:
+                self.tokens -= cost
+                return True, 0.0
+            return False, (cost - self.tokens) / self.limit.rate
+
+    def drain(self):
+        """Empty the bucket, e.g. after the upstream signalled it is over quota"""
+        with self._lock:
+            self.tokens = 0.0
+            self.last = time.monotonic()
+
+
+class InMemoryBucketStore:
+    """
+    Token buckets for a single process.
+
+    Each bucket is just (tokens, last refill time); tokens are topped up lazily on
+    access, so there are no timers. Least recently used buckets are dropped past
+    max_keys -- an idle bucket has refilled anyway, so forgetting it is harmless.
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def take(self, key: str, limit: RateLimit, cost: float = 1.0) -> Tuple[bool, float]:
+        """Take `cost` tokens from the bucket; returns (allowed, seconds until it would be allowed)"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (limit.burst, now))
+            tokens = _refill(tokens, last, now, limit)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (cost - tokens) / limit.rate
+
+
+# Same algorithm as InMemoryBucketStore, run atomically inside Redis with Redis' own clock
+_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'last')
+local tokens = tonumber(state[1]) or burst
+local last = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - last) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'last', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisBucketStore:
+    """Token buckets shared by every worker and replica through Redis (one hash per bucket)"""
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        if aioredis is None:
+            raise RuntimeError("The redis package is required for RATE_LIMIT_REDIS_URL")
+        self.prefix = prefix
+        self._redis = aioredis.from_url(url)
+        self._script = self._redis.register_script(_TAKE_SCRIPT)
+
+    async def take(self, key: str, limit: RateLimit, cost: float = 1.0) -> Tuple[bool, float]:
+        try:
+            allowed, tokens = await self._script(keys=[self.prefix + key], args=[limit.rate, limit.burst, cost])
+        except Exception as e:
+            # Fail open: an unreachable Redis shouldn't take the service down with it
+            logger.warning("Rate limit store unavailable: %s", e)
+            return True, 0.0
+        if allowed:
+            return True, 0.0
+        return False, (cost - float(tokens)) / limit.rate
+
+
+def create_bucket_store():
+    """Redis-backed store when RATE_LIMIT_REDIS_URL is set, otherwise per-process buckets"""
+    url = os.getenv("RATE_LIMIT_REDIS_URL")
+    if url:
+        try:
+            return RedisBucketStore(url)
+        except RuntimeError as e:
+            logger.warning("%s; falling back to in-process rate limiting", e)
+    return InMemoryBucketStore()
+
+
+def client_identity(scope) -> str:
+    """
+    Rate-limit key for the caller: the user id of a valid session token, or the
+    client address. Only verified identities count, so a caller can't get fresh
+    buckets by changing a header.
+    """
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            claims = verify_session_token(bearer_token(value.decode("latin-1")))
+            if claims is not None:
+                return f"user:{claims.get('uid') or claims.get('sub')}"
+            break
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware enforcing token buckets on selected routes.
+
+    Every limited route has a global bucket, sized to what the upstream API
+    (Spotify, Gemini) can sustain, and every caller gets their own bucket per
+    route so one client cannot drain the shared one. Rejected requests get a 429
+    with Retry-After instead of reaching the upstream.
+
+    Routes are matched on the exact path or as a "/prefix/" of it.
+    """
+
+    def __init__(
+        self,
+        app,
+        limits: Dict[str, RateLimit],
+        per_user: Optional[RateLimit] = None,
+        store=None,
+        identify: Callable = client_identity,
+    ):
+        self.app = app
+        self.limits = limits
+        self.per_user = per_user
+        self.store = store or InMemoryBucketStore()
+        self.identify = identify
+        # Longest prefix first, so the most specific route wins
+        self._routes = sorted(limits, key=len, reverse=True)
+
+    def _match(self, path: str) -> Optional[str]:
+        for route in self._routes:
+            if path == route or path.startswith(route.rstrip("/") + "/"):
+                return route
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        route = self._match(scope["path"])
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+        limit = self.limits[route]
+        bucket = limit.name or route
+
+        # Check the caller's own bucket first so a noisy client doesn't spend shared tokens
+        if self.per_user is not None and limit.per_caller:
+            allowed, retry_after = await self.store.take(f"{self.identify(scope)}:{bucket}", self.per_user)
+            if not allowed:
+                await self._reject(send, retry_after, "Too many requests from this client")
+                return
+        allowed, retry_after = await self.store.take(f"route:{bucket}", limit)
+        if not allowed:
+            await self._reject(send, retry_after, "Service is busy, please retry shortly")
+            return
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    async def _reject(send, retry_after: float, detail: str):
+        body = json.dumps({"detail": detail}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode("latin-1")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+# Usage in FastAPI app:
+# from src.middleware.rate_limiter import RateLimit, RateLimitMiddleware, create_bucket_store
+#
+# app.add_middleware(
+#     RateLimitMiddleware,
+#     limits={"/recommend": RateLimit(2, 10)},
+#     per_user=RateLimit(0.5, 3),
+#     store=create_bucket_store(),
+# )
@@ -0,0 +1,204 @@
+import json
+import time
+import uuid
+import zlib
+from typing import Any, Dict, Optional, Sequence
+
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # Falls back to the standard library encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # Only gzip is offered without it
+    brotli = None
+
+# Streams where each chunk must reach the client immediately
+UNCOMPRESSED_STREAM_TYPES = ("text/event-stream", "application/x-ndjson")
+
+
+def dumps(content: Any) -> bytes:
+    """Compact JSON bytes, through orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse serialised with orjson when available.
+
+    Returning one from an endpoint also skips FastAPI's response_model pass:
+    the model is still used for the OpenAPI schema, but the content, which must
+    be plain dicts/lists, goes out as is. Use it for data the service built itself.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+async def send_json(send, status: int, content, headers: Optional[Dict[str, str]] = None):
+    """Send a complete JSON response straight over ASGI, for middleware that answers early"""
+    body = dumps(content)
+    raw_headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode("latin-1")),
+    ]
+    for name, value in (headers or {}).items():
+        raw_headers.append((name.lower().encode("latin-1"), str(value).encode("latin-1")))
+    await send({"type": "http.response.start", "status": status, "headers": raw_headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+class ResponseHeadersMiddleware:
+    """
+    Pure ASGI middleware giving every response an X-Request-ID (the caller's, or
+    a new one) and a Server-Timing entry with the time to the first byte.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == b"x-request-id":
+                request_id = value[:128]
+                break
+        if request_id is None:
+            request_id = uuid.uuid4().hex.encode("latin-1")
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-request-id", request_id),
+                    (b"server-timing", f"app;dur={elapsed_ms:.1f}".encode("latin-1")),
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def _negotiate(accept_encoding: bytes) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header, honouring q=0"""
+    offered = {}
+    for item in accept_encoding.decode("latin-1").lower().split(","):
+        token, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        offered[token] = quality
+    if brotli is not None and offered.get("br", 0) > 0:
+        return "br"
+    if offered.get("gzip", offered.get("*", 0)) > 0:
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+            self._zlib = None
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)  # 31: gzip container
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if self._brotli is not None:
+            out = self._brotli.process(data)
+            return out + (self._brotli.finish() if final else self._brotli.flush())
+        out = self._zlib.compress(data)
+        return out + self._zlib.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI response compression: brotli when the client accepts it and the
+    brotli package is installed, else gzip.
+
+    A single-message body is compressed only above minimum_size, since small
+    payloads gain nothing. Streamed bodies are compressed chunk by chunk with a
+    flush after each one, except the latency-sensitive stream types (SSE,
+    NDJSON), which pass through like already-encoded responses.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4,
+                 skip_types: Sequence[str] = UNCOMPRESSED_STREAM_TYPES):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.skip_types = tuple(content_type.encode("latin-1") for content_type in skip_types)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = None
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                encoding = _negotiate(value)
+                break
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether compressing pays off
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                headers = list(start.get("headers", []))
+                content_type = b""
+                encoded = False
+                for name, value in headers:
+                    if name == b"content-type":
+                        content_type = value.lower()
+                    elif name == b"content-encoding":
+                        encoded = True
+                if encoded or content_type.startswith(self.skip_types) or (not more_body and len(body) < self.minimum_size):
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+
+                compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                headers = [(name, value) for name, value in headers if name != b"content-length"]
+                headers += [(b"content-encoding", encoding.encode("latin-1")), (b"vary", b"Accept-Encoding")]
+                body = compressor.compress(body, final=not more_body)
+                if not more_body:
+                    headers.append((b"content-length", str(len(body)).encode("latin-1")))
+                await send({**start, "headers": headers})
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+                return
+
+            await send({"type": "http.response.body", "body": compressor.compress(body, final=not more_body),
+                        "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,59 @@
+import os
+from typing import Optional
+
+from src.middleware.error_handler import ErrorHandlerMiddleware
+from src.middleware.response_handler import CompressionMiddleware, ResponseHeadersMiddleware
+from src.middleware.security import SecurityHeadersMiddleware
+from src.middleware.validation import DEFAULT_MAX_BODY_BYTES, RequestValidationMiddleware
+
+
+def compose(app, *layers):
+    """
+    Wrap an ASGI app in middleware, outermost first:
+    compose(app, (SecurityHeadersMiddleware, {"hsts_max_age": 0}), (ErrorHandlerMiddleware, {}))
+    """
+    for middleware, options in reversed(layers):
+        app = middleware(app, **options)
+    return app
+
+
+def default_layers(max_body_bytes: Optional[int] = None, hsts_max_age: Optional[int] = None,
+                   compress_min_bytes: Optional[int] = None):
+    """
+    The shared stack, outermost first: request id/timing -> security headers ->
+    compression -> errors -> validation. The header layers never raise, and
+    sitting outside the error handler they also decorate its 500s.
+    """
+    if max_body_bytes is None:
+        max_body_bytes = int(os.getenv("MAX_REQUEST_BODY_BYTES", DEFAULT_MAX_BODY_BYTES))
+    if hsts_max_age is None:
+        hsts_max_age = int(os.getenv("HSTS_MAX_AGE", 0))
+    if compress_min_bytes is None:
+        compress_min_bytes = int(os.getenv("COMPRESSION_MIN_BYTES", 1024))
+    return (
+        (ResponseHeadersMiddleware, {}),
+        (SecurityHeadersMiddleware, {"hsts_max_age": hsts_max_age}),
+        (CompressionMiddleware, {"minimum_size": compress_min_bytes}),
+        (ErrorHandlerMiddleware, {}),
+        (RequestValidationMiddleware, {"max_body_bytes": max_body_bytes}),
+    )
+
+
+def install_middleware_stack(app, max_body_bytes: Optional[int] = None, hsts_max_age: Optional[int] = None,
+                             compress_min_bytes: Optional[int] = None):
+    """
+    Mount the shared pure-ASGI stack on a FastAPI app.
+
+    Call it after the app's other add_middleware() calls: the last one added is
+    the outermost, and the error handler should see failures from every layer.
+    Every layer only wraps send/receive, so streaming responses are untouched.
+    """
+    for middleware, options in reversed(default_layers(max_body_bytes, hsts_max_age, compress_min_bytes)):
+        app.add_middleware(middleware, **options)
+
+# Usage in FastAPI app:
+# from src.middleware.stack import install_middleware_stack
+#
+# app = FastAPI()
+# ... other app.add_middleware(...) calls ...
+# install_middleware_stack(app)
@@ -0,0 +1,310 @@
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+from typing import Dict, List, Optional
+
+# A child of the "sonicsoul" logger, so records go through the queued JSON pipeline.
+# src.logging.logger imports this module for the current span, hence not get_logger().
+logger = logging.getLogger(f"sonicsoul.{__name__}")
+
+# W3C trace context: version-traceid-parentid-flags
+_TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "sampled", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], sampled: bool):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = random.getrandbits(64).to_bytes(8, "big").hex()
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes: Dict[str, object] = {}
+        self.error: Optional[str] = None
+
+    def set(self, key: str, value):
+        if self.sampled:
+            self.attributes[key] = value
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def to_dict(self, service: str) -> dict:
+        return {
+            "service": service,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+def new_traceparent(sample_rate: float = 1.0) -> str:
+    """Start a new trace (for clients without a tracer, e.g. the frontend)"""
+    flags = "01" if random.random() < sample_rate else "00"
+    return f"00-{random.getrandbits(128):032x}-{random.getrandbits(64):016x}-{flags}"
+
+
+def parse_traceparent(header: Optional[str]):
+    """Return (trace_id, parent span id, sampled) from a traceparent header, or None"""
+    match = _TRACEPARENT_RE.match((header or "").strip().lower())
+    if match is None or match.group(1) == "0" * 32:
+        return None
+    return match.group(1), match.group(2), bool(int(match.group(3), 16) & 1)
+
+
+def current_traceparent() -> Optional[str]:
+    span = _current_span.get()
+    return span.traceparent if span is not None else None
+
+
+class JsonlFileExporter:
+    """Appends one JSON object per span to a local file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, spans: List[dict]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span) + "\n")
+
+
+class OTLPHttpExporter:
+    """Posts spans to an OpenTelemetry collector using OTLP/HTTP with JSON encoding"""
+
+    def __init__(self, endpoint: str, timeout: float = 5.0):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.timeout = timeout
+
+    @staticmethod
+    def _attributes(values: Dict[str, object]) -> List[dict]:
+        attributes = []
+        for key, value in values.items():
+            if isinstance(value, bool):
+                encoded = {"boolValue": value}
+            elif isinstance(value, int):
+                encoded = {"intValue": str(value)}
+            elif isinstance(value, float):
+                encoded = {"doubleValue": value}
+            else:
+                encoded = {"stringValue": str(value)}
+            attributes.append({"key": key, "value": encoded})
+        return attributes
+
+    def export(self, spans: List[dict]):
+        by_service: Dict[str, List[dict]] = {}
+        for span in spans:
+            otlp_span = {
+                "traceId": span["trace_id"],
+                "spanId": span["span_id"],
+                "name": span["name"],
+                "kind": 2 if span["parent_id"] is None or span["attributes"].get("span.kind") == "server" else 1,
+                "startTimeUnixNano": str(span["start_ns"]),
+                "endTimeUnixNano": str(span["start_ns"] + int(span["duration_ms"] * 1e6)),
+                "attributes": self._attributes(span["attributes"]),
+                "status": {"code": 2, "message": span["error"]} if span["error"] else {"code": 1},
+            }
+            if span["parent_id"]:
+                otlp_span["parentSpanId"] = span["parent_id"]
+            by_service.setdefault(span["service"], []).append(otlp_span)
+
+        payload = {"resourceSpans": [
+            {
+                "resource": {"attributes": self._attributes({"service.name": service})},
+                "scopeSpans": [{"scope": {"name": "sonicsoul"}, "spans": service_spans}],
+            }
+            for service, service_spans in by_service.items()
+        ]}
+        request = urllib.request.Request(
+            self.url, data=json.dumps(payload).encode("utf-8"), headers={"Content-Type": "application/json"}
+        )
+        urllib.request.urlopen(request, timeout=self.timeout).close()
+
+
+class Tracer:
+    """
+    Creates spans and ships the sampled ones to an exporter from a background thread.
+
+    A new trace is sampled with probability sample_rate; a propagated one keeps
+    the caller's decision. Unsampled spans still carry ids for propagation but
+    are never recorded or exported. Spans are dropped, not blocked on, when the
+    export queue is full.
+    """
+
+    def __init__(self, service: str, exporter=None, sample_rate: float = 0.1, max_queue: int = 4096,
+                 batch_size: int = 256, interval: float = 2.0):
+        self.service = service
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue: "queue.Queue[dict]" = queue.Queue(maxsize=max_queue)
+        self._worker = None
+        if exporter is not None:
+            self._worker = threading.Thread(target=self._export_loop, name="trace-exporter", daemon=True)
+            self._worker.start()
+            atexit.register(self.flush)
+
+    def start_span(self, name: str, traceparent: Optional[str] = None) -> Span:
+        parent = _current_span.get()
+        if traceparent is not None:
+            remote = parse_traceparent(traceparent)
+            if remote is not None:
+                trace_id, parent_id, sampled = remote
+                return Span(name, trace_id, parent_id, sampled and self.exporter is not None)
+        if parent is not None:
+            return Span(name, parent.trace_id, parent.span_id, parent.sampled)
+        sampled = self.exporter is not None and random.random() < self.sample_rate
+        return Span(name, f"{random.getrandbits(128):032x}", None, sampled)
+
+    def end_span(self, span: Span):
+        span.end_ns = time.time_ns()
+        if not span.sampled:
+            return
+        try:
+            self._queue.put_nowait(span.to_dict(self.service))
+        except queue.Full:
+            pass
+
+    def _drain(self) -> List[dict]:
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _export_loop(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+    def flush(self):
+        while True:
+            batch = self._drain()
+            if not batch:
+                return
+            try:
+                self.exporter.export(batch)
+            except Exception as e:
+                logger.warning("Dropped %s spans, export failed: %s", len(batch), e)
+                return
+
+
+class _SpanScope:
+    __slots__ = ("tracer", "name", "attributes", "traceparent", "span", "token")
+
+    def __init__(self, tracer: Tracer, name: str, attributes: dict, traceparent: Optional[str]):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.traceparent = traceparent
+
+    def __enter__(self) -> Span:
+        self.span = self.tracer.start_span(self.name, self.traceparent)
+        if self.span.sampled:
+            self.span.attributes.update(self.attributes)
+        self.token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_span.reset(self.token)
+        if exc_type is not None:
+            self.span.error = f"{exc_type.__name__}: {exc}"
+        self.tracer.end_span(self.span)
+        return False
+
+
+# Process-wide tracer; records nothing until configure_tracing() gives it an exporter
+_tracer = Tracer("sonicsoul")
+
+
+def configure_tracing(service: str) -> Tracer:
+    """
+    Set up the process tracer from the environment.
+
+    TRACE_FILE writes spans as JSON lines to a file; OTEL_EXPORTER_OTLP_ENDPOINT
+    sends them to an OpenTelemetry collector instead. TRACE_SAMPLE_RATE (default
+    0.1) is the share of new traces recorded.
+    """
+    global _tracer
+    exporter = None
+    if os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"):
+        exporter = OTLPHttpExporter(os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"))
+    elif os.getenv("TRACE_FILE"):
+        exporter = JsonlFileExporter(os.getenv("TRACE_FILE"))
+    _tracer = Tracer(service, exporter, sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", 0.1)))
+    return _tracer
+
+
+def span(name: str, traceparent: Optional[str] = None, **attributes) -> _SpanScope:
+    """`with span("gemini.chat", model=...):` -- a child of the current span, or a new trace"""
+    return _SpanScope(_tracer, name, attributes, traceparent)
+
+
+async def inject_trace_headers(request):
+    """httpx request hook propagating the current trace to downstream services"""
+    traceparent = current_traceparent()
+    if traceparent is not None:
+        request.headers["traceparent"] = traceparent
+
+
+class TracingMiddleware:
+    """ASGI middleware opening a server span per request, continuing an incoming traceparent"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for name, value in scope.get("headers", []):
+            if name == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        with span(f"{scope['method']} {scope['path']}", traceparent, **{"span.kind": "server"}) as server_span:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = scope.get("route")
+                if route is not None:
+                    server_span.name = f"{scope['method']} {route.path}"
+                server_span.set("http.method", scope["method"])
+                server_span.set("http.target", scope["path"])
+                server_span.set("http.status_code", status)
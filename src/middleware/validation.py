@@ -0,0 +1,70 @@
+from starlette.exceptions import HTTPException
+from typing import Sequence
+
+from src.middleware.response_handler import send_json
+
+# Content types accepted on requests that carry a body
+DEFAULT_CONTENT_TYPES = ("application/json", "multipart/form-data", "application/x-www-form-urlencoded")
+DEFAULT_MAX_BODY_BYTES = 10 * 1024 * 1024
+
+
+class RequestValidationMiddleware:
+    """
+    Pure ASGI middleware rejecting requests before they reach the routes:
+    unsupported Content-Type (415) and bodies over max_body_bytes (413).
+
+    A declared Content-Length is checked up front. Chunked bodies are counted
+    as the endpoint reads them, so nothing is buffered here and streaming
+    uploads keep streaming.
+    """
+
+    def __init__(self, app, max_body_bytes: int = DEFAULT_MAX_BODY_BYTES,
+                 content_types: Sequence[str] = DEFAULT_CONTENT_TYPES):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+        self.content_types = tuple(content_type.encode("latin-1") for content_type in content_types)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in ("GET", "HEAD", "OPTIONS", "DELETE"):
+            await self.app(scope, receive, send)
+            return
+
+        content_type = b""
+        content_length = None
+        chunked = False
+        for name, value in scope.get("headers", []):
+            if name == b"content-type":
+                content_type = value.split(b";", 1)[0].strip().lower()
+            elif name == b"content-length":
+                try:
+                    content_length = int(value)
+                except ValueError:
+                    await send_json(send, 400, {"detail": "Invalid Content-Length"})
+                    return
+            elif name == b"transfer-encoding":
+                chunked = b"chunked" in value.lower()
+
+        has_body = chunked or (content_length or 0) > 0
+        if has_body and not content_type.startswith(self.content_types):
+            await send_json(send, 415, {"detail": "Unsupported Content-Type"})
+            return
+        if content_length is not None and content_length > self.max_body_bytes:
+            await send_json(send, 413, {"detail": "Request body too large"})
+            return
+        if content_length is not None:
+            # The server enforces the declared length, nothing left to count
+            await self.app(scope, receive, send)
+            return
+
+        received = 0
+
+        async def counting_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_bytes:
+                    raise HTTPException(status_code=413, detail="Request body too large")
+            return message
+
+        await self.app(scope, counting_receive, send)
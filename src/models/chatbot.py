@@ -1,52 +1,93 @@
 import google.generativeai as genai
-from typing import List
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Iterator, List, Optional, Tuple
+import contextvars
 import json
+import re
+import threading
+
+from src.logging.logger import get_logger
+from src.middleware.metrics import track_dependency
+from src.middleware.tracing import span
+from src.models.text import MOOD_KEYWORDS, ChunkedSentiment
+from src.utils.common import MOODS
+
+logger = get_logger(__name__)
+
+SUPPORTED_MOODS = set(MOODS)
+
+# Map common variations to standard moods
+LLM_MOOD_MAPPINGS = {
+    'happy': 'positive', 'joyful': 'positive', 'excited': 'positive',
+    'sad': 'negative', 'angry': 'negative', 'upset': 'negative',
+    'calm': 'relaxed', 'peaceful': 'relaxed', 'chill': 'relaxed',
+    'energized': 'energetic', 'active': 'energetic', 'hyped': 'energetic'
+}
+
+CHAT_GENERATION_CONFIG = {
+    "temperature": 0.0,
+    "max_output_tokens": 150,
+    "top_p": 1.0,
+    "top_k": 40
+}
+
+# Upper bound for a single Gemini call, so abandoned hedged calls don't pile up.
+# The client's default retry keeps retrying for up to 10 minutes, so it is switched off:
+# a hedged call that fails has already lost to the keyword answer.
+LLM_REQUEST_TIMEOUT_S = 10.0
+LLM_REQUEST_OPTIONS = {"timeout": LLM_REQUEST_TIMEOUT_S, "retry": None}
+
+GEMINI_MODEL = "gemini-2.0-flash"
 
 
 class ChatModel:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, max_llm_workers: int = 8):
         genai.configure(api_key=api_key)
         self.client = genai
+        # Background pool used to race the LLM against a latency budget
+        self._executor = ThreadPoolExecutor(max_workers=max_llm_workers, thread_name_prefix="llm")
+        # One slot per worker: with every worker busy a hedged call would only queue and miss its budget
+        self._llm_slots = threading.BoundedSemaphore(max_llm_workers)
+        self.chunked = ChunkedSentiment()
 
-    def classify_sentiment(self, message: str) -> str:
-        """Classify the sentiment/mood of a message into one of our supported categories"""
-        
-        # Comprehensive mood keywords dictionary
-        mood_keywords = {
-            'positive': {
-                'happy', 'joy', 'excited', 'great', 'wonderful', 'love', 'amazing', 'good', 'fantastic',
-                'awesome', 'glad', 'delighted', 'pleased', 'grateful', 'blessed', 'thrilled', 'cheery',
-                'beautiful', 'brilliant', 'success', 'win', 'proud', 'perfect', 'smile', 'laugh'
-            },
-            'negative': {
-                'sad', 'angry', 'upset', 'terrible', 'bad', 'hate', 'awful', 'disappointed', 'frustrated',
-                'depressed', 'worried', 'anxious', 'stressed', 'hurt', 'pain', 'miserable', 'sick',
-                'tired', 'lost', 'fear', 'lonely', 'heartbroken', 'crying', 'mad', 'annoyed'
-            },
-            'energetic': {
-                'pumped', 'energized', 'hyped', 'active', 'dynamic', 'party', 'dance', 'workout', 'run',
-                'exercise', 'power', 'strong', 'fire', 'fast', 'rush', 'action', 'move', 'jump',
-                'bounce', 'racing', 'alive', 'motivated', 'lets go', 'ready', 'energy'
-            },
-            'relaxed': {
-                'calm', 'peaceful', 'chill', 'relax', 'quiet', 'gentle', 'soothing', 'mellow', 'tranquil',
-                'rest', 'zen', 'serene', 'harmony', 'slow', 'smooth', 'easy', 'meditation', 'mindful',
-                'cozy', 'comfortable', 'content', 'still', 'settled', 'soft', 'dreamy'
-            }
+    def _generate(self, operation: str, **kwargs):
+        """Single entry point for Gemini calls, timed per operation"""
+        with span(f"gemini.{operation}"), track_dependency("gemini", operation):
+            return self.client.GenerativeModel(GEMINI_MODEL).generate_content(**kwargs)
+
+    def _submit_llm(self, fn, *args) -> Optional[Future]:
+        """Run fn on a free LLM worker in the caller's context, or return None if all are busy"""
+        if not self._llm_slots.acquire(blocking=False):
+            return None
+        try:
+            # A copy of the caller's context so the Gemini span joins the request trace
+            future = self._executor.submit(contextvars.copy_context().run, fn, *args)
+        except BaseException:
+            self._llm_slots.release()
+            raise
+        future.add_done_callback(lambda _: self._llm_slots.release())
+        return future
+
+    def ping(self):
+        """Cheap Gemini reachability check for health probes: model metadata, no generation"""
+        with span("gemini.ping"), track_dependency("gemini", "ping"):
+            self.client.get_model(f"models/{GEMINI_MODEL}")
+
+    def _keyword_matches(self, message_lower: str) -> dict:
+        """Count keyword hits per mood"""
+        return {
+            mood: sum(1 for keyword in keywords if keyword in message_lower)
+            for mood, keywords in MOOD_KEYWORDS.items()
         }
 
-        print(f"\n[Sentiment Analysis] Input message: '{message}'")
-        
-        # First try keyword matching
-        message_lower = message.lower()
-        for mood, keywords in mood_keywords.items():
-            # Count how many keywords match
-            matches = sum(1 for keyword in keywords if keyword in message_lower)
-            if matches >= 2:  # If multiple keywords match, we have high confidence
-                print(f"[Sentiment Analysis] Strong keyword matches ({matches}) for mood: {mood}")
-                return mood
+    def keyword_sentiment(self, message: str) -> str:
+        """Cheap keyword-only classifier: the mood with the most hits, or neutral"""
+        matches = self._keyword_matches(message.lower())
+        mood, count = max(matches.items(), key=lambda item: item[1])
+        return mood if count > 0 else "neutral"
 
-        # If no strong keyword matches, try LLM
+    def _llm_sentiment(self, message: str) -> str:
+        """Ask Gemini for a mood; returns a supported mood or raises on failure"""
         prompt = (
             "Analyze the emotional content of this message and classify it into EXACTLY ONE mood category.\n"
             "Important Guidelines:\n"
@@ -66,73 +107,219 @@ class ChatModel:
             "Classification:"
         )
 
-        try:
-            response = self.client.GenerativeModel("gemini-2.0-flash").generate_content(
-                contents=[prompt],
-                generation_config={
-                    "temperature": 0.1,
-                    "max_output_tokens": 10,
-                    "top_p": 0.95,
-                    "top_k": 40
-                }
-            )
-
-            # Extract and clean up the response
-            raw_response = response.text.strip().lower()
-            print(f"[Sentiment Analysis] Raw model response: '{raw_response}'")
-                
-            # Map common variations to standard moods
-            mood_mappings = {
-                'happy': 'positive', 'joyful': 'positive', 'excited': 'positive',
-                'sad': 'negative', 'angry': 'negative', 'upset': 'negative',
-                'calm': 'relaxed', 'peaceful': 'relaxed', 'chill': 'relaxed',
-                'energized': 'energetic', 'active': 'energetic', 'hyped': 'energetic'
-            }
-            
-            sentiment = mood_mappings.get(raw_response, raw_response)
-            print(f"[Sentiment Analysis] Mapped sentiment: '{sentiment}'")
-            
-            supported_moods = {"positive", "negative", "neutral", "energetic", "relaxed"}
-            if sentiment not in supported_moods:
-                print(f"[Sentiment Analysis] WARNING: Unsupported sentiment '{sentiment}'")
-                # Try single keyword matching as a fallback
-                for mood, keywords in mood_keywords.items():
-                    if any(keyword in message_lower for keyword in keywords):
-                        sentiment = mood
-                        print(f"[Sentiment Analysis] Fallback keyword match: {mood}")
-                        break
-                else:
-                    sentiment = 'neutral'
-                    print("[Sentiment Analysis] No keyword matches, defaulting to neutral")
-            
-            print(f"[Sentiment Analysis] Final sentiment: '{sentiment}'")
-            return sentiment
+        response = self._generate(
+            "sentiment",
+            contents=[prompt],
+            generation_config={
+                "temperature": 0.1,
+                "max_output_tokens": 10,
+                "top_p": 0.95,
+                "top_k": 40
+            },
+            request_options=LLM_REQUEST_OPTIONS
+        )
+
+        # Extract and clean up the response
+        raw_response = response.text.strip().lower()
+        logger.debug("[Sentiment Analysis] Raw model response: '%s'", raw_response)
+
+        sentiment = LLM_MOOD_MAPPINGS.get(raw_response, raw_response)
+        logger.debug("[Sentiment Analysis] Mapped sentiment: '%s'", sentiment)
+
+        if sentiment not in SUPPORTED_MOODS:
+            raise ValueError(f"Unsupported sentiment '{sentiment}'")
+        return sentiment
+
+    def classify_sentiment(self, message: str) -> str:
+        """Classify the sentiment/mood of a message into one of our supported categories"""
+        sentiment, _ = self.classify_sentiment_with_source(message)
+        return sentiment
+
+    def classify_sentiment_with_source(
+        self, message: str, latency_budget: Optional[float] = None
+    ) -> Tuple[str, str]:
+        """
+        Classify a message and report where the answer came from ("keyword" or "llm").
+
+        With a latency budget (seconds) the LLM call is raced against the keyword
+        classifier: the LLM answer wins if it arrives in time, otherwise the keyword
+        answer is returned and the LLM call is left to finish in the background.
+        """
+        logger.debug("[Sentiment Analysis] Input message: '%s'", message)
+
+        # First try keyword matching
+        matches = self._keyword_matches(message.lower())
+        for mood, count in matches.items():
+            if count >= 2:  # If multiple keywords match, we have high confidence
+                logger.debug("[Sentiment Analysis] Strong keyword matches (%s) for mood: %s", count, mood)
+                return mood, "keyword"
+
+        # If no strong keyword matches, try LLM
+        llm_future = self._submit_llm(self._llm_sentiment, message)
+
+        # Cheap answer computed while the LLM is in flight
+        cheap_sentiment = self.keyword_sentiment(message)
+
+        if llm_future is None:
+            logger.warning("[Sentiment Analysis] All LLM workers busy, using keyword answer: %s", cheap_sentiment)
+            return cheap_sentiment, "keyword"
 
+        try:
+            sentiment = llm_future.result(timeout=latency_budget)
+            logger.info("[Sentiment Analysis] Final sentiment: '%s'", sentiment)
+            return sentiment, "llm"
+        except FutureTimeoutError:
+            logger.warning("[Sentiment Analysis] LLM exceeded budget of %.3fs, using keyword answer: %s", latency_budget, cheap_sentiment)
         except Exception as e:
-            print(f"[Sentiment Analysis] Error in LLM processing: {str(e)}")
-            # Try simple keyword matching as fallback
-            for mood, keywords in mood_keywords.items():
-                if any(keyword in message_lower for keyword in keywords):
-                    print(f"[Sentiment Analysis] Error fallback keyword match: {mood}")
-                    return mood
-            
-            print("[Sentiment Analysis] No keywords matched, using neutral")
-            return "neutral"
-
-    def chat(self, message: str) -> str:
+            logger.error("[Sentiment Analysis] Error in LLM processing: %s", e)
+
+        logger.info("[Sentiment Analysis] Fallback keyword sentiment: '%s'", cheap_sentiment)
+        return cheap_sentiment, "keyword"
+
+    def _llm_sentiment_batch(self, chunks: List[str]) -> List[Optional[str]]:
+        """Classify several text chunks with one Gemini call; unparseable answers come back as None"""
+        numbered = "\n".join(f"{index + 1}. {chunk}" for index, chunk in enumerate(chunks))
         prompt = (
+            "Classify the mood of each numbered passage into EXACTLY ONE of: "
+            "positive, negative, energetic, relaxed, neutral.\n"
+            "Answer with one line per passage in the form '<number>: <mood>' and nothing else.\n\n"
+            f"{numbered}\n\n"
+            "Classifications:"
+        )
+        response = self._generate(
+            "sentiment_batch",
+            contents=[prompt],
+            generation_config={
+                "temperature": 0.1,
+                "max_output_tokens": 8 * len(chunks) + 10,
+                "top_p": 0.95,
+                "top_k": 40
+            },
+            request_options=LLM_REQUEST_OPTIONS
+        )
+
+        results: List[Optional[str]] = [None] * len(chunks)
+        for match in re.finditer(r"(\d+)\s*[:.)-]\s*([a-z]+)", response.text.lower()):
+            index = int(match.group(1)) - 1
+            sentiment = LLM_MOOD_MAPPINGS.get(match.group(2), match.group(2))
+            if 0 <= index < len(chunks) and sentiment in SUPPORTED_MOODS:
+                results[index] = sentiment
+        return results
+
+    def classify_sentiment_long(self, message: str, latency_budget: Optional[float] = None) -> dict:
+        """
+        Classify long, journal-style input by sentence chunks.
+
+        The lexicon scores every chunk; only chunks with mixed signals are sent to
+        the LLM, together in one call, and all chunk evidence is aggregated into one
+        mood with a confidence. The LLM call honours the same latency budget as
+        classify_sentiment_with_source.
+        """
+        chunks, scores, lengths, ambiguous = self.chunked.score(message)
+        logger.info("[Sentiment Analysis] Long input: %s chunks, %s escalated", len(chunks), len(ambiguous))
+
+        resolved = {}
+        source = "lexicon"
+        llm_future = self._submit_llm(self._llm_sentiment_batch, [chunks[index] for index in ambiguous]) if ambiguous else None
+        if ambiguous and llm_future is None:
+            logger.warning("[Sentiment Analysis] All LLM workers busy, using lexicon scores only")
+        if llm_future is not None:
+            try:
+                answers = llm_future.result(timeout=latency_budget)
+                resolved = {index: answer for index, answer in zip(ambiguous, answers) if answer is not None}
+                if resolved:
+                    source = "lexicon+llm"
+            except FutureTimeoutError:
+                logger.warning("[Sentiment Analysis] Batch LLM exceeded budget, using lexicon scores only")
+            except Exception as e:
+                logger.error("[Sentiment Analysis] Error in batch LLM processing: %s", e)
+
+        sentiment, confidence = self.chunked.aggregate(scores, lengths, resolved)
+        logger.info("[Sentiment Analysis] Aggregated sentiment: '%s' (confidence %s)", sentiment, confidence)
+        return {
+            "sentiment": sentiment,
+            "confidence": confidence,
+            "source": source,
+            "chunks": len(chunks),
+            "escalated": len(resolved),
+        }
+
+    def _chat_prompt(self, message: str, summary: str = "", history: Optional[List[Tuple[str, str]]] = None) -> str:
+        context = ""
+        if summary:
+            context += f"Summary of the earlier conversation: {summary}\n\n"
+        for user_turn, assistant_turn in history or []:
+            context += f"User: {user_turn}\nAssistant: {assistant_turn}\n"
+        return (
             "You are a helpful assistant. "
             "Respond to the user's message in a friendly and informative manner.\n\n"
-            f"User: {message}\nAssistant:"
+            f"{context}User: {message}\nAssistant:"
         )
-        response = self.client.GenerativeModel("gemini-2.0-flash").generate_content(
+
+    def summarize_conversation(self, previous_summary: str, turns: List[Tuple[str, str]]) -> str:
+        """Fold older turns into the rolling conversation summary"""
+        transcript = "\n".join(f"User: {user_turn}\nAssistant: {assistant_turn}" for user_turn, assistant_turn in turns)
+        prompt = (
+            "Update the running summary of a conversation between a user and a music assistant. "
+            "Keep facts about the user's mood, preferences and requests; drop small talk. "
+            "Answer with at most three sentences.\n\n"
+            f"Current summary: {previous_summary or '(none)'}\n\n"
+            f"New turns:\n{transcript}\n\n"
+            "Updated summary:"
+        )
+        response = self._generate(
+            "summarize",
             contents=[prompt],
             generation_config={
                 "temperature": 0.0,
-                "max_output_tokens": 150,
+                "max_output_tokens": 120,
                 "top_p": 1.0,
                 "top_k": 40
-            }
+            },
+            request_options=LLM_REQUEST_OPTIONS
+        )
+        return response.text.strip()
+
+    def chat(self, message: str, summary: str = "", history: Optional[List[Tuple[str, str]]] = None) -> str:
+        prompt = self._chat_prompt(message, summary, history)
+        response = self._generate(
+            "chat",
+            contents=[prompt],
+            generation_config=CHAT_GENERATION_CONFIG
         )
         reply = response.text.strip()
-        return reply
\ No newline at end of file
+        return reply
+
+    def stream_chat(
+        self,
+        message: str,
+        cancel_event: Optional[threading.Event] = None,
+        summary: str = "",
+        history: Optional[List[Tuple[str, str]]] = None,
+    ) -> Iterator[str]:
+        """
+        Yield the reply as Gemini generates it.
+
+        Setting cancel_event (or closing the generator) stops pulling chunks, which
+        tears down the upstream stream instead of generating tokens nobody reads.
+        """
+        prompt = self._chat_prompt(message, summary, history)
+        response = self._generate(
+            "chat_stream",
+            contents=[prompt],
+            generation_config=CHAT_GENERATION_CONFIG,
+            stream=True
+        )
+        chunks = iter(response)
+        try:
+            for chunk in chunks:
+                if cancel_event is not None and cancel_event.is_set():
+                    logger.info("[Chat] Stream cancelled by caller")
+                    break
+                text = getattr(chunk, "text", "")
+                if text:
+                    yield text
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
@@ -0,0 +1,193 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Executor
+from typing import Callable, Deque, List, Optional, Tuple
+
+from src.logging.logger import get_logger
+
+logger = get_logger(__name__)
+
+# (user message, assistant reply)
+Turn = Tuple[str, str]
+
+# Rough chars-per-token ratio used for prompt budgeting; good enough for Gemini's tokenizer
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate that avoids a tokenizer round trip"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _turn_chars(turn: Turn) -> int:
+    return len(turn[0]) + len(turn[1])
+
+
+class ConversationSession:
+    """Bounded state for one conversation: recent turns plus a rolling summary"""
+
+    __slots__ = ("session_id", "turns", "summary", "pending", "summarizing", "last_seen", "chars")
+
+    def __init__(self, session_id: str, max_turns: int):
+        self.session_id = session_id
+        self.turns: Deque[Turn] = deque(maxlen=max_turns)
+        self.summary = ""
+        # Turns that fell out of the ring buffer but are not folded into the summary yet;
+        # they stay in the prompt verbatim until a summary that covers them is in place
+        self.pending: List[Turn] = []
+        self.summarizing = False
+        self.last_seen = time.monotonic()
+        self.chars = 0
+
+
+class ConversationStore:
+    """
+    Per-session conversation memory with fixed per-turn prompt cost.
+
+    Recent turns live in a ring buffer; turns pushed out of it are folded into a
+    cached rolling summary by `summarizer` in the background, so the summary is only
+    recomputed when new turns are evicted. Until a fold succeeds the evicted turns
+    are still offered to the prompt, and a failed fold is retried with the next
+    eviction. Sessions are kept in LRU order, idle ones are dropped lazily on
+    access, and the total stored text is capped.
+    """
+
+    def __init__(
+        self,
+        summarizer: Callable[[str, List[Turn]], str],
+        executor: Optional[Executor] = None,
+        max_turns: int = 6,
+        max_prompt_tokens: int = 1024,
+        summary_tokens: int = 200,
+        summary_batch: int = 2,
+        max_sessions: int = 1000,
+        max_total_chars: int = 4_000_000,
+        idle_ttl: float = 1800.0,
+    ):
+        self.summarizer = summarizer
+        self.executor = executor
+        self.max_turns = max_turns
+        self.max_prompt_tokens = max_prompt_tokens
+        self.summary_tokens = summary_tokens
+        self.summary_batch = summary_batch
+        self.max_sessions = max_sessions
+        self.max_total_chars = max_total_chars
+        self.idle_ttl = idle_ttl
+        self._sessions: "OrderedDict[str, ConversationSession]" = OrderedDict()
+        self._total_chars = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _evict_idle(self, now: float):
+        # Sessions are in LRU order, so idle ones are always at the front
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_seen < self.idle_ttl:
+                break
+            self._drop(session_id)
+
+    def _drop(self, session_id: str):
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._total_chars -= session.chars
+
+    def _enforce_limits(self, keep: str):
+        while self._sessions and (
+            len(self._sessions) > self.max_sessions or self._total_chars > self.max_total_chars
+        ):
+            oldest = next(iter(self._sessions))
+            if oldest == keep:
+                break
+            self._drop(oldest)
+
+    def _touch(self, session_id: str, create: bool) -> Optional[ConversationSession]:
+        now = time.monotonic()
+        self._evict_idle(now)
+        session = self._sessions.get(session_id)
+        if session is None:
+            if not create:
+                return None
+            session = ConversationSession(session_id, self.max_turns)
+            self._sessions[session_id] = session
+        else:
+            self._sessions.move_to_end(session_id)
+        session.last_seen = now
+        return session
+
+    def get_context(self, session_id: str) -> Tuple[str, List[Turn]]:
+        """Return (summary, recent turns) trimmed to the prompt token budget"""
+        with self._lock:
+            session = self._touch(session_id, create=False)
+            if session is None:
+                return "", []
+            summary = session.summary
+            # Evicted turns not in the summary yet come first: they are the oldest
+            turns = session.pending + list(session.turns)
+
+        budget = self.max_prompt_tokens - estimate_tokens(summary)
+        selected: List[Turn] = []
+        # Keep the newest turns that fit; older ones are represented by the summary
+        for turn in reversed(turns):
+            cost = estimate_tokens(turn[0]) + estimate_tokens(turn[1])
+            if cost > budget:
+                break
+            budget -= cost
+            selected.append(turn)
+        selected.reverse()
+        return summary, selected
+
+    def append(self, session_id: str, user_message: str, reply: str):
+        """Record a completed turn, scheduling a summary refresh if turns were evicted"""
+        turn = (user_message, reply)
+        with self._lock:
+            session = self._touch(session_id, create=True)
+            if len(session.turns) == session.turns.maxlen:
+                evicted = session.turns[0]
+                session.pending.append(evicted)
+            session.turns.append(turn)
+            added = _turn_chars(turn)
+            # While the summarizer keeps failing, the oldest unfolded turns are let go
+            while len(session.pending) > self.max_turns + self.summary_batch:
+                added -= _turn_chars(session.pending.pop(0))
+            session.chars += added
+            self._total_chars += added
+            self._enforce_limits(keep=session_id)
+
+            if session.summarizing or len(session.pending) < self.summary_batch:
+                return
+            session.summarizing = True
+            previous_summary = session.summary
+            # A snapshot: the turns stay pending (and in the prompt) until the fold lands
+            to_fold = list(session.pending)
+
+        if self.executor is not None:
+            self.executor.submit(self._fold, session, previous_summary, to_fold)
+        else:
+            self._fold(session, previous_summary, to_fold)
+
+    def _fold(self, session: ConversationSession, previous_summary: str, turns: List[Turn]):
+        try:
+            summary = self.summarizer(previous_summary, turns)
+        except Exception as e:
+            # The turns are still pending, so the next eviction retries them
+            logger.warning("Summary refresh failed: %s", e)
+            with self._lock:
+                session.summarizing = False
+            return
+        summary = summary[: self.summary_tokens * CHARS_PER_TOKEN]
+
+        with self._lock:
+            # Only the turns this summary covers; some may have been let go meanwhile
+            folded = [turn for turn in turns if turn in session.pending]
+            for turn in folded:
+                session.pending.remove(turn)
+            delta = len(summary) - len(previous_summary) - sum(_turn_chars(turn) for turn in folded)
+            session.summary = summary
+            session.summarizing = False
+            session.chars += delta
+            # The session may have been evicted meanwhile; only live sessions count
+            if self._sessions.get(session.session_id) is session:
+                self._total_chars += delta
@@ -0,0 +1,154 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Mapping, Optional, Tuple, Union
+
+import numpy as np
+
+from src.logging.logger import get_logger
+from src.utils.common import MOOD_INDEX, MOODS
+
+logger = get_logger(__name__)
+
+Payload = Union[bytes, str]
+# A modality classifier returns mood probabilities, as a mapping or a vector in MOODS order
+Classifier = Callable[[Payload], Awaitable[Union[Mapping[str, float], np.ndarray]]]
+
+
+def to_probability_vector(result: Union[Mapping[str, float], np.ndarray]) -> np.ndarray:
+    """Normalise a classifier result into a probability vector in MOODS order"""
+    if isinstance(result, Mapping):
+        vector = np.zeros(len(MOODS), dtype=np.float64)
+        for mood, probability in result.items():
+            if mood in MOOD_INDEX:
+                vector[MOOD_INDEX[mood]] = probability
+    else:
+        vector = np.asarray(result, dtype=np.float64).reshape(len(MOODS))
+    vector = np.clip(vector, 0.0, None)
+    total = vector.sum()
+    if total <= 0:
+        raise ValueError("Classifier returned an empty probability vector")
+    return vector / total
+
+
+def mood_distribution(mood: str, confidence: float) -> Dict[str, float]:
+    """Spread a single-label answer into a distribution: `confidence` on the mood, the rest uniform"""
+    confidence = min(max(confidence, 0.0), 1.0)
+    rest = (1.0 - confidence) / (len(MOODS) - 1)
+    return {candidate: (confidence if candidate == mood else rest) for candidate in MOODS}
+
+
+class ResultCache:
+    """Small LRU + TTL cache of probability vectors keyed by (modality, content hash)"""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, np.ndarray]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, str]) -> Optional[np.ndarray]:
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Tuple[str, str], vector: np.ndarray):
+        self._entries[key] = (time.monotonic(), vector)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class _Modality:
+    __slots__ = ("classifier", "weight", "deadline")
+
+    def __init__(self, classifier: Classifier, weight: float, deadline: float):
+        self.classifier = classifier
+        self.weight = weight
+        self.deadline = deadline
+
+
+class EmotionFusionEngine:
+    """
+    Late fusion of per-modality mood classifiers.
+
+    Every modality present in a request runs concurrently under its own deadline;
+    results that miss it (or fail) are simply left out. The surviving probability
+    vectors are stacked and combined in one weighted sum, each modality's weight
+    scaled by how peaked its distribution is. Results are cached per modality by
+    content hash, so repeated uploads skip the classifier entirely.
+    """
+
+    def __init__(self, cache: Optional[ResultCache] = None):
+        self.cache = cache or ResultCache()
+        self._modalities: Dict[str, _Modality] = {}
+
+    def register(self, modality: str, classifier: Classifier, weight: float = 1.0, deadline: float = 2.0):
+        self._modalities[modality] = _Modality(classifier, weight, deadline)
+
+    @staticmethod
+    def content_hash(payload: Payload) -> str:
+        data = payload.encode("utf-8") if isinstance(payload, str) else payload
+        return hashlib.sha256(data).hexdigest()
+
+    async def _run(self, modality: str, payload: Payload) -> Tuple[str, Optional[np.ndarray], str]:
+        spec = self._modalities[modality]
+        key = (modality, self.content_hash(payload))
+        cached = self.cache.get(key)
+        if cached is not None:
+            return modality, cached, "cached"
+        try:
+            result = await asyncio.wait_for(spec.classifier(payload), timeout=spec.deadline)
+            vector = to_probability_vector(result)
+        except asyncio.TimeoutError:
+            logger.warning("%s classifier missed its %.2fs deadline", modality, spec.deadline)
+            return modality, None, "timeout"
+        except Exception as e:
+            logger.warning("%s classifier failed: %s", modality, e)
+            return modality, None, "error"
+        self.cache.put(key, vector)
+        return modality, vector, "ok"
+
+    @staticmethod
+    def fuse(vectors: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """Weighted late fusion of an (M, K) stack of probability vectors"""
+        # A flat distribution carries little evidence: scale weights by peakedness
+        peakedness = vectors.max(axis=1) - 1.0 / vectors.shape[1]
+        effective = weights * np.maximum(peakedness, 1e-3)
+        return effective @ vectors / effective.sum()
+
+    async def predict(self, inputs: Mapping[str, Optional[Payload]]) -> dict:
+        """Fuse every available modality in `inputs` into one supported mood"""
+        jobs = [
+            self._run(modality, payload)
+            for modality, payload in inputs.items()
+            if payload and modality in self._modalities
+        ]
+        results = await asyncio.gather(*jobs)
+
+        report, vectors, weights = {}, [], []
+        for modality, vector, status in results:
+            report[modality] = {"status": status}
+            if vector is None:
+                continue
+            report[modality]["mood"] = MOODS[int(np.argmax(vector))]
+            vectors.append(vector)
+            weights.append(self._modalities[modality].weight)
+
+        if not vectors:
+            return {"mood": "neutral", "confidence": 0.0, "probabilities": {}, "modalities": report}
+
+        fused = self.fuse(np.stack(vectors), np.asarray(weights, dtype=np.float64))
+        index = int(np.argmax(fused))
+        return {
+            "mood": MOODS[index],
+            "confidence": round(float(fused[index]), 3),
+            "probabilities": {mood: round(float(p), 3) for mood, p in zip(MOODS, fused)},
+            "modalities": report,
+        }
@@ -0,0 +1,278 @@
+import asyncio
+import os
+import threading
+import time
+from typing import BinaryIO, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from PIL import Image
+
+from src.logging.logger import get_logger
+from src.utils.common import MOODS
+
+logger = get_logger(__name__)
+
+try:
+    import cv2
+except ImportError:  # Face detection falls back to a centre crop
+    cv2 = None
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+# FER+ output order
+FER_EMOTIONS = ("neutral", "happiness", "surprise", "sadness", "anger", "disgust", "fear", "contempt")
+
+# How much each FER+ emotion contributes to each mood (rows: FER_EMOTIONS, columns: MOODS)
+FER_TO_MOOD = np.array([
+    # positive negative neutral energetic relaxed
+    [0.0, 0.0, 0.7, 0.0, 0.3],  # neutral
+    [0.8, 0.0, 0.0, 0.2, 0.0],  # happiness
+    [0.3, 0.0, 0.0, 0.7, 0.0],  # surprise
+    [0.0, 1.0, 0.0, 0.0, 0.0],  # sadness
+    [0.0, 0.7, 0.0, 0.3, 0.0],  # anger
+    [0.0, 1.0, 0.0, 0.0, 0.0],  # disgust
+    [0.0, 0.8, 0.0, 0.2, 0.0],  # fear
+    [0.0, 0.8, 0.2, 0.0, 0.0],  # contempt
+], dtype=np.float32)
+
+FACE_SIZE = 64
+
+
+class ModelUnavailableError(RuntimeError):
+    pass
+
+
+def decode_image(fileobj: BinaryIO, max_side: int = 480) -> np.ndarray:
+    """
+    Decode an upload straight from its file object to a downscaled grayscale array.
+
+    For JPEGs draft() lets the decoder skip straight to a reduced scale, so the
+    full-resolution bitmap is never materialised; everything else is resized once.
+    """
+    with Image.open(fileobj) as image:
+        image.draft("L", (max_side, max_side))
+        image = image.convert("L")
+        image.thumbnail((max_side, max_side))
+        return np.asarray(image)
+
+
+class FaceCropper:
+    """Find faces in a grayscale image and return normalised FACE_SIZE x FACE_SIZE crops"""
+
+    def __init__(self, max_faces: int = 4):
+        self.max_faces = max_faces
+        self.detector = None
+        if cv2 is not None:
+            self.detector = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+
+    def crops(self, gray: np.ndarray) -> List[np.ndarray]:
+        boxes = []
+        if self.detector is not None:
+            found = self.detector.detectMultiScale(gray, scaleFactor=1.2, minNeighbors=5, minSize=(32, 32))
+            # Largest faces first
+            boxes = sorted((tuple(box) for box in found), key=lambda box: box[2] * box[3], reverse=True)
+        if not boxes:
+            side = min(gray.shape)
+            top, left = (gray.shape[0] - side) // 2, (gray.shape[1] - side) // 2
+            boxes = [(left, top, side, side)]
+        return [self._resize(gray[y:y + h, x:x + w]) for x, y, w, h in boxes[: self.max_faces]]
+
+    @staticmethod
+    def _resize(face: np.ndarray) -> np.ndarray:
+        if cv2 is not None:
+            resized = cv2.resize(face, (FACE_SIZE, FACE_SIZE), interpolation=cv2.INTER_AREA)
+        else:
+            resized = np.asarray(Image.fromarray(face).resize((FACE_SIZE, FACE_SIZE), Image.BILINEAR))
+        return resized.astype(np.float32)
+
+
+class FacialEmotionModel:
+    """
+    FER+ style ONNX classifier: (N, 1, 64, 64) grayscale faces -> mood probabilities.
+
+    The serialized model is read once and kept as a byte array (shareable via
+    shared_arrays()); the onnxruntime session is created lazily in the process
+    that runs inference, since a session's thread pool does not survive fork().
+    """
+
+    def __init__(
+        self,
+        model_path: Optional[str] = None,
+        threads: Optional[int] = None,
+        arrays: Optional[Dict[str, np.ndarray]] = None,
+    ):
+        if ort is None:
+            raise ModelUnavailableError("onnxruntime is not installed")
+        if arrays is not None:
+            self.model_bytes = arrays["model"]
+        else:
+            model_path = model_path or os.getenv("IMAGE_MODEL_PATH")
+            if not model_path or not os.path.exists(model_path):
+                raise ModelUnavailableError("Facial emotion model is not configured (set IMAGE_MODEL_PATH)")
+            self.model_bytes = np.fromfile(model_path, dtype=np.uint8)
+            logger.info("Loaded facial emotion model from %s", model_path)
+        # One intra-op thread per process when a process pool provides the parallelism
+        default_threads = 1 if os.getenv("MODEL_SERVING", "local").lower() == "shared" else os.cpu_count() or 1
+        self.threads = threads or int(os.getenv("IMAGE_MODEL_THREADS", 0)) or default_threads
+        self._session = None
+
+    def shared_arrays(self) -> Dict[str, np.ndarray]:
+        return {"model": self.model_bytes}
+
+    def _load_session(self):
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.threads
+        self._session = ort.InferenceSession(
+            self.model_bytes.tobytes(), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        model_input = self._session.get_inputs()[0]
+        self.input_name = model_input.name
+        # Some exported models have a fixed batch dimension of 1
+        self.fixed_batch = model_input.shape[0] == 1
+
+    def predict(self, faces: np.ndarray) -> np.ndarray:
+        if self._session is None:
+            self._load_session()
+        batch = faces.reshape(-1, 1, FACE_SIZE, FACE_SIZE)
+        if self.fixed_batch:
+            logits = np.concatenate([self._session.run(None, {self.input_name: face[None]})[0] for face in batch])
+        else:
+            logits = self._session.run(None, {self.input_name: batch})[0]
+        logits = logits - logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        return probabilities @ FER_TO_MOOD
+
+
+def load_image_model(arrays: Optional[Dict[str, np.ndarray]] = None) -> FacialEmotionModel:
+    """Model factory for src.models.serving: loads the model from disk, or wraps a shared copy"""
+    return FacialEmotionModel(arrays=arrays)
+
+
+class ThroughputStats:
+    """Images per CPU-second, measured with thread (decode) and process (inference) CPU time"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.images = 0
+        self.faces = 0
+        self.cpu_seconds = 0.0
+        self.started = time.monotonic()
+
+    def record(self, cpu_seconds: float, images: int = 0, faces: int = 0):
+        with self._lock:
+            self.cpu_seconds += cpu_seconds
+            self.images += images
+            self.faces += faces
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            elapsed = time.monotonic() - self.started
+            return {
+                "images": self.images,
+                "faces": self.faces,
+                "cpu_seconds": round(self.cpu_seconds, 3),
+                "images_per_core_second": round(self.images / self.cpu_seconds, 2) if self.cpu_seconds else 0.0,
+                "images_per_second": round(self.images / elapsed, 2) if elapsed else 0.0,
+            }
+
+
+class MicroBatcher:
+    """
+    Batches face crops from concurrent requests into one model call.
+
+    The first queued crop opens a batch; it is flushed when max_batch crops are
+    waiting or max_wait has passed, and inference runs through the model runner
+    (a worker thread, or a pool process) so the event loop keeps accepting uploads.
+    Up to runner.processes batches run at once; while they do, the next batch
+    keeps filling from the queue.
+    """
+
+    def __init__(self, runner, stats: ThroughputStats, max_batch: int = 32, max_wait: float = 0.01):
+        self.runner = runner
+        self.stats = stats
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._inflight: Set[asyncio.Task] = set()
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+        for task in list(self._inflight):
+            task.cancel()
+        self.runner.shutdown()
+
+    async def submit(self, faces: List[np.ndarray]) -> np.ndarray:
+        """Queue one request's crops and wait for their mood probabilities"""
+        loop = asyncio.get_running_loop()
+        futures = []
+        for face in faces:
+            future = loop.create_future()
+            await self._queue.put((face, future))
+            futures.append(future)
+        return np.stack(await asyncio.gather(*futures))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.runner.processes)
+        while True:
+            # Wait for a free runner slot first: while every slot is busy the
+            # queue keeps growing, so the next batch goes out full
+            await slots.acquire()
+            try:
+                batch = [await self._queue.get()]
+            except BaseException:
+                slots.release()
+                raise
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            task = loop.create_task(self._infer(batch))
+            task.add_done_callback(lambda done: (slots.release(), self._inflight.discard(done)))
+            self._inflight.add(task)
+
+    async def _infer(self, batch: List[Tuple[np.ndarray, asyncio.Future]]):
+        faces = np.stack([face for face, _ in batch])
+        try:
+            probabilities, cpu_seconds = await self.runner.infer("predict", faces)
+            self.stats.record(cpu_seconds, faces=len(faces))
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), row in zip(batch, probabilities):
+            if not future.done():
+                future.set_result(row)
+
+
+def preprocess_upload(fileobj: BinaryIO, cropper: FaceCropper, stats: ThroughputStats) -> List[np.ndarray]:
+    """Decode, downscale and crop faces from one upload (runs in a worker thread)"""
+    started = time.thread_time()
+    try:
+        return cropper.crops(decode_image(fileobj))
+    finally:
+        stats.record(time.thread_time() - started, images=1)
+
+
+def summarize_faces(probabilities: np.ndarray) -> Tuple[str, float, dict]:
+    """Average per-face mood probabilities into (mood, confidence, probabilities)"""
+    mean = probabilities.mean(axis=0)
+    index = int(np.argmax(mean))
+    return MOODS[index], round(float(mean[index]), 3), {mood: round(float(p), 3) for mood, p in zip(MOODS, mean)}
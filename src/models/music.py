@@ -0,0 +1,383 @@
+import json
+import os
+import random
+import shutil
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Union
+
+import numpy as np
+
+from src.logging.logger import get_logger
+from src.utils.common import MOOD_INDEX, MOODS
+from src.utils.kdtree import KDTree
+
+logger = get_logger(__name__)
+
+# Audio features kept per track, in column order of features.npy
+FEATURES = ("valence", "energy", "tempo", "danceability")
+# Text columns, each stored as one UTF-8 blob plus row offsets
+TEXT_COLUMNS = ("id", "name", "artists", "preview_url", "external_url", "genres")
+# Joins the names inside list columns ("artists", "genres")
+ARTIST_SEPARATOR = "\x1f"
+
+# Where each mood sits in feature space (valence, energy, tempo in BPM, danceability).
+# Valence/energy follow the targets the recommender sends to Spotify.
+MOOD_TARGETS = {
+    "positive": (0.8, 0.65, 120.0, 0.7),
+    "negative": (0.3, 0.35, 90.0, 0.4),
+    "neutral": (0.5, 0.5, 110.0, 0.5),
+    "energetic": (0.6, 0.8, 128.0, 0.7),
+    "relaxed": (0.45, 0.3, 85.0, 0.35),
+}
+# Divides each feature before distances are taken, so tempo doesn't outweigh the 0-1 features
+FEATURE_SCALE = np.array([1.0, 1.0, 200.0, 1.0])
+
+CURRENT_FILE = "CURRENT"
+KEEP_VERSIONS = 2
+
+
+def _text_column(values: List[str]):
+    """(uint8 blob, int64 offsets with one entry per row plus the end)"""
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def build_catalog(root: str, tracks: Iterable[dict]) -> str:
+    """
+    Write a new catalog version under `root` and make it current.
+
+    `tracks` are dicts with the TrackResponse fields, a "mood" and the FEATURES
+    (missing features are stored as NaN). Rows are grouped by mood so every
+    mood is one contiguous slice. The version is written to its own directory
+    and switched to by replacing the CURRENT file, so readers never see a
+    half-written catalog; open readers keep their old files until they reopen.
+    """
+    rows = {}
+    for track in tracks:
+        mood = track.get("mood")
+        if mood in MOOD_INDEX and track.get("id"):
+            rows.setdefault((MOOD_INDEX[mood], track["id"]), track)
+    ordered = [rows[key] for key in sorted(rows, key=lambda key: key[0])]
+
+    now = time.time()
+    # Sorts chronologically, which _prune relies on
+    version = time.strftime("v%Y%m%d-%H%M%S", time.gmtime(now)) + f".{int(now % 1 * 1e6):06d}-{os.getpid()}"
+    staging = os.path.join(root, version + ".tmp")
+    os.makedirs(staging, exist_ok=True)
+
+    moods = np.array([MOOD_INDEX[track["mood"]] for track in ordered], dtype=np.uint8)
+    mood_offsets = np.searchsorted(moods, np.arange(len(MOODS) + 1)).astype(np.int64)
+    features = np.array(
+        [[_feature(track, name) for name in FEATURES] for track in ordered], dtype=np.float32
+    ).reshape(len(ordered), len(FEATURES))
+    np.save(os.path.join(staging, "mood_offsets.npy"), mood_offsets)
+    np.save(os.path.join(staging, "features.npy"), features)
+    for column in TEXT_COLUMNS:
+        values = [_text(track, column) for track in ordered]
+        blob, offsets = _text_column(values)
+        np.save(os.path.join(staging, f"{column}.bin.npy"), blob)
+        np.save(os.path.join(staging, f"{column}.offsets.npy"), offsets)
+    with open(os.path.join(staging, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump({"version": version, "tracks": len(ordered), "moods": list(MOODS),
+                   "features": list(FEATURES), "built_at": time.time()}, f)
+
+    os.replace(staging, os.path.join(root, version))
+    current_tmp = os.path.join(root, CURRENT_FILE + ".tmp")
+    with open(current_tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(current_tmp, os.path.join(root, CURRENT_FILE))
+    _prune(root, version)
+    logger.info("Track catalog %s written: %s tracks", version, len(ordered))
+    return version
+
+
+def _feature(track: dict, name: str) -> float:
+    value = track.get(name)
+    return float(value) if value is not None else np.nan
+
+
+def _text(track: dict, column: str) -> str:
+    value = track.get(column)
+    if isinstance(value, (list, tuple)):
+        return ARTIST_SEPARATOR.join(value)
+    return value or ""
+
+
+def current_version(root: str) -> Optional[str]:
+    """The version named in root/CURRENT, or None if no catalog was built yet"""
+    try:
+        with open(os.path.join(root, CURRENT_FILE), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _prune(root: str, current: str):
+    """Delete all but the newest KEEP_VERSIONS versions (mapped files stay readable until unmapped)"""
+    versions = sorted(name for name in os.listdir(root) if name.startswith("v") and not name.endswith(".tmp"))
+    for name in versions[:-KEEP_VERSIONS]:
+        if name != current:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+class TrackCatalog:
+    """
+    One catalog version, read through memory maps.
+
+    Nothing is copied at open: the arrays are views on the page cache, shared
+    by every worker that maps the same files, and only the rows a request
+    touches are ever paged in.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "manifest.json"), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.version = self.manifest["version"]
+        self.mood_offsets = np.load(os.path.join(path, "mood_offsets.npy"))
+        self.features = np.load(os.path.join(path, "features.npy"), mmap_mode="r")
+        # Versions written before a column existed simply lack its files; it reads as empty
+        self._text = {
+            column: (np.load(os.path.join(path, f"{column}.bin.npy"), mmap_mode="r"),
+                     np.load(os.path.join(path, f"{column}.offsets.npy"), mmap_mode="r"))
+            for column in TEXT_COLUMNS
+            if os.path.exists(os.path.join(path, f"{column}.offsets.npy"))
+        }
+        self.index: Optional[TrackIndex] = None
+
+    def __len__(self) -> int:
+        return int(self.mood_offsets[-1])
+
+    def mood_range(self, mood: str) -> range:
+        index = MOOD_INDEX[mood]
+        return range(int(self.mood_offsets[index]), int(self.mood_offsets[index + 1]))
+
+    def text(self, column: str, row: int) -> str:
+        if column not in self._text:
+            return ""
+        blob, offsets = self._text[column]
+        return bytes(blob[offsets[row]:offsets[row + 1]]).decode("utf-8")
+
+    def track(self, row: int) -> dict:
+        """One row in the TrackResponse shape"""
+        artists = self.text("artists", row)
+        genres = self.text("genres", row)
+        return {
+            "id": self.text("id", row),
+            "name": self.text("name", row),
+            "artists": artists.split(ARTIST_SEPARATOR) if artists else [],
+            "preview_url": self.text("preview_url", row) or None,
+            "external_url": self.text("external_url", row),
+            "genres": genres.split(ARTIST_SEPARATOR) if genres else [],
+        }
+
+    def sample(self, mood: str, count: int = 15, rng: Optional[random.Random] = None) -> List[dict]:
+        rows = self.mood_range(mood)
+        chosen = (rng or random).sample(rows, min(count, len(rows)))
+        return [self.track(row) for row in chosen]
+
+
+def mood_target(mood: Union[str, Mapping[str, float]]) -> np.ndarray:
+    """
+    Feature-space target for a mood, or for a blended mood given as
+    probabilities (e.g. the fusion engine's "probabilities"), which is the
+    probability-weighted mean of the mood targets.
+    """
+    if isinstance(mood, str):
+        return np.array(MOOD_TARGETS[mood])
+    weights = np.array([max(float(mood.get(name, 0.0)), 0.0) for name in MOODS])
+    if weights.sum() <= 0:
+        return np.array(MOOD_TARGETS["neutral"])
+    return weights @ np.array([MOOD_TARGETS[name] for name in MOODS]) / weights.sum()
+
+
+class TrackIndex:
+    """
+    k-nearest-neighbour search over a catalog's audio features.
+
+    Tracks without features are left out. The tree holds scaled copies of
+    the features (N x 4 float64, about 32 bytes per track), so only the
+    catalog's text columns stay memory-mapped.
+    """
+
+    def __init__(self, catalog: "TrackCatalog"):
+        self.catalog = catalog
+        features = np.asarray(catalog.features, dtype=np.float64)
+        self.rows = np.flatnonzero(np.isfinite(features).all(axis=1)) if len(features) else np.empty(0, dtype=np.int64)
+        self.tree = KDTree(features[self.rows] / FEATURE_SCALE if len(self.rows) else np.empty((0, len(FEATURES))))
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def nearest(self, target, k: int = 15) -> List[dict]:
+        """The k tracks closest to `target` (raw feature values), closest first, with their distance"""
+        distances, positions = self.tree.query(np.asarray(target, dtype=np.float64) / FEATURE_SCALE, k)
+        tracks = []
+        for distance, position in zip(distances, positions):
+            row = int(self.rows[position])
+            track = self.catalog.track(row)
+            track["distance"] = round(float(distance), 4)
+            track["features"] = dict(zip(FEATURES, (round(float(v), 3) for v in self.catalog.features[row])))
+            tracks.append(track)
+        return tracks
+
+    def recommend(self, target, count: int = 15, pool: int = 50, rng: Optional[random.Random] = None) -> List[dict]:
+        """`count` tracks drawn from the `pool` nearest, so repeated requests don't all get the same list"""
+        candidates = self.nearest(target, max(count, pool))
+        chosen = (rng or random).sample(candidates, min(count, len(candidates)))
+        for track in chosen:
+            del track["distance"], track["features"]
+        return chosen
+
+
+class CatalogStore:
+    """
+    The catalog currently served, with its nearest-neighbour index. Checks for
+    a newer version at most every `check_interval` seconds, so workers pick up
+    a refresh without a restart; a new version is opened and indexed on a
+    background thread while requests keep using the old one.
+    """
+
+    def __init__(self, root: str, check_interval: float = 30.0):
+        self.root = root
+        self.check_interval = check_interval
+        self.catalog: Optional[TrackCatalog] = None
+        self._next_check = 0.0
+        self._loading = threading.Lock()
+        self.reload()
+
+    @classmethod
+    def from_env(cls) -> "CatalogStore":
+        return cls(os.getenv("MUSIC_CATALOG_DIR", os.path.join("data", "catalog")),
+                   float(os.getenv("MUSIC_CATALOG_CHECK_S", 30)))
+
+    def reload(self) -> Optional[TrackCatalog]:
+        with self._loading:
+            version = current_version(self.root)
+            if version is not None and (self.catalog is None or self.catalog.version != version):
+                started = time.monotonic()
+                try:
+                    catalog = TrackCatalog(os.path.join(self.root, version))
+                    catalog.index = TrackIndex(catalog)
+                except (OSError, ValueError) as e:
+                    logger.warning("Could not open track catalog %s: %s", version, e)
+                    return self.catalog
+                self.catalog = catalog
+                logger.info("Track catalog %s opened: %s tracks, %s indexed in %.2fs",
+                            version, len(catalog), len(catalog.index), time.monotonic() - started)
+            return self.catalog
+
+    def get(self) -> Optional[TrackCatalog]:
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            catalog = self.catalog
+            if catalog is None or current_version(self.root) not in (None, catalog.version):
+                if not self._loading.locked():
+                    threading.Thread(target=self.reload, name="catalog-reload", daemon=True).start()
+        return self.catalog
+
+
+def collect_catalog_tracks(
+    find_tracks: Callable[[str], List[dict]],
+    audio_features: Callable[[List[str]], List[Optional[dict]]],
+    moods: Iterable[str] = MOODS,
+) -> List[dict]:
+    """
+    Gather catalog rows for every mood from Spotify-shaped track objects.
+
+    `find_tracks(mood)` returns Spotify track objects (optionally with a
+    "genres" list, e.g. their artist's genres), `audio_features(ids)`
+    the audio features of up to 100 ids (None where Spotify has none).
+    """
+    rows = []
+    for mood in moods:
+        try:
+            tracks = [track for track in find_tracks(mood) if track and track.get("id")]
+        except Exception as e:
+            logger.warning("Catalog refresh: no tracks for %s: %s", mood, e)
+            continue
+        features: Dict[str, dict] = {}
+        ids = [track["id"] for track in tracks]
+        for start in range(0, len(ids), 100):
+            try:
+                for item in audio_features(ids[start:start + 100]) or []:
+                    if item:
+                        features[item["id"]] = item
+            except Exception as e:
+                # Tracks are still worth keeping without features
+                logger.warning("Catalog refresh: no audio features for %s: %s", mood, e)
+                break
+        for track in tracks:
+            try:
+                row = {
+                    "id": track["id"],
+                    "name": track["name"],
+                    "artists": [artist["name"] for artist in track["artists"]],
+                    "preview_url": track.get("preview_url"),
+                    "external_url": track["external_urls"]["spotify"],
+                    "genres": track.get("genres") or [],
+                    "mood": mood,
+                }
+            except (KeyError, TypeError):
+                continue
+            row.update({name: features.get(track["id"], {}).get(name) for name in FEATURES})
+            rows.append(row)
+    return rows
+
+class CatalogRefresher:
+    """
+    Rebuilds the catalog from a background thread every `interval` seconds;
+    at startup only if the current one is missing or older than that.
+    """
+
+    def __init__(self, store: CatalogStore, collect: Callable[[], List[dict]], interval: float = 6 * 3600):
+        self.store = store
+        self.collect = collect
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._loop, name="catalog-refresh", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        catalog = self.store.reload()
+        age = time.time() - catalog.manifest["built_at"] if catalog is not None else self.interval
+        delay = max(0.0, self.interval - age)
+        while not self._stop.wait(delay):
+            self.refresh()
+            delay = self.interval
+
+    def refresh(self) -> Optional[str]:
+        started = time.monotonic()
+        try:
+            rows = self.collect()
+        except Exception as e:
+            logger.warning("Catalog refresh failed: %s", e)
+            return None
+        if not rows:
+            # Keep the previous catalog rather than replacing it with nothing
+            logger.warning("Catalog refresh found no tracks, keeping the current catalog")
+            return None
+        version = build_catalog(self.store.root, rows)
+        self.store.reload()
+        logger.info("Catalog refresh took %.1fs", time.monotonic() - started)
+        return version
+
+# Usage in the recommender:
+# from src.models.music import CatalogStore, build_catalog, collect_catalog_tracks
+#
+# catalogs = CatalogStore.from_env()
+# CatalogRefresher(catalogs, lambda: collect_catalog_tracks(find_tracks, sp.audio_features)).start()
+# catalog = catalogs.get()
+# tracks = catalog.sample("relaxed") if catalog else []
+# nearest = catalog.index.nearest(mood_target({"relaxed": 0.6, "negative": 0.4}), k=10)
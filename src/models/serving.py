@@ -0,0 +1,200 @@
+import asyncio
+import gc
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.logging.logger import get_logger
+
+logger = get_logger(__name__)
+
+# A model factory: factory(None) loads weights from disk, factory(arrays) wraps already-shared arrays.
+# In "shm" mode it is pickled to the worker processes, so it must be a module-level function.
+ModelFactory = Callable[[Optional[Dict[str, np.ndarray]]], Any]
+
+# Spec for one shared array: (shared memory block name, shape, dtype string)
+ArraySpec = Tuple[str, Tuple[int, ...], str]
+
+# The model served by this process; inherited through fork or attached by _init_shm_worker
+_MODEL = None
+_SHM_HANDLES: List[shared_memory.SharedMemory] = []
+
+
+def share_arrays(
+    arrays: Dict[str, np.ndarray]
+) -> Tuple[Dict[str, ArraySpec], Dict[str, np.ndarray], List[shared_memory.SharedMemory]]:
+    """
+    Copy arrays into named shared memory blocks once.
+
+    Returns the specs other processes attach with, read-only views on the blocks
+    for this process, and the block handles (this process owns and unlinks them).
+    """
+    specs, views, handles = {}, {}, []
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+        view[...] = array
+        view.flags.writeable = False
+        specs[name] = (block.name, array.shape, array.dtype.str)
+        views[name] = view
+        handles.append(block)
+    return specs, views, handles
+
+
+def attach_arrays(specs: Dict[str, ArraySpec]) -> Tuple[Dict[str, np.ndarray], List[shared_memory.SharedMemory]]:
+    """Map shared arrays into this process without copying; keep the handles alive as long as the arrays"""
+    arrays, handles = {}, []
+    for name, (block_name, shape, dtype) in specs.items():
+        # Pool workers share the creator's resource tracker, so attaching doesn't add a second owner
+        block = shared_memory.SharedMemory(name=block_name)
+        array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        array.flags.writeable = False
+        arrays[name] = array
+        handles.append(block)
+    return arrays, handles
+
+
+def _init_shm_worker(factory: ModelFactory, specs: Dict[str, ArraySpec]):
+    global _MODEL, _SHM_HANDLES
+    arrays, _SHM_HANDLES = attach_arrays(specs)
+    _MODEL = factory(arrays)
+
+
+def _invoke(method: str, args: tuple) -> Tuple[Any, float]:
+    started = time.process_time()
+    result = getattr(_MODEL, method)(*args)
+    return result, time.process_time() - started
+
+
+def _ping(_=None) -> int:
+    return os.getpid()
+
+
+class LocalModelRunner:
+    """Runs model methods on worker threads of the current process"""
+
+    def __init__(self, model: Any, max_workers: int = 1):
+        self.model = model
+        # How many calls can run at once, as for SharedModelServer
+        self.processes = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="model")
+
+    def _invoke(self, method: str, args: tuple) -> Tuple[Any, float]:
+        started = time.thread_time()
+        result = getattr(self.model, method)(*args)
+        return result, time.thread_time() - started
+
+    async def infer(self, method: str, *args) -> Tuple[Any, float]:
+        """Call model.<method>(*args); returns (result, CPU seconds spent)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._invoke, method, args)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+class SharedModelServer:
+    """
+    Loads model weights once in the parent and serves inference from a process pool.
+
+    "fork" mode: the parent keeps the loaded model in a module global, freezes the
+    GC so collections in the children don't dirty the inherited object pages, and
+    forks the pool; every worker reads the parent's weights copy-on-write.
+    "shm" mode: the model's arrays (model.shared_arrays()) are copied once into
+    shared memory and every worker maps them read-only, which also works with the
+    spawn start method. Either way memory stays flat as processes are added.
+
+    Start it before the event loop spins up worker threads, i.e. at import time.
+    """
+
+    def __init__(self, factory: ModelFactory, processes: Optional[int] = None, mode: Optional[str] = None):
+        self.factory = factory
+        self.processes = processes or os.cpu_count() or 1
+        if mode is None:
+            mode = "fork" if "fork" in mp.get_all_start_methods() else "shm"
+        if mode not in ("fork", "shm"):
+            raise ValueError(f"Unknown model sharing mode: {mode}")
+        self.mode = mode
+        self.model = None
+        self._pool: Optional[Executor] = None
+        self._handles: List[shared_memory.SharedMemory] = []
+        self._specs: Dict[str, ArraySpec] = {}
+
+    def start(self) -> "SharedModelServer":
+        global _MODEL
+        model = self.factory(None)
+        if self.mode == "shm":
+            self._specs, views, self._handles = share_arrays(model.shared_arrays())
+            # Swap the parent's private copy for views on the shared blocks
+            model = self.factory(views)
+        else:
+            _MODEL = model
+            gc.collect()
+            gc.freeze()
+        self.model = model
+        self._pool = self._new_pool()
+
+        # Bring the workers up now rather than on the first request
+        list(self._pool.map(_ping, range(self.processes)))
+        logger.info("%s inference processes ready (%s mode)", self.processes, self.mode)
+        return self
+
+    def _new_pool(self) -> Executor:
+        if self.mode == "shm":
+            return ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=mp.get_context("spawn"),
+                initializer=_init_shm_worker,
+                initargs=(self.factory, self._specs),
+            )
+        return ProcessPoolExecutor(max_workers=self.processes, mp_context=mp.get_context("fork"))
+
+    async def infer(self, method: str, *args) -> Tuple[Any, float]:
+        """Call model.<method>(*args) in a pool process; returns (result, CPU seconds spent)"""
+        loop = asyncio.get_running_loop()
+        pool = self._pool
+        try:
+            return await loop.run_in_executor(pool, _invoke, method, args)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed) and took the pool with it. The weights are still
+            # loaded or shared, so replace the pool once; this request fails, later ones don't.
+            if self._pool is pool:
+                logger.error("Inference pool broken, starting %s new %s-mode processes", self.processes, self.mode)
+                pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = self._new_pool()
+            raise
+
+    def shutdown(self):
+        if self._pool is not None:
+            # Join the workers first: they map the blocks until they exit, and
+            # unlinking under a worker still starting up fails its initializer
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+        for handle in self._handles:
+            handle.close()
+            try:
+                handle.unlink()
+            except FileNotFoundError:
+                pass
+        self._handles = []
+
+
+def create_runner(factory: ModelFactory, local_workers: int = 1):
+    """
+    Build the model runner selected by MODEL_SERVING.
+
+    "shared" starts a SharedModelServer with MODEL_PROCESSES workers (default: one
+    per core) sharing weights via MODEL_SHARE_MODE ("fork" or "shm"); anything else
+    loads the model in-process.
+    """
+    if os.getenv("MODEL_SERVING", "local").lower() == "shared":
+        processes = int(os.getenv("MODEL_PROCESSES", 0)) or None
+        return SharedModelServer(factory, processes=processes, mode=os.getenv("MODEL_SHARE_MODE") or None).start()
+    return LocalModelRunner(factory(None), max_workers=local_workers)
@@ -0,0 +1,233 @@
+import os
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.logging.logger import get_logger
+from src.utils.common import MOOD_INDEX, MOODS
+
+logger = get_logger(__name__)
+
+# Comprehensive mood keywords dictionary
+MOOD_KEYWORDS = {
+    'positive': {
+        'happy', 'joy', 'excited', 'great', 'wonderful', 'love', 'amazing', 'good', 'fantastic',
+        'awesome', 'glad', 'delighted', 'pleased', 'grateful', 'blessed', 'thrilled', 'cheery',
+        'beautiful', 'brilliant', 'success', 'win', 'proud', 'perfect', 'smile', 'laugh'
+    },
+    'negative': {
+        'sad', 'angry', 'upset', 'terrible', 'bad', 'hate', 'awful', 'disappointed', 'frustrated',
+        'depressed', 'worried', 'anxious', 'stressed', 'hurt', 'pain', 'miserable', 'sick',
+        'tired', 'lost', 'fear', 'lonely', 'heartbroken', 'crying', 'mad', 'annoyed'
+    },
+    'energetic': {
+        'pumped', 'energized', 'hyped', 'active', 'dynamic', 'party', 'dance', 'workout', 'run',
+        'exercise', 'power', 'strong', 'fire', 'fast', 'rush', 'action', 'move', 'jump',
+        'bounce', 'racing', 'alive', 'motivated', 'lets go', 'ready', 'energy'
+    },
+    'relaxed': {
+        'calm', 'peaceful', 'chill', 'relax', 'quiet', 'gentle', 'soothing', 'mellow', 'tranquil',
+        'rest', 'zen', 'serene', 'harmony', 'slow', 'smooth', 'easy', 'meditation', 'mindful',
+        'cozy', 'comfortable', 'content', 'still', 'settled', 'soft', 'dreamy'
+    }
+}
+
+NEGATIONS = {"not", "never", "no", "nothing", "hardly", "dont", "didnt", "isnt", "wasnt", "cant", "wont"}
+
+_SENTENCE_RE = re.compile(r"[^.!?\n]+[.!?]*")
+_TOKEN_RE = re.compile(r"[a-z]+")
+_SUFFIXES = ("ing", "ed", "ly", "s")
+
+# Zero-hit chunks count as weak evidence for neutral
+NEUTRAL_WEIGHT = 0.25
+
+
+def _build_index() -> Tuple[Dict[str, str], Dict[Tuple[str, str], str]]:
+    words, phrases = {}, {}
+    for mood, keywords in MOOD_KEYWORDS.items():
+        for keyword in keywords:
+            parts = keyword.split()
+            if len(parts) == 1:
+                words[keyword] = mood
+            else:
+                phrases[(parts[0], parts[1])] = mood
+    return words, phrases
+
+
+# keyword -> mood, so each token is looked up once instead of scanning every keyword
+_WORD_INDEX, _PHRASE_INDEX = _build_index()
+
+
+def split_sentences(text: str, max_chunk_chars: int = 300) -> List[str]:
+    """Split text into sentence chunks, hard-wrapping run-on sentences"""
+    chunks = []
+    for match in _SENTENCE_RE.finditer(text):
+        sentence = match.group().strip()
+        while len(sentence) > max_chunk_chars:
+            cut = sentence.rfind(" ", 0, max_chunk_chars)
+            cut = cut if cut > 0 else max_chunk_chars
+            chunks.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if sentence:
+            chunks.append(sentence)
+    return chunks
+
+
+def _lookup(token: str) -> Optional[str]:
+    mood = _WORD_INDEX.get(token)
+    if mood is not None:
+        return mood
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            mood = _WORD_INDEX.get(token[: -len(suffix)])
+            if mood is not None:
+                return mood
+    return None
+
+
+def lexicon_scores(chunk: str) -> Tuple[Dict[str, float], int]:
+    """Score one chunk against the mood lexicon in a single pass; returns (hits per mood, token count)"""
+    tokens = _TOKEN_RE.findall(chunk.lower().replace("'", ""))
+    scores = dict.fromkeys(MOOD_KEYWORDS, 0.0)
+    previous = ""
+    for index, token in enumerate(tokens):
+        mood = _PHRASE_INDEX.get((previous, token)) or _lookup(token)
+        # "not happy" is not evidence for positive
+        negated = previous in NEGATIONS or (index >= 2 and tokens[index - 2] in NEGATIONS)
+        if mood is not None and not negated:
+            scores[mood] += 1.0
+        previous = token
+    return scores, len(tokens)
+
+
+def is_ambiguous(scores: Dict[str, float]) -> bool:
+    """Mixed signals: the two strongest moods are both present and within one hit"""
+    ranked = sorted(scores.values(), reverse=True)
+    return ranked[1] > 0 and ranked[0] - ranked[1] < 1.0
+
+
+class ChunkedSentiment:
+    """Per-chunk lexicon scoring plus length-weighted aggregation into one mood"""
+
+    def __init__(self, max_chunk_chars: int = 300, max_escalations: int = 8):
+        self.max_chunk_chars = max_chunk_chars
+        # Caps LLM work per request, which keeps cost sublinear in input length
+        self.max_escalations = max_escalations
+
+    def score(self, text: str) -> Tuple[List[str], List[Dict[str, float]], List[int], List[int]]:
+        """Return (chunks, lexicon scores, token counts, indices of chunks worth escalating)"""
+        chunks = split_sentences(text, self.max_chunk_chars)
+        scores, lengths, ambiguous = [], [], []
+        for index, chunk in enumerate(chunks):
+            chunk_scores, length = lexicon_scores(chunk)
+            scores.append(chunk_scores)
+            lengths.append(length)
+            if is_ambiguous(chunk_scores):
+                ambiguous.append(index)
+        # Escalate the longest ambiguous chunks first; they carry the most weight
+        ambiguous.sort(key=lambda index: lengths[index], reverse=True)
+        return chunks, scores, lengths, sorted(ambiguous[: self.max_escalations])
+
+    def aggregate(
+        self,
+        scores: Sequence[Dict[str, float]],
+        lengths: Sequence[int],
+        resolved: Optional[Dict[int, str]] = None,
+    ) -> Tuple[str, float]:
+        """Combine chunk evidence into (mood, confidence); `resolved` maps chunk index -> LLM mood"""
+        resolved = resolved or {}
+        totals = dict.fromkeys(MOODS, 0.0)
+        for index, (chunk_scores, length) in enumerate(zip(scores, lengths)):
+            weight = float(max(length, 1))
+            if index in resolved:
+                totals[resolved[index]] += weight
+                continue
+            hits = sum(chunk_scores.values())
+            if hits == 0:
+                totals["neutral"] += weight * NEUTRAL_WEIGHT
+                continue
+            for mood, value in chunk_scores.items():
+                totals[mood] += weight * value / hits
+
+        total = sum(totals.values())
+        if total == 0:
+            return "neutral", 0.0
+        mood = max(totals, key=totals.get)
+        return mood, round(totals[mood] / total, 3)
+
+
+class TextEmotionModel:
+    """
+    Bag-of-words softmax classifier: token counts @ W (V, len(MOODS)) + b.
+
+    Weights come from an .npz file (vocab, W, b) when TEXT_MODEL_PATH is set;
+    otherwise they are built from MOOD_KEYWORDS, with a small neutral prior so
+    text without any keyword reads as neutral. The arrays are exposed through
+    shared_arrays() for SharedModelServer.
+    """
+
+    def __init__(self, model_path: Optional[str] = None, arrays: Optional[Dict[str, np.ndarray]] = None):
+        model_path = model_path or os.getenv("TEXT_MODEL_PATH")
+        if arrays is not None:
+            self.vocab, self.W, self.b = arrays["vocab"], arrays["W"], arrays["b"]
+        elif model_path and os.path.exists(model_path):
+            with np.load(model_path) as weights:
+                self.vocab = weights["vocab"].astype(str)
+                self.W = weights["W"].astype(np.float32)
+                self.b = weights["b"].astype(np.float32)
+            logger.info("Loaded classifier weights from %s", model_path)
+        else:
+            self.vocab, self.W, self.b = self._keyword_weights()
+        # token (or "first second" phrase) -> row of W; rebuilt per process from the vocab array
+        self._index = {token: row for row, token in enumerate(self.vocab.tolist())}
+
+    @staticmethod
+    def _keyword_weights():
+        vocab = sorted(keyword for keywords in MOOD_KEYWORDS.values() for keyword in keywords)
+        W = np.zeros((len(vocab), len(MOODS)), dtype=np.float32)
+        for row, keyword in enumerate(vocab):
+            for mood, keywords in MOOD_KEYWORDS.items():
+                if keyword in keywords:
+                    W[row, MOOD_INDEX[mood]] = 2.0
+        b = np.zeros(len(MOODS), dtype=np.float32)
+        b[MOOD_INDEX["neutral"]] = 1.0
+        return np.array(vocab), W, b
+
+    def shared_arrays(self) -> Dict[str, np.ndarray]:
+        return {"vocab": self.vocab, "W": self.W, "b": self.b}
+
+    def _row(self, token: str) -> Optional[int]:
+        row = self._index.get(token)
+        if row is not None:
+            return row
+        for suffix in _SUFFIXES:
+            if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+                row = self._index.get(token[: -len(suffix)])
+                if row is not None:
+                    return row
+        return None
+
+    def predict_proba(self, text: str) -> np.ndarray:
+        """Mood probabilities in MOODS order"""
+        tokens = _TOKEN_RE.findall(text.lower().replace("'", ""))
+        rows = []
+        previous = ""
+        for index, token in enumerate(tokens):
+            row = self._index.get(f"{previous} {token}")
+            if row is None:
+                row = self._row(token)
+            negated = previous in NEGATIONS or (index >= 2 and tokens[index - 2] in NEGATIONS)
+            if row is not None and not negated:
+                rows.append(row)
+            previous = token
+        counts = np.bincount(np.asarray(rows, dtype=np.intp), minlength=len(self.vocab)).astype(np.float32)
+        logits = counts @ self.W + self.b
+        logits -= logits.max()
+        exp = np.exp(logits)
+        return exp / exp.sum()
+
+
+def load_text_model(arrays: Optional[Dict[str, np.ndarray]] = None) -> TextEmotionModel:
+    """Model factory for src.models.serving: loads weights from disk, or wraps shared arrays"""
+    return TextEmotionModel(arrays=arrays)
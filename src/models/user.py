@@ -0,0 +1,181 @@
+import hashlib
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from src.logging.logger import get_logger
+from src.utils.common import MOOD_INDEX, MOODS
+
+logger = get_logger(__name__)
+
+# Feedback a user can give on a track, and how much each moves their affinities
+SIGNALS = ("like", "play", "skip")
+SIGNAL_WEIGHTS = {"like": 1.0, "play": 0.25, "skip": -0.5}
+SIGNAL_INDEX = {signal: index for index, signal in enumerate(SIGNALS)}
+
+# How strongly a genre match counts relative to an artist match when scoring
+GENRE_WEIGHT = 0.5
+
+
+class AffinityModel:
+    """
+    Per-user artist and genre affinities, kept as running sums.
+
+    Every user owns one row of a float32 matrix: artist and genre names are
+    hashed into a fixed number of buckets (the hashing trick), so a row is the
+    same size however long the user's history is. A feedback event adds its
+    signal weight to a few buckets and bumps a per-mood signal counter, so
+    updates are O(1) and scoring a track costs one lookup per artist/genre.
+    Rows are added on first sight of a user; the arrays double when full.
+    """
+
+    def __init__(self, buckets: int = 1024, capacity: int = 64):
+        self.buckets = buckets
+        self._rows: Dict[int, int] = {}
+        self.weights = np.zeros((capacity, buckets), dtype=np.float32)
+        # (user row, mood, signal) event counts
+        self.signals = np.zeros((capacity, len(MOODS), len(SIGNALS)), dtype=np.int32)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def bucket(self, kind: str, name: str) -> int:
+        digest = hashlib.blake2b(f"{kind}:{name.strip().lower()}".encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "big") % self.buckets
+
+    def _row(self, user_id: int) -> int:
+        row = self._rows.get(user_id)
+        if row is None:
+            row = len(self._rows)
+            if row == len(self.weights):
+                self.weights = np.concatenate((self.weights, np.zeros_like(self.weights)))
+                self.signals = np.concatenate((self.signals, np.zeros_like(self.signals)))
+            self._rows[user_id] = row
+        return row
+
+    def apply(self, user_id: int, signal: str, artists: Iterable[str] = (), genres: Iterable[str] = (),
+              mood: Optional[str] = None):
+        """Fold one feedback event into the user's row"""
+        weight = SIGNAL_WEIGHTS.get(signal)
+        if weight is None:
+            return
+        with self._lock:
+            row = self._row(user_id)
+            for artist in artists:
+                if artist:
+                    self.weights[row, self.bucket("artist", artist)] += weight
+            for genre in genres:
+                if genre:
+                    self.weights[row, self.bucket("genre", genre)] += weight * GENRE_WEIGHT
+            if mood in MOOD_INDEX:
+                self.signals[row, MOOD_INDEX[mood], SIGNAL_INDEX[signal]] += 1
+
+    def score(self, user_id: int, artists: Sequence[str], genres: Sequence[str] = ()) -> float:
+        row = self._rows.get(user_id)
+        if row is None:
+            return 0.0
+        weights = self.weights[row]
+        return (sum(float(weights[self.bucket("artist", artist)]) for artist in artists if artist)
+                + sum(float(weights[self.bucket("genre", genre)]) for genre in genres if genre))
+
+    def rerank(self, user_id: Optional[int], tracks: List[dict]) -> List[dict]:
+        """
+        Tracks ordered by the user's affinity, best first. Ties keep their
+        order, so unknown users and unknown artists are left as they came.
+        """
+        if user_id is None or user_id not in self._rows:
+            return tracks
+        scores = [self.score(user_id, track.get("artists") or (), track.get("genres") or ()) for track in tracks]
+        order = sorted(range(len(tracks)), key=lambda index: -scores[index])
+        return [tracks[index] for index in order]
+
+    def mood_signals(self, user_id: int) -> Dict[str, Dict[str, int]]:
+        row = self._rows.get(user_id)
+        if row is None:
+            return {}
+        return {mood: dict(zip(SIGNALS, self.signals[row, index].tolist())) for index, mood in enumerate(MOODS)}
+
+
+class MusicDataFeed:
+    """
+    Keeps an AffinityModel in step with the music_data table.
+
+    Rows are read in id order past a high-water mark, so every row is applied
+    exactly once and nothing is ever recomputed from the full history; the
+    first sync catches up with what is already there. Rows written by other
+    workers or replicas arrive on the next poll.
+    """
+
+    def __init__(self, model: AffinityModel, connection: Optional[Callable] = None, batch_size: int = 1000):
+        self.model = model
+        self.connection = connection
+        self.batch_size = batch_size
+        self.last_id = 0
+        self._sync_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def sync(self) -> int:
+        """Apply rows written since the last sync; returns how many"""
+        if self.connection is None:
+            from src.database import get_pool
+            self.connection = get_pool().connection
+        applied = 0
+        with self._sync_lock:
+            while True:
+                with self.connection() as connection, connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT id, user_id, artist_name, genres, mood, feedback FROM music_data "
+                        "WHERE id > %s AND user_id IS NOT NULL ORDER BY id LIMIT %s",
+                        (self.last_id, self.batch_size),
+                    )
+                    rows = cursor.fetchall()
+                for row_id, user_id, artist, genres, mood, signal in rows:
+                    self.model.apply(user_id, signal, (artist,), (genres or "").split(","), mood)
+                    self.last_id = row_id
+                applied += len(rows)
+                if len(rows) < self.batch_size:
+                    return applied
+
+    def start(self, interval: float = 10.0):
+        def poll():
+            while True:
+                try:
+                    count = self.sync()
+                    if count:
+                        logger.debug("Applied %s music_data rows to the affinity model", count)
+                except Exception as e:
+                    logger.warning("Affinity model sync failed: %s", e)
+                if self._stop.wait(interval):
+                    return
+
+        threading.Thread(target=poll, name="affinity-feed", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+
+def record_feedback(user_id: int, track: dict, mood: str, signal: str, connection: Optional[Callable] = None) -> int:
+    """Write one music_data row for a feedback event; returns its id"""
+    if connection is None:
+        from src.database import get_pool
+        connection = get_pool().connection
+    artists = track.get("artists") or [""]
+    with connection() as conn, conn.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO music_data (track_id, track_name, artist_name, genres, mood, user_id, feedback) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+            (track["id"], track["name"][:255], artists[0][:255], ",".join(track.get("genres") or ())[:255] or None,
+             mood, user_id, signal),
+        )
+        return cursor.lastrowid
+
+# Usage in the recommender:
+# from src.models.user import AffinityModel, MusicDataFeed, record_feedback
+#
+# affinity = AffinityModel()
+# feed = MusicDataFeed(affinity)
+# feed.start()                                   # catches up, then polls for new rows
+# record_feedback(user_id, track, "relaxed", "like"); feed.sync()
+# tracks = affinity.rerank(user_id, tracks)
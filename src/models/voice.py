@@ -0,0 +1,336 @@
+import os
+import struct
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.logging.logger import get_logger
+from src.utils.common import MOODS
+
+logger = get_logger(__name__)
+
+# PCM sample formats we can decode: (wav format tag, bits per sample) -> numpy dtype
+_PCM_DTYPES = {
+    (1, 8): np.uint8,
+    (1, 16): np.dtype("<i2"),
+    (1, 32): np.dtype("<i4"),
+    (3, 32): np.dtype("<f4"),
+}
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class AudioFormatError(ValueError):
+    pass
+
+
+class PCMStreamDecoder:
+    """
+    Incremental WAV / raw PCM decoder.
+
+    Bytes are fed as they arrive; complete fixed-size mono float32 frames are
+    returned as soon as enough samples exist, and at most one partial frame is
+    kept between calls, so the full clip is never buffered.
+    """
+
+    def __init__(
+        self,
+        frame_seconds: float = 0.5,
+        raw: bool = False,
+        sample_rate: int = 16000,
+        channels: int = 1,
+        bits: int = 16,
+    ):
+        self.frame_seconds = frame_seconds
+        self._buffer = bytearray()
+        self._header_done = False
+        self._pending = np.empty(0, dtype=np.float32)
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.dtype = None
+        if raw:
+            self._configure(1, channels, sample_rate, bits)
+            self._header_done = True
+
+    @property
+    def frame_size(self) -> int:
+        return int(self.sample_rate * self.frame_seconds)
+
+    def _configure(self, format_tag: int, channels: int, sample_rate: int, bits: int):
+        dtype = _PCM_DTYPES.get((format_tag, bits))
+        if dtype is None:
+            raise AudioFormatError(f"Unsupported PCM format (tag={format_tag}, bits={bits})")
+        self.dtype = np.dtype(dtype)
+        self.channels = channels
+        self.sample_rate = sample_rate
+
+    def _parse_header(self) -> bool:
+        """Consume the RIFF header up to the data chunk; False if more bytes are needed"""
+        buffer = self._buffer
+        if len(buffer) < 12:
+            return False
+        if buffer[:4] != b"RIFF" or buffer[8:12] != b"WAVE":
+            raise AudioFormatError("Not a RIFF/WAVE stream")
+        offset = 12
+        while True:
+            if len(buffer) < offset + 8:
+                return False
+            chunk_id = bytes(buffer[offset:offset + 4])
+            chunk_size = struct.unpack_from("<I", buffer, offset + 4)[0]
+            if chunk_id == b"data":
+                if self.dtype is None:
+                    raise AudioFormatError("WAV data chunk before fmt chunk")
+                del buffer[:offset + 8]
+                return True
+            if len(buffer) < offset + 8 + chunk_size:
+                return False
+            if chunk_id == b"fmt ":
+                format_tag, channels, sample_rate = struct.unpack_from("<HHI", buffer, offset + 8)
+                bits = struct.unpack_from("<H", buffer, offset + 22)[0]
+                if format_tag == _WAVE_FORMAT_EXTENSIBLE and chunk_size >= 40:
+                    format_tag = struct.unpack_from("<H", buffer, offset + 32)[0]
+                self._configure(format_tag, channels, sample_rate, bits)
+            # Chunks are word aligned
+            offset += 8 + chunk_size + (chunk_size & 1)
+
+    def _to_float(self, raw: memoryview) -> np.ndarray:
+        samples = np.frombuffer(raw, dtype=self.dtype)
+        if self.dtype == np.uint8:
+            samples = (samples.astype(np.float32) - 128.0) / 128.0
+        elif self.dtype.kind == "i":
+            samples = samples.astype(np.float32) / float(np.iinfo(self.dtype).max)
+        else:
+            # Always copy: the decoded frames must not pin the receive buffer
+            samples = samples.astype(np.float32)
+        if self.channels > 1:
+            samples = samples.reshape(-1, self.channels).mean(axis=1)
+        return samples
+
+    def feed(self, data: bytes) -> List[np.ndarray]:
+        """Add bytes and return every complete frame now available"""
+        self._buffer += data
+        if not self._header_done:
+            if not self._parse_header():
+                return []
+            self._header_done = True
+
+        block_align = self.dtype.itemsize * self.channels
+        usable = len(self._buffer) - len(self._buffer) % block_align
+        if usable == 0:
+            return []
+        with memoryview(self._buffer) as view:
+            samples = self._to_float(view[:usable])
+        del self._buffer[:usable]
+
+        if self._pending.size:
+            samples = np.concatenate((self._pending, samples))
+        frame_size = self.frame_size
+        complete = samples.size - samples.size % frame_size
+        frames = [samples[start:start + frame_size] for start in range(0, complete, frame_size)]
+        self._pending = samples[complete:].copy()
+        return frames
+
+    def flush(self) -> Optional[np.ndarray]:
+        """Return the trailing partial frame, if it is long enough to be worth classifying"""
+        pending, self._pending = self._pending, np.empty(0, dtype=np.float32)
+        if pending.size >= self.frame_size // 4:
+            return pending
+        return None
+
+
+def _hz_to_mel(hz):
+    return 2595.0 * np.log10(1.0 + np.asarray(hz) / 700.0)
+
+
+def _mel_to_hz(mel):
+    return 700.0 * (10.0 ** (np.asarray(mel) / 2595.0) - 1.0)
+
+
+class SpectralFeatureExtractor:
+    """Vectorized spectral/MFCC summary features for one frame of audio"""
+
+    def __init__(self, sample_rate: int, n_fft: int = 512, hop: int = 256, n_mels: int = 26, n_mfcc: int = 13):
+        self.sample_rate = sample_rate
+        self.n_fft = n_fft
+        self.hop = hop
+        self.window = np.hanning(n_fft).astype(np.float32)
+        self.freqs = np.fft.rfftfreq(n_fft, d=1.0 / sample_rate).astype(np.float32)
+        self.mel_filters = self._mel_filterbank(n_mels)
+        # DCT-II basis applied to log-mel energies gives the MFCCs
+        k = np.arange(n_mfcc)[:, None]
+        n = np.arange(n_mels)[None, :]
+        self.dct = (np.cos(np.pi * k * (2 * n + 1) / (2 * n_mels)) * np.sqrt(2.0 / n_mels)).astype(np.float32)
+
+    @property
+    def size(self) -> int:
+        return 6 + 2 * self.dct.shape[0]
+
+    def _mel_filterbank(self, n_mels: int) -> np.ndarray:
+        mel_points = np.linspace(_hz_to_mel(0.0), _hz_to_mel(self.sample_rate / 2.0), n_mels + 2)
+        hz_points = _mel_to_hz(mel_points)
+        lower, center, upper = hz_points[:-2, None], hz_points[1:-1, None], hz_points[2:, None]
+        freqs = self.freqs[None, :]
+        rising = (freqs - lower) / np.maximum(center - lower, 1e-6)
+        falling = (upper - freqs) / np.maximum(upper - center, 1e-6)
+        return np.maximum(0.0, np.minimum(rising, falling)).astype(np.float32)
+
+    def extract(self, samples: np.ndarray) -> np.ndarray:
+        if samples.size < self.n_fft:
+            samples = np.pad(samples, (0, self.n_fft - samples.size))
+        frames = np.lib.stride_tricks.sliding_window_view(samples, self.n_fft)[::self.hop]
+        power = np.abs(np.fft.rfft(frames * self.window, axis=1)) ** 2
+        power_sum = power.sum(axis=1) + 1e-10
+
+        rms = np.sqrt(np.mean(frames ** 2, axis=1))
+        zcr = np.mean(np.abs(np.diff(np.signbit(frames).astype(np.int8), axis=1)), axis=1)
+        centroid = (power @ self.freqs) / power_sum / (self.sample_rate / 2.0)
+        cumulative = np.cumsum(power, axis=1)
+        rolloff = np.argmax(cumulative >= 0.85 * cumulative[:, -1:], axis=1) / power.shape[1]
+        flatness = np.exp(np.mean(np.log(power + 1e-10), axis=1)) / (power_sum / power.shape[1])
+        mfcc = np.log(power @ self.mel_filters.T + 1e-10) @ self.dct.T
+
+        return np.concatenate((
+            [rms.mean(), rms.std(), zcr.mean(), centroid.mean(), rolloff.mean(), flatness.mean()],
+            mfcc.mean(axis=0),
+            mfcc.std(axis=0),
+        )).astype(np.float32)
+
+
+class VoiceEmotionClassifier:
+    """
+    Small linear softmax classifier over SpectralFeatureExtractor features.
+
+    Weights are loaded from an .npz file (W, b, mean, scale) when VOICE_MODEL_PATH
+    is set. The built-in fallback only uses the prosodic features: loud,
+    bright, fast-varying speech reads as energetic/positive, quiet and dull
+    speech as relaxed/negative.
+    """
+
+    def __init__(self, feature_size: int, model_path: Optional[str] = None, arrays: Optional[Dict[str, np.ndarray]] = None):
+        model_path = model_path or os.getenv("VOICE_MODEL_PATH")
+        if arrays is not None:
+            # Already-loaded (possibly shared, read-only) weights
+            self.W, self.b, self.mean, self.scale = arrays["W"], arrays["b"], arrays["mean"], arrays["scale"]
+        elif model_path and os.path.exists(model_path):
+            with np.load(model_path) as weights:
+                self.W = weights["W"].astype(np.float32)
+                self.b = weights["b"].astype(np.float32)
+                self.mean = weights["mean"].astype(np.float32)
+                self.scale = weights["scale"].astype(np.float32)
+            logger.info("Loaded classifier weights from %s", model_path)
+        else:
+            self.W, self.b, self.mean, self.scale = self._heuristic_weights(feature_size)
+
+    @staticmethod
+    def _heuristic_weights(feature_size: int):
+        W = np.zeros((len(MOODS), feature_size), dtype=np.float32)
+        mean = np.zeros(feature_size, dtype=np.float32)
+        scale = np.ones(feature_size, dtype=np.float32)
+        # rms, rms std, zcr, centroid, rolloff, flatness
+        mean[:6] = (0.05, 0.03, 0.08, 0.15, 0.25, 0.2)
+        scale[:6] = (0.05, 0.03, 0.06, 0.1, 0.15, 0.2)
+        #                  rms   rms_sd  zcr   centroid rolloff flatness
+        W[:, :6] = np.array([
+            [0.6, 0.8, 0.2, 0.6, 0.3, -0.2],    # positive
+            [-0.4, -0.6, -0.2, -0.6, -0.4, 0.1],  # negative
+            [-0.2, -0.3, 0.0, 0.0, 0.0, 0.0],   # neutral
+            [1.0, 0.6, 0.6, 0.4, 0.4, 0.2],     # energetic
+            [-0.9, -0.5, -0.5, -0.3, -0.3, -0.2],  # relaxed
+        ], dtype=np.float32)
+        b = np.array([0.0, 0.0, 0.3, 0.0, 0.0], dtype=np.float32)
+        return W, b, mean, scale
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {"W": self.W, "b": self.b, "mean": self.mean, "scale": self.scale}
+
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        """Mood probabilities for one (F,) feature vector or an (N, F) batch"""
+        logits = ((features - self.mean) / self.scale) @ self.W.T + self.b
+        logits = logits - logits.max(axis=-1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=-1, keepdims=True)
+
+
+class VoiceEmotionModel:
+    """
+    Feature extraction plus classification for batches of decoded frames.
+
+    Holds no per-request state, so one instance serves every stream; the weights
+    are exposed through shared_arrays() for SharedModelServer.
+    """
+
+    def __init__(self, classifier: VoiceEmotionClassifier):
+        self.classifier = classifier
+        self._extractors: Dict[int, SpectralFeatureExtractor] = {}
+
+    def shared_arrays(self) -> Dict[str, np.ndarray]:
+        return self.classifier.arrays()
+
+    def _extractor(self, sample_rate: int) -> SpectralFeatureExtractor:
+        extractor = self._extractors.get(sample_rate)
+        if extractor is None:
+            extractor = self._extractors[sample_rate] = SpectralFeatureExtractor(sample_rate)
+        return extractor
+
+    def analyze(self, frames: List[np.ndarray], sample_rate: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (N, len(MOODS)) mood probabilities and the (N,) RMS level of each frame"""
+        extractor = self._extractor(sample_rate)
+        features = np.stack([extractor.extract(frame) for frame in frames])
+        return self.classifier.predict_proba(features), features[:, 0]
+
+
+def load_voice_model(arrays: Optional[Dict[str, np.ndarray]] = None) -> VoiceEmotionModel:
+    """Model factory for src.models.serving: loads weights from disk, or wraps shared arrays"""
+    feature_size = SpectralFeatureExtractor(16000).size
+    return VoiceEmotionModel(VoiceEmotionClassifier(feature_size, arrays=arrays))
+
+
+class VoiceEmotionStream:
+    """
+    Running mood estimate over an audio upload that is still arriving.
+
+    Decoding happens here; classification is done by a VoiceEmotionModel
+    (possibly in another process) and the results are folded back in with update().
+    """
+
+    def __init__(self, decoder: PCMStreamDecoder, smoothing: float = 0.3):
+        self.decoder = decoder
+        self.smoothing = smoothing
+        self.probabilities = np.full(len(MOODS), 1.0 / len(MOODS), dtype=np.float32)
+        self.seconds = 0.0
+        self.frames = 0
+
+    @property
+    def sample_rate(self) -> int:
+        # Only known once the WAV header has been parsed
+        return self.decoder.sample_rate
+
+    def decode(self, data: bytes) -> List[np.ndarray]:
+        return self.decoder.feed(data)
+
+    def flush(self) -> List[np.ndarray]:
+        tail = self.decoder.flush()
+        return [tail] if tail is not None else []
+
+    def update(self, probabilities: np.ndarray, levels: np.ndarray, frames: List[np.ndarray]) -> List[Dict]:
+        """Fold per-frame model output into the running estimate; returns one estimate per frame"""
+        estimates = []
+        for frame_probabilities, level, frame in zip(probabilities, levels, frames):
+            # Near-silent frames barely move the estimate
+            alpha = self.smoothing * min(1.0, float(level) / 0.02)
+            if self.frames == 0:
+                alpha = max(alpha, 0.5)
+            self.probabilities = (1.0 - alpha) * self.probabilities + alpha * frame_probabilities
+            self.frames += 1
+            self.seconds += frame.size / self.sample_rate
+            estimates.append(self.estimate())
+        return estimates
+
+    def estimate(self, final: bool = False) -> Dict:
+        index = int(np.argmax(self.probabilities))
+        return {
+            "mood": MOODS[index],
+            "confidence": round(float(self.probabilities[index]), 3),
+            "probabilities": {mood: round(float(p), 3) for mood, p in zip(MOODS, self.probabilities)},
+            "seconds": round(self.seconds, 2),
+            "final": final,
+        }
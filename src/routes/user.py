@@ -0,0 +1,55 @@
+import math
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+
+from src.database import UserLogin, authenticate_user
+from src.logging.logger import get_logger
+from src.middleware.rate_limiter import RateLimit, create_bucket_store
+from src.utils.session import Session, bearer_token, issue_session_token, verify_session_token
+
+logger = get_logger(__name__)
+
+router = APIRouter()
+
+# Password guesses per account, whoever sends them: keyed on the username being
+# tried, so rotating headers or addresses doesn't buy more attempts
+LOGIN_ACCOUNT_LIMIT = RateLimit.from_env("RATE_LIMIT_LOGIN_ACCOUNT", 0.1, 5)
+_login_attempts = create_bucket_store()
+
+
+def require_session(request: Request) -> dict:
+    """FastAPI dependency: the claims of the caller's `Authorization: Bearer` session token"""
+    claims = verify_session_token(bearer_token(request.headers.get("Authorization", "")))
+    if claims is None:
+        raise HTTPException(status_code=401, detail="Invalid or expired session")
+    return claims
+
+
+@router.post("/auth/login", response_model=Session)
+async def login(credentials: UserLogin):
+    """One pooled query, then a signed token; the frontend keeps it instead of calling MySQL itself"""
+    account = credentials.username.strip().lower()
+    allowed, retry_after = await _login_attempts.take(f"login:{account}", LOGIN_ACCOUNT_LIMIT)
+    if not allowed:
+        raise HTTPException(status_code=429, detail="Too many login attempts, please retry later",
+                            headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+    try:
+        user_id = await run_in_threadpool(authenticate_user, credentials.username, credentials.password)
+    except Exception as e:
+        logger.error("Login failed, user store unavailable: %s", e)
+        raise HTTPException(status_code=503, detail="Authentication service unavailable")
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Invalid username or password")
+    return issue_session_token(credentials.username, user_id)
+
+
+@router.get("/auth/session")
+def session(claims: dict = Depends(require_session)):
+    """Claims of a still-valid session token (401 otherwise)"""
+    return claims
+
+# Usage in FastAPI app:
+# from src.routes.user import router as user_router
+#
+# app.include_router(user_router)
@@ -0,0 +1,4 @@
+# Moods understood by every service; the order is the index order of mood probability vectors
+MOODS = ("positive", "negative", "neutral", "energetic", "relaxed")
+
+MOOD_INDEX = {mood: index for index, mood in enumerate(MOODS)}
@@ -0,0 +1,110 @@
+import heapq
+from typing import Tuple
+
+import numpy as np
+
+
+class KDTree:
+    """
+    Static k-d tree over an (N, D) float array, for small D.
+
+    Built once with median splits on the widest dimension. Points are
+    reordered so every leaf is a contiguous block: a query walks the tree in
+    Python, but the distances inside a leaf are one vectorised NumPy
+    operation, and whole subtrees are skipped when the splitting plane is
+    farther away than the current k-th best match.
+    """
+
+    def __init__(self, points: np.ndarray, leaf_size: int = 128):
+        points = np.asarray(points, dtype=np.float64)
+        if points.ndim != 2:
+            raise ValueError("points must be a 2-D array")
+        self.leaf_size = max(1, leaf_size)
+        self.indices = np.arange(len(points))
+        # Node arrays: split dimension (-1 for a leaf), split value, children, leaf block [start, end)
+        self._dim, self._value, self._left, self._right, self._start, self._end = [], [], [], [], [], []
+        if len(points):
+            self._build(points)
+        self.points = points[self.indices]
+        # Bounding box of each leaf, for a tighter distance bound than the splitting planes alone
+        self._low = np.array([self.points[s:e].min(axis=0) if e > s else np.zeros(points.shape[1])
+                              for s, e in zip(self._start, self._end)])
+        self._high = np.array([self.points[s:e].max(axis=0) if e > s else np.zeros(points.shape[1])
+                               for s, e in zip(self._start, self._end)])
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def _new_node(self, start: int, end: int) -> int:
+        for column in (self._dim, self._value, self._left, self._right):
+            column.append(-1)
+        self._start.append(start)
+        self._end.append(end)
+        return len(self._start) - 1
+
+    def _build(self, points: np.ndarray):
+        # Iterative, so deep trees can't hit the recursion limit
+        root = self._new_node(0, len(points))
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            start, end = self._start[node], self._end[node]
+            if end - start <= self.leaf_size:
+                continue
+            block = points[self.indices[start:end]]
+            spread = block.max(axis=0) - block.min(axis=0)
+            dim = int(np.argmax(spread))
+            if spread[dim] == 0:
+                continue  # all points identical: keep as one leaf
+            middle = (end - start) // 2
+            order = np.argpartition(block[:, dim], middle)
+            self.indices[start:end] = self.indices[start:end][order]
+            self._dim[node] = dim
+            self._value[node] = float(points[self.indices[start + middle], dim])
+            self._left[node] = self._new_node(start, start + middle)
+            self._right[node] = self._new_node(start + middle, end)
+            stack.extend((self._left[node], self._right[node]))
+
+    def query(self, point, k: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """(distances, row indices into the original array) of the k nearest points, closest first"""
+        point = np.asarray(point, dtype=np.float64)
+        k = min(k, len(self))
+        if k <= 0:
+            return np.empty(0), np.empty(0, dtype=np.int64)
+
+        best_dist = np.full(k, np.inf)   # squared distances, unsorted
+        best_rows = np.full(k, -1, dtype=np.int64)
+        worst = np.inf
+        # Min-heap of (lower bound on squared distance, node)
+        heap = [(0.0, 0)]
+        while heap:
+            bound, node = heapq.heappop(heap)
+            if bound >= worst:
+                break  # every remaining node is at least this far away
+            dim = self._dim[node]
+            if dim < 0:
+                start, end = self._start[node], self._end[node]
+                dist = ((self.points[start:end] - point) ** 2).sum(axis=1)
+                merged_dist = np.concatenate((best_dist, dist))
+                merged_rows = np.concatenate((best_rows, np.arange(start, end)))
+                keep = np.argpartition(merged_dist, k - 1)[:k]
+                best_dist, best_rows = merged_dist[keep], merged_rows[keep]
+                worst = best_dist.max()
+                continue
+            for child in (self._left[node], self._right[node]):
+                if self._dim[child] < 0:
+                    # Distance from the point to the leaf's bounding box
+                    gap = np.maximum(self._low[child] - point, 0) + np.maximum(point - self._high[child], 0)
+                    child_bound = float(gap @ gap)
+                else:
+                    child_bound = bound
+                    offset = point[dim] - self._value[node]
+                    if (child == self._left[node] and offset > 0) or (child == self._right[node] and offset < 0):
+                        child_bound = max(bound, offset * offset)
+                if child_bound < worst:
+                    heapq.heappush(heap, (child_bound, child))
+
+        found = best_rows >= 0
+        best_dist, best_rows = best_dist[found], best_rows[found]
+        order = np.argsort(best_dist)
+        return np.sqrt(best_dist[order]), self.indices[best_rows[order]]
@@ -0,0 +1,78 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+from typing import Optional
+
+from pydantic import BaseModel
+
+from src.logging.logger import get_logger
+
+logger = get_logger(__name__)
+
+SESSION_TTL_S = int(os.getenv("SESSION_TTL_S", 12 * 3600))
+
+_secret = os.getenv("SESSION_SECRET", "").encode()
+if not _secret:
+    # Sessions then end with the process, and other services and replicas can't verify them
+    # (the chatbot would rate-limit every user as the frontend's address). docker-compose requires it.
+    logger.warning("SESSION_SECRET is not set; using a random per-process key, tokens only verify in this process")
+    _secret = secrets.token_bytes(32)
+
+
+class Session(BaseModel):
+    token: str
+    username: str
+    user_id: Optional[int] = None
+    expires_at: int
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def issue_session_token(username: str, user_id: Optional[int], ttl: int = SESSION_TTL_S) -> Session:
+    """A stateless session: the claims plus an HMAC-SHA256 over them, checked without any lookup"""
+    expires_at = int(time.time()) + ttl
+    payload = _b64(json.dumps({"sub": username, "uid": user_id, "exp": expires_at}, separators=(",", ":")).encode())
+    signature = _b64(hmac.new(_secret, payload.encode("ascii"), hashlib.sha256).digest())
+    return Session(token=f"{payload}.{signature}", username=username, user_id=user_id, expires_at=expires_at)
+
+
+def verify_session_token(token: str) -> Optional[dict]:
+    """The token's claims, or None if it is malformed, forged or expired"""
+    payload, _, signature = token.partition(".")
+    if not payload or not signature:
+        return None
+    try:
+        # Compared as bytes: compare_digest refuses str with non-ASCII characters
+        expected = _b64(hmac.new(_secret, payload.encode("ascii"), hashlib.sha256).digest())
+        if not hmac.compare_digest(signature.encode("utf-8", "surrogateescape"), expected.encode("ascii")):
+            return None
+        claims = json.loads(_unb64(payload))
+    except (UnicodeError, TypeError, ValueError):
+        return None
+    if not isinstance(claims, dict) or not isinstance(claims.get("exp"), (int, float)):
+        return None
+    if claims["exp"] < time.time():
+        return None
+    return claims
+
+
+def bearer_token(authorization: str) -> str:
+    """The token of an `Authorization: Bearer <token>` header value, or "" """
+    scheme, _, token = authorization.partition(" ")
+    return token if scheme.lower() == "bearer" else ""
+
+# Usage:
+# from src.utils.session import issue_session_token, verify_session_token
+#
+# session = issue_session_token("alice", 42)
+# claims = verify_session_token(session.token)   # {"sub": "alice", "uid": 42, "exp": ...}
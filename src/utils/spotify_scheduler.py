@@ -0,0 +1,229 @@
+import contextvars
+import heapq
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+import requests
+import spotipy
+
+from src.logging.logger import get_logger
+from src.middleware.metrics import REGISTRY, track_dependency
+from src.middleware.rate_limiter import RateLimit, TokenBucket
+from src.middleware.tracing import span
+
+logger = get_logger(__name__)
+
+# Lower value is served first
+PRIORITY_USER = 0        # a user is waiting on the response (/recommend, /search, ...)
+PRIORITY_WARM = 1        # cache warming
+PRIORITY_BACKGROUND = 2  # periodic sync and refresh jobs
+
+QUEUE_WAIT = REGISTRY.histogram(
+    "spotify_queue_wait_seconds", "Time Spotify calls spend queued in the scheduler", ("priority",)
+)
+RATE_LIMITED = REGISTRY.counter("spotify_rate_limited_total", "Spotify 429 responses")
+
+
+class SpotifyBusyError(Exception):
+    """A call could not be made in time because Spotify is over quota"""
+
+
+def spotify_session(pool_size: int = 16) -> requests.Session:
+    """
+    HTTP session for spotipy clients that go through the scheduler.
+
+    It has no retry adapter: spotipy's built-in retries sleep on 429s inside the
+    calling thread, while the scheduler pauses every caller and keeps Retry-After
+    intact on the SpotifyException.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class _Job:
+    __slots__ = ("fn", "args", "kwargs", "future", "deadline", "attempts", "enqueued", "context")
+
+    def __init__(self, fn, args, kwargs, deadline):
+        self.enqueued = time.monotonic()
+        # The submitter's context, so the call's span lands in the request's trace
+        self.context = contextvars.copy_context()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.deadline = deadline
+        self.attempts = 0
+
+
+class SpotifyScheduler:
+    """
+    Shared outbound scheduler for Spotify API calls.
+
+    Calls are queued by priority and released by a dispatcher thread at the pace
+    of one global token bucket, then run on a small worker pool. A 429 pauses all
+    dispatching for its Retry-After, and the call goes back in the queue at its
+    original position instead of failing. User-facing calls carry a queue
+    deadline so a request degrades (SpotifyBusyError) rather than hanging;
+    background work just waits its turn.
+    """
+
+    def __init__(
+        self,
+        limit: RateLimit,
+        workers: int = 8,
+        max_attempts: int = 4,
+        max_pause: float = 60.0,
+        user_wait: float = 10.0,
+    ):
+        self.bucket = TokenBucket(limit)
+        self.max_attempts = max_attempts
+        self.max_pause = max_pause
+        self.user_wait = user_wait
+        self._queue = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._paused_until = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="spotify")
+        self._dispatcher = threading.Thread(target=self._dispatch, name="spotify-scheduler", daemon=True)
+        self._dispatcher.start()
+
+    @classmethod
+    def from_env(cls) -> "SpotifyScheduler":
+        return cls(
+            RateLimit.from_env("SPOTIFY_RATE_LIMIT", 5, 10),
+            workers=int(os.getenv("SPOTIFY_WORKERS", 8)),
+            user_wait=float(os.getenv("SPOTIFY_USER_MAX_WAIT_S", 10)),
+        )
+
+    def submit(self, fn: Callable, *args, priority: int = PRIORITY_USER, **kwargs) -> Future:
+        deadline = time.monotonic() + self.user_wait if priority == PRIORITY_USER else None
+        job = _Job(fn, args, kwargs, deadline)
+        self._enqueue(priority, next(self._sequence), job)
+        return job.future
+
+    def call(self, fn: Callable, *args, priority: int = PRIORITY_USER, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) through the scheduler and wait for its result"""
+        return self.submit(fn, *args, priority=priority, **kwargs).result()
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+    def _enqueue(self, priority: int, sequence: int, job: _Job):
+        with self._condition:
+            heapq.heappush(self._queue, (priority, sequence, job))
+            self._condition.notify()
+
+    def _dispatch(self):
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+                priority, sequence, job = self._queue[0]
+                now = time.monotonic()
+                if job.deadline is not None and now > job.deadline:
+                    heapq.heappop(self._queue)
+                    _settle(job.future, error=SpotifyBusyError("Timed out waiting for Spotify quota"))
+                    continue
+                wait = self._paused_until - now
+                if wait <= 0:
+                    taken, wait = self.bucket.take()
+                    if taken:
+                        heapq.heappop(self._queue)
+                if wait > 0:
+                    # Wake up early for a head-of-line deadline; new arrivals also wake us via notify()
+                    if job.deadline is not None:
+                        wait = min(wait, job.deadline - now)
+                    self._condition.wait(max(wait, 0.001))
+                    continue
+
+            # A fresh copy per attempt: a retry may be dispatched before the previous attempt has returned
+            self._executor.submit(job.context.copy().run, self._run, priority, sequence, job)
+
+    def _run(self, priority: int, sequence: int, job: _Job):
+        # The future stays pending across retries, so callers only ever see the final outcome
+        if job.future.cancelled():
+            return
+        job.attempts += 1
+        if job.attempts == 1:
+            QUEUE_WAIT.observe(time.monotonic() - job.enqueued, str(priority))
+        operation = getattr(job.fn, "__name__", "call")
+        try:
+            with span(f"spotify.{operation}", attempt=job.attempts), track_dependency("spotify", operation):
+                result = job.fn(*job.args, **job.kwargs)
+        except spotipy.SpotifyException as e:
+            if e.http_status != 429:
+                _settle(job.future, error=e)
+                return
+            pause = self._pause(e)
+            if job.attempts >= self.max_attempts or (job.deadline is not None and time.monotonic() + pause > job.deadline):
+                _settle(job.future, error=SpotifyBusyError(f"Spotify rate limit, retry after {pause:.0f}s"))
+                return
+            # Back in line at its original position
+            self._enqueue(priority, sequence, job)
+        except Exception as e:
+            _settle(job.future, error=e)
+        else:
+            _settle(job.future, result=result)
+
+    def _pause(self, error: spotipy.SpotifyException) -> float:
+        """Stop dispatching for the upstream's Retry-After; returns the pause in seconds"""
+        headers = getattr(error, "headers", None) or {}
+        try:
+            pause = float(headers.get("Retry-After", 1))
+        except (TypeError, ValueError):
+            pause = 1.0
+        pause = min(max(pause, 0.0), self.max_pause)
+        RATE_LIMITED.inc()
+        with self._condition:
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+        self.bucket.drain()
+        logger.warning("[Spotify Scheduler] Rate limited, pausing outbound calls for %.1fs", pause)
+        return pause
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _settle(future: Future, result: Any = None, error: Optional[BaseException] = None):
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass  # Cancelled by the caller meanwhile
+
+
+class ScheduledSpotify:
+    """
+    Proxy for a spotipy client that routes every API method through the scheduler.
+
+    Non-callable attributes pass straight through; with_priority() gives a view
+    of the same client for warming or background jobs.
+    """
+
+    def __init__(self, client: spotipy.Spotify, scheduler: SpotifyScheduler, priority: int = PRIORITY_USER):
+        self._client = client
+        self._scheduler = scheduler
+        self._priority = priority
+
+    def with_priority(self, priority: int) -> "ScheduledSpotify":
+        return ScheduledSpotify(self._client, self._scheduler, priority)
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._client, name)
+        if not callable(attribute) or name.startswith("_"):
+            return attribute
+
+        def scheduled(*args, **kwargs):
+            return self._scheduler.call(attribute, *args, priority=self._priority, **kwargs)
+
+        return scheduled
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from src.utils.kdtree import KDTree
+
+
+def brute_force(points, point, k):
+    distances = np.sqrt(((points - point) ** 2).sum(axis=1))
+    order = np.argsort(distances, kind="stable")[:k]
+    return distances[order], order
+
+
+@pytest.mark.parametrize("n", [1, 2, 7, 128, 129, 1000, 20_000])
+@pytest.mark.parametrize("leaf_size", [1, 16, 128])
+def test_query_matches_brute_force(n, leaf_size):
+    rng = np.random.default_rng(n * 31 + leaf_size)
+    points = rng.random((n, 4))
+    tree = KDTree(points, leaf_size=leaf_size)
+    for point in rng.random((20, 4)) * 1.2 - 0.1:
+        for k in (1, 5, 50):
+            distances, indices = tree.query(point, k)
+            expected_distances, _ = brute_force(points, point, k)
+            assert len(indices) == min(k, n)
+            np.testing.assert_allclose(distances, expected_distances)
+            # Indices point back at rows of the original array
+            np.testing.assert_allclose(np.sqrt(((points[indices] - point) ** 2).sum(axis=1)), distances)
+
+
+def test_duplicate_points_stay_one_leaf():
+    points = np.ones((500, 3))
+    distances, indices = KDTree(points, leaf_size=8).query(np.zeros(3), 10)
+    np.testing.assert_allclose(distances, np.sqrt(3))
+    assert len(set(indices.tolist())) == 10
+
+
+def test_empty_tree_returns_nothing():
+    tree = KDTree(np.empty((0, 4)))
+    distances, indices = tree.query(np.zeros(4), 5)
+    assert len(tree) == 0 and len(distances) == 0 and len(indices) == 0
+
+
+def test_rejects_non_matrix():
+    with pytest.raises(ValueError):
+        KDTree(np.zeros(5))
@@ -0,0 +1,38 @@
+import asyncio
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pytest
+
+from src.models.serving import SharedModelServer
+
+
+class TinyModel:
+    def __init__(self, arrays=None):
+        self.weights = arrays["weights"] if arrays else np.arange(4, dtype=np.float32)
+
+    def shared_arrays(self):
+        return {"weights": self.weights}
+
+    def total(self):
+        return float(self.weights.sum())
+
+    def crash(self):
+        os._exit(1)
+
+
+def tiny_model(arrays=None):
+    return TinyModel(arrays)
+
+
+@pytest.mark.parametrize("mode", ["fork", "shm"])
+def test_pool_is_replaced_after_a_worker_dies(mode):
+    server = SharedModelServer(tiny_model, processes=1, mode=mode).start()
+    try:
+        with pytest.raises(BrokenProcessPool):
+            asyncio.run(server.infer("crash"))
+        total, _ = asyncio.run(server.infer("total"))
+        assert total == 6.0
+    finally:
+        server.shutdown()
@@ -0,0 +1,71 @@
+import os
+
+import numpy as np
+import pytest
+
+from src.models.music import (
+    FEATURES,
+    KEEP_VERSIONS,
+    CatalogStore,
+    TrackCatalog,
+    build_catalog,
+    current_version,
+)
+
+
+def make_track(index, mood, features=True):
+    track = {
+        "id": f"track-{index}",
+        "name": f"Song {index} ♪",
+        "artists": [f"Artist {index}", "Guest"],
+        "preview_url": None if index % 2 else f"https://p/{index}",
+        "external_url": f"https://open.spotify.com/track/{index}",
+        "genres": ["jazz", "lo-fi"] if index % 3 == 0 else [],
+        "mood": mood,
+    }
+    if features:
+        track.update(valence=0.1 * (index % 10), energy=0.5, tempo=100.0 + index, danceability=0.4)
+    return track
+
+
+@pytest.fixture
+def tracks():
+    moods = ["relaxed", "positive", "negative", "relaxed", "energetic"]
+    return [make_track(index, moods[index % len(moods)], features=index != 4) for index in range(40)]
+
+
+def test_round_trip(tmp_path, tracks):
+    version = build_catalog(str(tmp_path), tracks)
+    assert current_version(str(tmp_path)) == version
+
+    catalog = TrackCatalog(os.path.join(tmp_path, version))
+    assert len(catalog) == len(tracks)
+    by_id = {track["id"]: track for track in tracks}
+    for mood in ("relaxed", "positive", "negative", "energetic", "neutral"):
+        rows = catalog.mood_range(mood)
+        assert len(rows) == sum(track["mood"] == mood for track in tracks)
+        for row in rows:
+            track = catalog.track(row)
+            original = by_id[track["id"]]
+            assert original["mood"] == mood
+            for column in ("name", "artists", "preview_url", "external_url", "genres"):
+                assert track[column] == original[column]
+            expected = [original.get(name, np.nan) for name in FEATURES]
+            np.testing.assert_allclose(catalog.features[row], np.array(expected, dtype=np.float32))
+
+
+def test_duplicate_ids_keep_first(tmp_path):
+    first, second = make_track(1, "relaxed"), make_track(1, "relaxed")
+    second["name"] = "Other"
+    catalog = TrackCatalog(os.path.join(tmp_path, build_catalog(str(tmp_path), [first, second])))
+    assert len(catalog) == 1 and catalog.track(0)["name"] == first["name"]
+
+
+def test_old_versions_are_pruned(tmp_path, tracks):
+    versions = [build_catalog(str(tmp_path), tracks) for _ in range(KEEP_VERSIONS + 2)]
+    remaining = sorted(name for name in os.listdir(tmp_path) if name.startswith("v"))
+    assert remaining == versions[-KEEP_VERSIONS:]
+
+
+def test_store_without_catalog(tmp_path):
+    assert CatalogStore(str(tmp_path)).get() is None
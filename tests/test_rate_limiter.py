@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+from src.middleware import rate_limiter
+from src.middleware.rate_limiter import InMemoryBucketStore, RateLimit, RateLimitMiddleware, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", clock)
+    return clock
+
+
+def test_bucket_rejects_past_burst_and_refills(clock):
+    bucket = TokenBucket(RateLimit(2, 3))
+    assert [bucket.take()[0] for _ in range(4)] == [True, True, True, False]
+    taken, wait = bucket.take()
+    assert not taken and wait == pytest.approx(0.5)
+    clock.now += 0.5
+    assert bucket.take() == (True, 0.0)
+    # Refill never banks more than the burst
+    clock.now += 60
+    assert [bucket.take()[0] for _ in range(4)] == [True, True, True, False]
+
+
+def test_drain_empties_bucket(clock):
+    bucket = TokenBucket(RateLimit(1, 5))
+    bucket.drain()
+    assert not bucket.take()[0]
+    clock.now += 1
+    assert bucket.take()[0]
+
+
+def test_store_keeps_buckets_per_key(clock):
+    store = InMemoryBucketStore()
+    limit = RateLimit(1, 2)
+
+    async def takes(key, count):
+        return [(await store.take(key, limit))[0] for _ in range(count)]
+
+    assert asyncio.run(takes("a", 3)) == [True, True, False]
+    assert asyncio.run(takes("b", 2)) == [True, True]
+    allowed, retry_after = asyncio.run(store.take("a", limit))
+    assert not allowed and retry_after == pytest.approx(1.0)
+    clock.now += 1
+    assert asyncio.run(takes("a", 2)) == [True, False]
+
+
+def test_store_forgets_least_recently_used(clock):
+    store = InMemoryBucketStore(max_keys=2)
+    limit = RateLimit(1, 1)
+    for key in ("a", "b", "c"):
+        asyncio.run(store.take(key, limit))
+    # "a" was dropped, so it starts from a full bucket again
+    assert asyncio.run(store.take("a", limit))[0]
+    assert not asyncio.run(store.take("c", limit))[0]
+
+
+def call(middleware, path, client="10.0.0.1", headers=()):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "path": path, "headers": list(headers), "client": (client, 1234)}
+    asyncio.run(middleware(scope, receive, send))
+    return sent[0]["status"], dict(sent[0].get("headers", []))
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def test_middleware_limits_callers_and_routes(clock):
+    middleware = RateLimitMiddleware(
+        ok_app,
+        limits={"/recommend": RateLimit(1, 3), "/auth/login": RateLimit(1, 2, per_caller=False)},
+        per_user=RateLimit(1, 1),
+    )
+    assert call(middleware, "/recommend")[0] == 200
+    status, headers = call(middleware, "/recommend")
+    assert status == 429 and headers[b"retry-after"] == b"1"
+    # A header the client controls doesn't buy a new bucket
+    assert call(middleware, "/recommend", headers=[(b"x-username", b"someone-else")])[0] == 429
+    assert call(middleware, "/recommend", client="10.0.0.2")[0] == 200
+    assert call(middleware, "/recommend", client="10.0.0.3")[0] == 200
+    # Route bucket (burst 3) is now empty for everyone
+    assert call(middleware, "/recommend", client="10.0.0.4")[0] == 429
+    assert [call(middleware, "/auth/login")[0] for _ in range(3)] == [200, 200, 429]
+    assert call(middleware, "/unlimited")[0] == 200
@@ -0,0 +1,64 @@
+import base64
+import hashlib
+import hmac
+import json
+import time
+
+import pytest
+
+from src.utils import session
+from src.utils.session import bearer_token, issue_session_token, verify_session_token
+
+
+def sign(claims) -> str:
+    """A correctly signed token over arbitrary claims"""
+    payload = base64.urlsafe_b64encode(json.dumps(claims).encode()).rstrip(b"=").decode()
+    signature = hmac.new(session._secret, payload.encode(), hashlib.sha256).digest()
+    return f"{payload}.{base64.urlsafe_b64encode(signature).rstrip(b'=').decode()}"
+
+
+def test_round_trip():
+    issued = issue_session_token("alice", 42)
+    claims = verify_session_token(issued.token)
+    assert claims["sub"] == "alice" and claims["uid"] == 42 and claims["exp"] == issued.expires_at
+
+
+def test_expired_token_is_rejected():
+    assert verify_session_token(issue_session_token("alice", 42, ttl=-1).token) is None
+    assert verify_session_token(sign({"sub": "alice", "exp": time.time() - 1})) is None
+
+
+def valid():
+    return issue_session_token("alice", 42).token
+
+
+@pytest.mark.parametrize("make_token", [
+    lambda: "",
+    lambda: ".",
+    lambda: "no-dot",
+    lambda: valid().partition(".")[0] + ".",
+    lambda: "." + valid().partition(".")[2],
+    lambda: valid()[:-1],
+    lambda: valid()[:len(valid()) // 2],
+    lambda: valid() + "A",
+    lambda: valid() + "!",
+    lambda: valid() + "é",
+    lambda: "é" + valid(),
+    lambda: valid().replace(".", ".\udcff", 1),
+    lambda: valid().partition(".")[0] + "." + "x" * 43,
+    lambda: sign([1, 2, 3]),
+    lambda: sign("alice"),
+    lambda: sign(None),
+    lambda: sign({"sub": "alice"}),
+    lambda: sign({"sub": "alice", "exp": "tomorrow"}),
+    lambda: "bm90IGpzb24." + valid().partition(".")[2],
+])
+def test_malformed_tokens_are_rejected(make_token):
+    assert verify_session_token(make_token()) is None
+
+
+def test_bearer_token():
+    assert bearer_token("Bearer abc.def") == "abc.def"
+    assert bearer_token("bearer abc") == "abc"
+    assert bearer_token("Basic abc") == ""
+    assert bearer_token("") == ""
@@ -0,0 +1,67 @@
+import threading
+import time
+
+import pytest
+import spotipy
+
+from src.middleware.rate_limiter import RateLimit
+from src.utils.spotify_scheduler import PRIORITY_BACKGROUND, PRIORITY_USER, SpotifyBusyError, SpotifyScheduler
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = SpotifyScheduler(RateLimit(20, 1), workers=1, user_wait=2.0)
+    yield scheduler
+    scheduler.shutdown()
+
+
+def test_user_calls_go_before_background_calls(scheduler):
+    order = []
+    gate = threading.Event()
+    blocker = scheduler.submit(gate.wait, priority=PRIORITY_BACKGROUND)
+    background = scheduler.submit(order.append, "background", priority=PRIORITY_BACKGROUND)
+    user = scheduler.submit(order.append, "user", priority=PRIORITY_USER)
+    time.sleep(0.2)
+    gate.set()
+    for future in (blocker, background, user):
+        future.result(timeout=5)
+    assert order == ["user", "background"]
+
+
+def test_rate_limited_call_is_retried(scheduler):
+    attempts = []
+
+    def flaky():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise spotipy.SpotifyException(429, -1, "rate limited", headers={"Retry-After": "0.2"})
+        return "ok"
+
+    assert scheduler.call(flaky) == "ok"
+    assert len(attempts) == 2 and attempts[1] - attempts[0] >= 0.2
+
+
+def test_other_errors_are_not_retried(scheduler):
+    attempts = []
+
+    def broken():
+        attempts.append(1)
+        raise spotipy.SpotifyException(404, -1, "not found")
+
+    with pytest.raises(spotipy.SpotifyException):
+        scheduler.call(broken)
+    assert len(attempts) == 1
+
+
+def test_user_call_gives_up_past_its_deadline():
+    scheduler = SpotifyScheduler(RateLimit(20, 1), workers=1, user_wait=0.3)
+    try:
+        def limited():
+            raise spotipy.SpotifyException(429, -1, "rate limited", headers={"Retry-After": "30"})
+
+        started = time.monotonic()
+        with pytest.raises(SpotifyBusyError):
+            scheduler.call(limited)
+        assert time.monotonic() - started < 1
+    finally:
+        scheduler.shutdown()
@@ -0,0 +1,41 @@
+import pytest
+
+from src.models.music import FEATURES, MOOD_TARGETS, CatalogStore, build_catalog, mood_target
+
+
+def make_track(index, mood, features=True):
+    track = {
+        "id": f"track-{index}",
+        "name": f"Song {index}",
+        "artists": [f"Artist {index}"],
+        "external_url": f"https://open.spotify.com/track/{index}",
+        "mood": mood,
+    }
+    if features:
+        track.update(valence=0.1 * (index % 10), energy=0.5, tempo=100.0 + index, danceability=0.4)
+    return track
+
+
+def test_store_indexes_tracks_with_features(tmp_path):
+    tracks = [make_track(index, "relaxed", features=index != 4) for index in range(40)]
+    build_catalog(str(tmp_path), tracks)
+    catalog = CatalogStore(str(tmp_path)).get()
+    assert len(catalog.index) == len(tracks) - 1
+    nearest = catalog.index.nearest(mood_target("relaxed"), k=5)
+    distances = [track["distance"] for track in nearest]
+    assert distances == sorted(distances)
+    assert len(catalog.index.recommend(mood_target("relaxed"), count=3)) == 3
+
+
+def test_nearest_returns_exact_match_first(tmp_path):
+    target = dict(zip(FEATURES, MOOD_TARGETS["energetic"]))
+    tracks = [make_track(index, "positive") for index in range(30)] + [{**make_track(99, "energetic"), **target}]
+    build_catalog(str(tmp_path), tracks)
+    nearest = CatalogStore(str(tmp_path)).get().index.nearest(mood_target("energetic"), k=3)
+    assert nearest[0]["id"] == "track-99" and nearest[0]["distance"] == pytest.approx(0, abs=1e-3)
+
+
+def test_blended_mood_target_is_weighted_mean():
+    blended = mood_target({"relaxed": 0.5, "energetic": 0.5})
+    expected = [(a + b) / 2 for a, b in zip(MOOD_TARGETS["relaxed"], MOOD_TARGETS["energetic"])]
+    assert blended.tolist() == pytest.approx(expected)
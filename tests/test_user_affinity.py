@@ -0,0 +1,84 @@
+from src.models.user import SIGNAL_WEIGHTS, AffinityModel, MusicDataFeed
+
+
+def tracks():
+    return [
+        {"id": "a", "artists": ["Nobody"], "genres": ["pop"]},
+        {"id": "b", "artists": ["Liked Artist"], "genres": []},
+        {"id": "c", "artists": ["Someone"], "genres": ["jazz"]},
+        {"id": "d", "artists": ["Skipped Artist"], "genres": []},
+    ]
+
+
+def test_rerank_orders_by_affinity():
+    model = AffinityModel(buckets=4096)
+    model.apply(1, "like", ["Liked Artist"], mood="relaxed")
+    model.apply(1, "like", ["Other"], ["Jazz "], mood="relaxed")
+    model.apply(1, "skip", ["Skipped Artist"], mood="relaxed")
+    assert [track["id"] for track in model.rerank(1, tracks())] == ["b", "c", "a", "d"]
+    assert model.score(1, ["liked artist"]) == SIGNAL_WEIGHTS["like"]
+    assert model.mood_signals(1)["relaxed"] == {"like": 2, "play": 0, "skip": 1}
+
+
+def test_unknown_users_and_signals_leave_order_alone():
+    model = AffinityModel()
+    model.apply(1, "share", ["Liked Artist"])
+    original = tracks()
+    assert model.rerank(1, original) == original
+    assert model.rerank(None, original) == original
+    assert model.rerank(2, original) == original
+    assert len(model) == 0
+
+
+def test_rows_grow_past_capacity():
+    model = AffinityModel(buckets=64, capacity=2)
+    for user_id in range(10):
+        model.apply(user_id, "like", [f"artist-{user_id}"])
+    assert len(model) == 10
+    for user_id in range(10):
+        assert model.score(user_id, [f"artist-{user_id}"]) == SIGNAL_WEIGHTS["like"]
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params):
+        last_id, limit = params
+        self.result = [row for row in self.rows if row[0] > last_id][:limit]
+
+    def fetchall(self):
+        return self.result
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return FakeCursor(self.rows)
+
+
+def test_feed_applies_each_row_once():
+    rows = [(index, 7, f"artist-{index % 3}", "rock,pop", "positive", "like") for index in range(1, 6)]
+    model = AffinityModel()
+    feed = MusicDataFeed(model, connection=lambda: FakeConnection(rows), batch_size=2)
+    assert feed.sync() == 5
+    assert feed.sync() == 0
+    rows.append((6, 7, "artist-0", None, "positive", "skip"))
+    assert feed.sync() == 1
+    assert feed.last_id == 6
+    assert model.mood_signals(7)["positive"] == {"like": 5, "play": 0, "skip": 1}